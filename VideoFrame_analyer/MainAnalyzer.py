@@ -5,55 +5,59 @@ import numpy as np
 from PIL import Image
 import whisper
 import subprocess
-import requests
+
+# shared with behaviorAnalysis; run with it on PYTHONPATH, e.g.
+#   PYTHONPATH=behaviorAnalysis python VideoFrame_analyer/MainAnalyzer.py
+# (the "MainAnalyzer" launch configuration sets it)
+import download_cache
+from frame_grabber import read_frames
 
 def clear_output_folder(folder_path):
     if os.path.exists(folder_path):
         shutil.rmtree(folder_path)
     os.makedirs(folder_path, exist_ok=True)
 
-def download_video(url, save_path):
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3"
-    }
-    response = requests.get(url, headers=headers, stream=True)
-    if response.status_code == 200:
-        with open(save_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=1024 * 1024):
-                f.write(chunk)
-        print(f"Video downloaded to: {save_path}")
-        return save_path
-    else:
-        raise Exception(f"Download failed: HTTP {response.status_code}")
-
-def extract_even_frames_with_timestamps(video_path, output_folder, num_frames=240, resize_width=640, resize_height=360):
+def download_video(url, save_path, fetch=None):
+    # `fetch(url, save_path)`; download_cache.fetch resumes partial downloads
+    # and reuses recordings fetched before
+    fetch = fetch or download_cache.fetch
+    try:
+        fetch(url, save_path)
+    except Exception as e:
+        raise Exception(f"Download failed: {e}")
+    print(f"Video downloaded to: {save_path}")
+    return save_path
+
+def extract_even_frames_with_timestamps(video_path, output_folder, num_frames=240, resize_width=640, resize_height=360,
+                                        mode=None, reader=None):
     cap = cv2.VideoCapture(video_path)
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
     frame_indices = np.linspace(0, total_frames - 1, num_frames, dtype=int)
 
-    for count, i in enumerate(frame_indices):
-        cap.set(cv2.CAP_PROP_POS_FRAMES, i)
-        success, frame = cap.read()
-        if not success:
-            continue
-
+    # one forward pass instead of a keyframe seek per frame; `reader` has
+    # frame_grabber.read_frames' signature
+    reader = reader or read_frames
+    saved = 0
+    frames = reader(video_path, frame_indices, (resize_width, resize_height), mode)
+    for count, (i, frame_resized) in enumerate(frames):
         timestamp_sec = i / fps
         minutes = int(timestamp_sec // 60)
         seconds = int(timestamp_sec % 60)
         millis = int((timestamp_sec % 1) * 1000)
         timestamp_text = f"{minutes:02d}:{seconds:02d}.{millis:03d}"
 
-        frame_resized = cv2.resize(frame, (resize_width, resize_height))
         cv2.putText(frame_resized, timestamp_text, (10, 30),
                     fontFace=cv2.FONT_HERSHEY_SIMPLEX, fontScale=0.8,
                     color=(255, 255, 255), thickness=2, lineType=cv2.LINE_AA)
 
-        frame_filename = os.path.join(output_folder, f"frame_{count:02d}.webp")
+        # four digits so sorting by name keeps frames 100+ in order
+        frame_filename = os.path.join(output_folder, f"frame_{count:04d}.webp")
         cv2.imwrite(frame_filename, frame_resized)
+        saved += 1
 
-    cap.release()
-    print(f"Saved {num_frames} timestamped frames to: {output_folder}")
+    print(f"Saved {saved} timestamped frames to: {output_folder}")
 
 def save_frames_to_pdf_and_cleanup(output_folder, pdf_filename="video_frames.pdf"):
     images = sorted([
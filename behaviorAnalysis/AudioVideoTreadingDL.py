@@ -1,106 +1,169 @@
 import os
-import threading
+import re
 import subprocess
 import sys
+import threading
+
+import tracing
+import cancellation
+import media_info
+import segmented_download
+import sampling
+
+DURATION_RE = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+
+def _parse_duration(line):
+    m = DURATION_RE.search(line)
+    if not m:
+        return None
+    h, mnt, sec = m.groups()
+    return int(h) * 3600 + int(mnt) * 60 + float(sec)
+
+def download_media(url, video_path, audio_path, percent_download=40, media=None, audio_stream=None):
+    """Read `url` once and write both the stream-copied video and 16 kHz mono WAV.
 
-def probe_duration(url):
-    cmd = [
-        "ffprobe", "-v", "error",
-        "-show_entries", "format=duration",
-        "-of", "default=noprint_wrappers=1:nokey=1",
-        url
-    ]
-    out = subprocess.check_output(cmd, stderr=subprocess.DEVNULL).strip()
-    return float(out)
-
-def download_video_part(url, video_path, duration):
+    Both outputs stop at `percent_download`% of the duration (`-t`), probed
+    unless `media` is given; ffmpeg's progress only drives the progress bar.
+    A full download needs no probe: ffmpeg's own log supplies the duration.
+
+    With an `audio_stream` (audio_stream.AudioStream), ffmpeg sends raw PCM to
+    stdout instead; the stream writes the WAV and feeds its consumers as the
+    audio arrives.
+    """
     os.makedirs(os.path.dirname(video_path), exist_ok=True)
-    cmd = [
-        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
-        "-ss", "0", "-t", str(duration),
-        "-i", url,
-        "-c", "copy",
-        "-progress", "pipe:1", "-nostats",
-        video_path
-    ]
-    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
-    total_us = duration * 1_000_000
+    os.makedirs(os.path.dirname(audio_path), exist_ok=True)
+    audio_out = ["-f", "s16le", "pipe:1"] if audio_stream else [audio_path]
+    try:
+        if percent_download < 100:
+            media = media or media_info.probe(url)
+        duration = media.duration if media else None
+        # the same hard bound on both outputs
+        limit = ["-t", f"{duration * percent_download / 100:.3f}"] if percent_download < 100 and duration else []
+        cmd = [
+            "ffmpeg", "-y", "-hide_banner", "-loglevel", "info", "-nostats",
+            "-i", url,
+            "-progress", "pipe:2",
+            *limit, "-c", "copy",
+            video_path,
+            *limit, "-vn", "-acodec", "pcm_s16le", "-ar", "16000", "-ac", "1",
+            *audio_out
+        ]
+        proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL,
+                                stdout=subprocess.PIPE if audio_stream else subprocess.DEVNULL,
+                                stderr=subprocess.PIPE, text=True, bufsize=1)
+    except BaseException as e:
+        if audio_stream:
+            audio_stream.close(e)
+        raise
+    pump = None
+    if audio_stream:
+        # text=True applies to every pipe; PCM is read from the binary buffer
+        pump = threading.Thread(target=tracing.run_in_context(audio_stream.pump),
+                                args=(proc.stdout.buffer, audio_path), name="pcm-pump", daemon=True)
+        pump.start()
+    target_us = duration * percent_download / 100 * 1_000_000 if duration else None
+    log_tail = []
     bar_width = 50
 
-    while True:
-        line = proc.stdout.readline()
-        if not line:
-            break
-        if line.startswith("out_time_us="):
-            raw = line.split("=", 1)[1].strip()
+    # a cancelled job kills ffmpeg, which ends the stream below
+    with cancellation.tracked(proc):
+        for line in proc.stderr:
+            line = line.strip()
+            if target_us is None:
+                duration = _parse_duration(line)
+                if duration is not None:
+                    target_us = duration * percent_download / 100 * 1_000_000
+            if not line.startswith("out_time_us="):
+                if "=" not in line:
+                    log_tail = (log_tail + [line])[-10:]
+                continue
             try:
-                out_us = int(raw)
-                pct = min(out_us / total_us * 100, 100)
-                blocks = int(bar_width * pct / 100)
-                bar = "█" * blocks + "-" * (bar_width - blocks)
-                sys.stdout.write(f"\rVideo-Audio: {pct:5.1f}% |{bar}|")
-                sys.stdout.flush()
+                out_us = int(line.split("=", 1)[1])
             except ValueError:
-                pass
-
-    proc.wait()
+                continue
+            if not target_us:
+                continue
+            pct = min(out_us / target_us * 100, 100)
+            blocks = int(bar_width * pct / 100)
+            bar = "█" * blocks + "-" * (bar_width - blocks)
+            sys.stdout.write(f"\rVideo-Audio: {pct:5.1f}% |{bar}|")
+            sys.stdout.flush()
+        proc.wait()
+        if pump is not None:
+            pump.join()
     sys.stdout.write("\n")
-    print("Video saved:", video_path)
-
-def download_audio_part(url, audio_path, duration):
-    os.makedirs(os.path.dirname(audio_path), exist_ok=True)
-    cmd = [
-        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
-        "-ss", "0", "-t", str(duration),
-        "-i", url,
-        "-vn", "-acodec", "pcm_s16le", "-ar", "16000", "-ac", "1",
-        audio_path
-    ]
-    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
-    _, stderr = proc.communicate()
+    cancellation.check()
+    if audio_stream and audio_stream.error:
+        raise audio_stream.error
     if proc.returncode != 0:
-        print("Audio download failed:", stderr.strip())
-    else:
-        print("Audio saved:", audio_path)
-
-def download_video_audio(url, output_dir, percent_download=40):
-    import shutil
-    duration = probe_duration(url)
-    partial = duration * percent_download / 100
-
+        print("Download failed:", "\n".join(log_tail))
+        # the signed URL stays out of the error message
+        raise subprocess.CalledProcessError(proc.returncode, cmd[:6] + ["..."])
+    print("Video saved:", video_path)
+    print("Audio saved:", audio_path)
+    return duration
+
+def fetch_source(url, dest, percent_download=40, media=None, segments=None):
+    """Pull the needed part of `url` to `dest` over several connections.
+
+    The whole object goes by HTTP byte ranges; a leading part of it by
+    ffmpeg time segments, so only that part crosses the network.
+    """
+    with tracing.span("segmented_download", cat="io", segments=segments):
+        if percent_download >= 100:
+            return segmented_download.fetch_byte_ranges(url, dest, segments)
+        media = media or media_info.probe(url)
+        return segmented_download.fetch_time_segments(
+            url, dest, media.duration * percent_download / 100, segments)
+
+def download_video_audio(url, output_dir, percent_download=40, media=None, audio_stream=None, segments=None,
+                         windows=None):
+    """Download the part of `url` to analyze; returns (video_path, audio_path, timeline).
+
+    By default that part is the first `percent_download`%. With `windows` > 0
+    it is that much of the recording sampled as windows spread over its whole
+    length, stitched together; `timeline` (sampling.Timeline) maps the
+    stitched time back to the original, and is None for a plain prefix.
+
+    An `audio_stream` is closed with the error if anything here fails, so
+    its readers never wait on audio that won't come.
+    """
+    try:
+        return _download_video_audio(url, output_dir, percent_download, media, audio_stream, segments, windows)
+    except BaseException as e:
+        if audio_stream:
+            audio_stream.close(e)
+        raise
+
+def _download_video_audio(url, output_dir, percent_download, media, audio_stream, segments, windows):
     os.makedirs(output_dir, exist_ok=True)
     video_path = os.path.join(output_dir, "video.mp4")
     audio_path = os.path.join(output_dir, "audio.wav")
-    playback_path = os.path.join(output_dir, "playback.mp4")
-
-    t_video = threading.Thread(target=download_video_part, args=(url, video_path, partial))
-    t_audio = threading.Thread(target=download_audio_part, args=(url, audio_path, partial))
-
-    t_video.start()
-    t_audio.start()
-
-    t_video.join()
-
-    # Convert using GPU acceleration for faster encoding
-    if os.path.exists(video_path):
-        print("Converting with GPU acceleration for playback...")
-        cmd = [
-            "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
-            "-hwaccel", "cuda",  # GPU acceleration
-            "-i", video_path,
-            "-c:v", "h264_nvenc",  # NVIDIA GPU encoder
-            "-preset", "fast",  # Fast encoding preset
-            "-b:v", "2M",  # 2 Mbps video bitrate
-            "-c:a", "aac", "-b:a", "192k",  # AAC audio
-            playback_path
-        ]
-        subprocess.run(cmd, check=True)
-        print("GPU-accelerated playback video created:", playback_path)
 
-    t_audio.join()
+    segments = segmented_download.DEFAULT_SEGMENTS if segments is None else segments
+    windows = sampling.DEFAULT_WINDOWS if windows is None else windows
+    source = url
+    timeline = None
+    if windows > 0:
+        media = media or media_info.probe(url)
+        plan = sampling.plan_windows(media.duration, percent_download / 100, windows)
+        source = os.path.join(output_dir, "source.mp4")
+        timeline = sampling.fetch_windows(url, source, plan)
+        print(f"Sampled {len(timeline)} windows ({timeline.duration:.1f}s of {media.duration:.1f}s)")
+        percent_download, media = 100, None
+    elif segments > 1 and segmented_download.is_http(url):
+        source = fetch_source(url, os.path.join(output_dir, "source.mp4"), percent_download, media, segments)
+        # the local copy already holds exactly the requested part
+        percent_download, media = 100, None
+
+    with tracing.span("download_media", cat="io") as span_args:
+        span_args["source_seconds"] = download_media(source, video_path, audio_path, percent_download, media,
+                                                    audio_stream)
+    if source != url:
+        os.remove(source)
 
     print("Both downloads complete.")
-    return video_path, audio_path, playback_path
+    return video_path, audio_path, timeline
 
 
 
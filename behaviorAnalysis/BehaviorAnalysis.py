@@ -1,24 +1,33 @@
-def interpret_behavior(features):
+from model_pool import models
+from analysis_result import VocalFeatures
+
+def extract_speech_features(audio, smile=None):
+    # Feed the shared in-memory waveform instead of re-reading the WAV
+    if smile is None:
+        smile = models.get("opensmile:ComParE_2016")
+    return smile.process_signal(audio.samples, audio.sample_rate)
+
+def describe_voice(features):
     def safe_get(col_name):
-        return features[col_name].values[0] if col_name in features.columns else None
+        return float(features[col_name].values[0]) if col_name in features.columns else None
 
     pitch = safe_get("F0final_sma_amean")
     energy = safe_get("pcm_RMSenergy_sma_amean")
     jitter = safe_get("jitterLocal_sma_amean")
 
-    results = []
-    results.append(f"Pitch (F0final_sma_amean): {pitch:.2f}" if pitch is not None else "Pitch: N/A")
-    results.append(f"Energy (RMSenergy): {energy:.2f}" if energy is not None else "Energy: N/A")
-    results.append(f"Jitter (local): {jitter:.4f}" if jitter is not None else "Jitter: N/A")
-
+    flags = []
     if pitch is not None and pitch < 120:
-        results.append("[warning] Possibly monotone or calm.")
+        flags.append("[warning] Possibly monotone or calm.")
     if energy is not None and energy < -30:
-        results.append("[warning] Low vocal energy detected.")
+        flags.append("[warning] Low vocal energy detected.")
     if jitter is not None and jitter > 0.01:
-        results.append("[warning] Unstable voice - could indicate nervousness.")
+        flags.append("[warning] Unstable voice - could indicate nervousness.")
     elif jitter is not None:
-        results.append("[check] Vocal delivery seems stable.")
+        flags.append("[check] Vocal delivery seems stable.")
+
+    result = VocalFeatures(pitch, energy, jitter, flags)
+    print("\n".join(result.summary_lines()))
+    return result
 
-    print("\n".join(results))
-    return results 
+def interpret_behavior(features):
+    return describe_voice(features).summary_lines() 
@@ -1,128 +1,362 @@
 import subprocess
+import shutil
 import time
-import cv2
 import os
 import sys
 import math
-import win32gui # type: ignore
-import win32con # type: ignore
-import ctypes
-import pandas as pd
-
-def runOpenface(video_path, output_dir):
-    # 1) compute fps & total frames
-    cap = cv2.VideoCapture(video_path)
-    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
-    total = cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0
-    cap.release()
-
-    # 2) pick skip for ~3 fps, cap at 10 000 frames
-    skip = max(1, int(round(fps / 3)))
-    if total / skip > 10000:
-        skip = math.ceil(total / 10000)
-
-    # 3) how many frames we'll actually process (add 5% buffer for estimation errors)
-    expected_max = min(int(math.ceil(total / skip) * 1.05), 10500)
-
-    # 4) launch FeatureExtraction with tracking result window (the cool visualization!)
+from array import array
+
+import cancellation
+from csv_tail import CSVTail
+import media_info
+from analysis_result import BehaviorFindings
+from frame_sequence import frame_skip
+
+OPENFACE_TIMEOUT = 5 * 60
+
+
+class OpenFaceIncomplete(RuntimeError):
+    """OpenFace stopped early or wrote no rows; whatever it wrote is still in place."""
+
+# FeatureExtraction binary: a path, or a name looked up on PATH
+OPENFACE_BIN = os.environ.get(
+    "OVERWATCH_OPENFACE_BIN",
+    r"C:\Users\julius\OpenFace_2.2.0\FeatureExtraction.exe" if sys.platform == "win32" else "FeatureExtraction",
+)
+# "1" shows OpenFace's tracking window; it costs fps and needs a display
+DEFAULT_VISUALIZE = os.environ.get("OVERWATCH_OPENFACE_VISUALIZE", "0") == "1"
+# "openface" runs FeatureExtraction; "opencv" runs face_engine.FaceEngine in
+# this process (needs OpenCV, which is only imported then)
+FACE_BACKEND = os.environ.get("OVERWATCH_FACE_BACKEND", "openface")
+
+
+def openface_binary(binary=None):
+    binary = binary or OPENFACE_BIN
+    found = shutil.which(binary)
+    if not found:
+        raise FileNotFoundError(f"OpenFace FeatureExtraction not found at '{binary}'; set OVERWATCH_OPENFACE_BIN")
+    return found
+
+
+def feature_extraction_cmd(source, output_dir, skip, visualize=False, binary=None, name=None):
+    """FeatureExtraction over a video file (with -frame_skip) or an image directory."""
+    cmd = [openface_binary(binary)]
+    if os.path.isdir(source):
+        cmd += ["-fdir", source]
+    else:
+        cmd += ["-f", source, "-frame_skip", str(skip)]
+    cmd += ["-out_dir", output_dir, "-2Dfp", "-3Dfp", "-pose", "-gaze"]
+    if name:
+        cmd += ["-of", name]
+    if visualize:
+        cmd.append("-vis-track")  # Show tracking_result window with facial landmarks
+    return cmd
+
+
+def retime_rows(header, lines, to_time, fps, keep=None):
+    """`lines` with `frame`/`timestamp` moved onto the full video.
+
+    `to_time(frame, timestamp)` gives a row's time in the video; rows for
+    which `keep(time)` is False are dropped.
+    """
+    frame_i, time_i = header.index("frame"), header.index("timestamp")
+    out = []
+    for line in lines:
+        fields = [f.strip() for f in line.split(",")]
+        try:
+            t = to_time(int(float(fields[frame_i])), float(fields[time_i]))
+        except (IndexError, ValueError):
+            continue
+        if keep is not None and not keep(t):
+            continue
+        fields[time_i] = f"{t:.3f}"
+        fields[frame_i] = str(int(round(t * fps)) + 1)
+        out.append(", ".join(fields))
+    return out
+
+
+def runOpenface(video_path, output_dir, media=None, on_progress=None, stats=None, shards=None,
+                visualize=None, binary=None, frames=None):
+    """Run FeatureExtraction on `video_path`, writing <name>.csv to `output_dir`.
+
+    `on_progress(frames, expected_frames, frames_per_sec, eta_seconds)` is
+    called every poll; without it progress goes to stdout. Rows are fed to
+    `stats` (OpenFaceStats) as OpenFace appends them. With `frames` (a
+    FrameSequence of the video) OpenFace reads the pre-sampled images
+    instead of decoding the video itself; the CSV is still timed on the
+    video. With `shards` > 1 the input is split into parts run by parallel
+    headless workers (see openface_shards); None uses
+    OVERWATCH_OPENFACE_SHARDS. Runs are headless unless `visualize` (the
+    desktop GUI) asks for the tracking window; shards are always headless.
+    `binary` overrides OVERWATCH_OPENFACE_BIN. Raises OpenFaceIncomplete
+    after a timeout or when no rows were written.
+    """
+    import openface_shards
+    # 1) fps & total frames from the job's probe
+    media = media or media_info.probe(video_path)
+    fps = media.fps or 30.0
+    total = media.frame_count
+
+    if frames is None:
+        # 2) pick skip for ~3 fps, cap at 10 000 frames
+        skip = frame_skip(fps, total)
+        # 3) how many frames we'll actually process (add 5% buffer for estimation errors)
+        expected_max = min(int(math.ceil(total / skip) * 1.05), 10500)
+        source, to_time = video_path, None
+    else:
+        # 2-3) ffmpeg already sampled them with the same skip and cap
+        source, skip = frames.ensure(), frames.skip
+        expected_max = len(frames)
+        # OpenFace numbers images from 1 and times them at its own default fps
+        to_time = lambda frame, timestamp: frames.timestamp(frame - 1)
+
     video_name = os.path.splitext(os.path.basename(video_path))[0]
     csv_path = os.path.join(output_dir, f"{video_name}.csv")
-    cmd = [
-        r"C:\Users\julius\OpenFace_2.2.0\FeatureExtraction.exe",
-        "-f",       video_path,
-        "-out_dir", output_dir,
-        "-2Dfp", "-3Dfp", "-pose", "-gaze",
-        "-vis-track",  # Show tracking_result window with facial landmarks
-        "-frame_skip", str(skip),
-    ]
-    proc = subprocess.Popen(cmd)
-
-    # 5) tracking_result window will appear with the cool facial analysis visualization
-    time.sleep(1)
-
-    # 6) progress loop with timeout and 100% check
-    start = time.time()
-    timeout = 5 * 60
-    try:
-        while proc.poll() is None:
-            # timeout
-            if time.time() - start > timeout:
-                print("\n[Warning] OpenFace timed out after 5 minutes. Terminating.")
-                proc.terminate()
-                break
 
-            # progress bar
-            if os.path.exists(csv_path):
-                with open(csv_path, "r", encoding="utf-8", errors="ignore") as f:
-                    frame_count = len(f.readlines()) - 1
+    # 4) long videos: parallel shards, merged back into csv_path
+    shards = openface_shards.DEFAULT_SHARDS if shards is None else shards
+    if shards > 1 and media.duration:
+        if frames is None:
+            plan = openface_shards.plan_shards(media.duration, shards)
+        else:
+            plan = openface_shards.plan_frame_shards(frames, shards)
+        if len(plan) > 1:
+            openface_shards.run_sharded(
+                csv_path, plan, fps,
+                lambda shard_source, out_dir, name: feature_extraction_cmd(
+                    shard_source, out_dir, skip, binary=binary, name=name),
+                OPENFACE_TIMEOUT, expected_max, on_progress, stats,
+                video_path=video_path, frames=frames)
+            cancellation.check()
+            return
+
+    def feed(header, lines):
+        if stats is not None and header is not None:
+            stats.feed(header, retime_rows(header, lines, to_time, fps) if to_time else lines)
+
+    # 5) launch FeatureExtraction, with the tracking result window (the cool
+    #    visualization!) only when asked for
+    visualize = DEFAULT_VISUALIZE if visualize is None else visualize
+    proc = subprocess.Popen(feature_extraction_cmd(source, output_dir, skip, visualize, binary, video_name))
 
-                percent = int((frame_count / expected_max) * 100)
+    # 6) tracking_result window will appear with the cool facial analysis visualization
+    if visualize:
+        time.sleep(1)
+
+    # 7) progress loop with timeout and 100% check; only rows appended since the
+    #    last poll are read. Cancelling the job kills FeatureExtraction, which
+    #    ends the loop
+    tail = CSVTail(csv_path)
+    stopped = None
+    with cancellation.tracked(proc), tail:
+        start = time.time()
+        timeout = OPENFACE_TIMEOUT
+        try:
+            while proc.poll() is None:
+                # timeout
+                if time.time() - start > timeout:
+                    print("\n[Warning] OpenFace timed out after 5 minutes. Terminating.")
+                    proc.terminate()
+                    stopped = "timed out"
+                    break
+
+                # read first: the header is only known once the first lines are in
+                lines = tail.read_lines()
+                feed(tail.header, lines)
+                frame_count = tail.rows_read
+                percent = int((frame_count / expected_max) * 100) if expected_max else 0
                 # terminate if percent exceeds 100%
                 if percent > 100:
                     print("\n[Warning] Progress exceeded 100%. Terminating.")
                     proc.terminate()
+                    stopped = "exceeded the expected frame count"
                     break
-                
-                GREEN = '\033[92m'
-                RESET = '\033[0m'
-                blocks = percent * 50 // 100
-                bar = GREEN + "#" * blocks + RESET
-                sys.stdout.write(f"\r{frame_count}/{expected_max} frames  {percent:3}% |{bar:<50}|")
-                sys.stdout.flush()
-
-            time.sleep(0.5)
-
-        print("\n[CHECK] OpenFace completed or stopped.")
-    except Exception as e:
-        print(f"\n[Error] {e}")
-        proc.terminate()
-
-    # 7) final count
-    if os.path.exists(csv_path):
-        with open(csv_path, "r", encoding="utf-8", errors="ignore") as f:
-            final_count = len(f.readlines()) - 1
-        print(f"\n[Check] OpenFace completed. {final_count} frames processed.")
+
+                elapsed = time.time() - start
+                rate = frame_count / elapsed if elapsed > 0 else 0.0
+                eta = (expected_max - frame_count) / rate if rate > 0 else None
+                if on_progress:
+                    on_progress(frame_count, expected_max, rate, eta)
+                else:
+                    eta_text = f"{eta:.0f}s" if eta is not None else "?"
+                    sys.stdout.write(f"\r{frame_count}/{expected_max} frames  {percent:3}%  {rate:.1f} fps  ETA {eta_text}")
+                    sys.stdout.flush()
+
+                time.sleep(0.5)
+
+            print("\n[CHECK] OpenFace completed or stopped.")
+        except Exception as e:
+            print(f"\n[Error] {e}")
+            proc.terminate()
+            stopped = str(e)
+
+        # 8) final count: whatever was appended after the last poll
+        proc.wait()
+        lines = tail.read_lines(final=True)
+        feed(tail.header, lines)
+
+    if tail.header is not None:
+        if to_time:
+            retime_csv(csv_path, to_time, fps)
+        print(f"\n[Check] OpenFace completed. {tail.rows_read} frames processed.")
     else:
         print("\n[Warning] no CSV found after OpenFace.")
 
+    cancellation.check()
+    if stopped:
+        raise OpenFaceIncomplete(f"OpenFace {stopped}; {tail.rows_read} frames processed")
+    if not tail.rows_read:
+        raise OpenFaceIncomplete("OpenFace wrote no rows")
+
+
+def retime_csv(csv_path, to_time, fps):
+    """Rewrite the `frame`/`timestamp` columns of an OpenFace CSV in place (see retime_rows)."""
+    # rewritten a chunk at a time; the CSV is never held in memory whole
+    tmp = csv_path + ".tmp"
+    with CSVTail(csv_path) as tail, open(tmp, "w", encoding="utf-8", newline="") as out:
+        for lines in tail.read_chunks():
+            if tail.header is None:
+                break
+            if not out.tell():
+                out.write(", ".join(tail.header) + "\n")
+            out.writelines(line + "\n" for line in retime_rows(tail.header, lines, to_time, fps))
+    if tail.header is None:
+        os.remove(tmp)
+        return
+    os.replace(tmp, csv_path)
+
 
 def analyze_behavior(video_path, output_dir):
     name = os.path.splitext(os.path.basename(video_path))[0]
     data_file = os.path.join(output_dir, f"{name}.csv")
-    results = []
-    narrative = []
+    findings = analyze_behavior_csv(data_file)
+    return findings.summary_lines(), findings.narrative
+
+
+def analyze_behavior_csv(data_file):
+    stats = OpenFaceStats()
+    with CSVTail(data_file) as tail:
+        for lines in tail.read_chunks():
+            stats.feed(tail.header, lines)
+    return stats.findings()
+
+
+class OpenFaceStats:
+    """Behavior ratios over OpenFace rows, updated as the rows arrive.
+
+    Only the columns the ratios need are parsed; their values are kept as
+    float32 arrays (4 bytes per frame and column) and the threshold hits as
+    running counts, so `findings()` is ready as soon as the last row is fed.
+    The arrays still grow with the rows: BehaviorTimeline needs every row's
+    values for its centered windows. Both OpenFace feeds are capped at
+    frame_sequence.MAX_FRAMES rows, i.e. under 300 KB.
+    """
+
+    COLUMNS = ("timestamp", "pose_Rx", "pose_Ry", "pose_Rz", "AU45_r", "gaze_angle_x", "gaze_angle_y")
 
-    try:
-        df = pd.read_csv(data_file)
-        df.columns = df.columns.str.strip()
+    # thresholds (radians for pose/gaze, AU intensity for blinks)
+    PITCH_DOWN = -0.2
+    YAW = 0.3
+    ROLL = 0.3
+    BLINK = 0.5
+    GAZE = 0.4
+    RATIO = 0.2
+
+    @classmethod
+    def params(cls):
+        """The thresholds, for stage cache keys."""
+        return {"pitch": cls.PITCH_DOWN, "yaw": cls.YAW, "roll": cls.ROLL,
+                "blink": cls.BLINK, "gaze": cls.GAZE, "ratio": cls.RATIO}
+
+    def __init__(self):
+        self.rows = 0
+        self.columns = None
+        self.values = {name: array("f") for name in self.COLUMNS}
+        self.counts = {"downward": 0, "turning": 0, "tilt": 0, "blink": 0, "offscreen": 0}
+        self._index = None
+
+    def feed(self, header, lines):
+        if header is None:
+            return
+        if self._index is None:
+            self.columns = set(header)
+            self._index = [(name, header.index(name)) for name in self.COLUMNS if name in self.columns]
+        nan = float("nan")
+        for line in lines:
+            fields = line.split(",")
+            row = {}
+            for name, i in self._index:
+                try:
+                    row[name] = float(fields[i])
+                except (IndexError, ValueError):
+                    row[name] = nan
+            self.add(row)
+
+    def add(self, row):
+        """One row as {column: value}, for producers that never write CSV text."""
+        if self.columns is None:
+            self.columns = set(row)
+        for name in self.COLUMNS:
+            if name in row:
+                self.values[name].append(row[name])
+        self._count(row)
+        self.rows += 1
+
+    def _count(self, row):
+        # NaN compares False, as it does in pandas
+        nan = float("nan")
+        rx, ry, rz = row.get("pose_Rx", nan), row.get("pose_Ry", nan), row.get("pose_Rz", nan)
+        gx, gy = row.get("gaze_angle_x", nan), row.get("gaze_angle_y", nan)
+        self.counts["downward"] += rx < self.PITCH_DOWN
+        self.counts["turning"] += abs(ry) > self.YAW
+        self.counts["tilt"] += abs(rz) > self.ROLL
+        self.counts["blink"] += row.get("AU45_r", nan) > self.BLINK
+        self.counts["offscreen"] += abs(gx) > self.GAZE or abs(gy) > self.GAZE
+
+    def column(self, name):
+        import numpy as np
+        # a copy: a frombuffer view would stop the array.array from growing
+        # while rows are still being fed
+        return np.array(self.values[name], dtype=np.float32)
+
+    def findings(self):
+        findings = BehaviorFindings()
+        results = findings.concerns
+        narrative = findings.narrative
+        ratios = findings.ratios
+
+        if not self.rows:
+            results.append("Behavioral data could not be analyzed due to a processing error.")
+            return findings
+        columns = self.columns
+
+        def ratio(name):
+            ratios[name] = self.counts[name] / self.rows
+            return ratios[name]
 
         # Head pose analysis Rx (roll)
         # Note: pose_Rx is typically used for roll, but we also check pose_Ry for pitch
         # Head pitch (Rx)
-        if 'pose_Rx' in df.columns:
-            downward_ratio = (df['pose_Rx'] < -0.2).sum() / len(df)
-            if downward_ratio > 0.2:
+        if 'pose_Rx' in columns:
+            if ratio("downward") > self.RATIO:
                 results.append("The person frequently looked downward during the interview. This behavior may suggest they were referring to notes or avoiding eye contact.")
             else:
                 narrative.append("The persons head remained mostly upright, indicating they stayed visually engaged with the screen.")
         else:
             narrative.append("Head pitch data was not available for analysis.")
-        
+
         # Head yaw (Ry)
-        if 'pose_Ry' in df.columns:
-            turning_ratio = (df['pose_Ry'].abs() > 0.3).sum() / len(df)
-            if turning_ratio > 0.2:
+        if 'pose_Ry' in columns:
+            if ratio("turning") > self.RATIO:
                 results.append("The person frequently turned their head away from the screen, which may suggest distraction or external reference.")
             else:
                 narrative.append("The person generally kept their face oriented toward the screen.")
         else:
             narrative.append("Head yaw data was not available for analysis.")
 
-
         # Head roll (Rz)
-        if 'pose_Rz' in df.columns:
-            tilt_ratio = (df['pose_Rz'].abs() > 0.3).sum() / len(df)
-            if tilt_ratio > 0.2:
+        if 'pose_Rz' in columns:
+            if ratio("tilt") > self.RATIO:
                 results.append("The person frequently tilted their head sideways, which could indicate discomfort or posture imbalance.")
             else:
                 narrative.append("The person’s head remained level without excessive side tilting.")
@@ -130,9 +364,8 @@ def analyze_behavior(video_path, output_dir):
             narrative.append("Head roll data was not available for analysis.")
 
         # Blinking analysis
-        if 'AU45_r' in df.columns:
-            blink_rate = (df['AU45_r'] > 0.5).sum() / len(df)
-            if blink_rate < 0.01:
+        if 'AU45_r' in columns:
+            if ratio("blink") < 0.01:
                 results.append("The person barely blinked. This may be unnatural, like staring at something, such as a script.")
             else:
                 narrative.append("The person blinked at a rate consistent with normal human behavior.")
@@ -140,25 +373,12 @@ def analyze_behavior(video_path, output_dir):
             narrative.append("Blinking activity could not be measured.")
 
         # Gaze direction analysis
-        if 'gaze_angle_x' in df.columns and 'gaze_angle_y' in df.columns:
-            offscreen_ratio = ((df['gaze_angle_x'].abs() > 0.4) | (df['gaze_angle_y'].abs() > 0.4)).sum() / len(df)
-            if offscreen_ratio > 0.2:
+        if 'gaze_angle_x' in columns and 'gaze_angle_y' in columns:
+            if ratio("offscreen") > self.RATIO:
                 results.append("The person frequently looked away from the screen. This may suggest they were distracted or referencing information off-camera.")
             else:
                 narrative.append("The person maintained steady gaze toward the screen for most of the session.")
         else:
             narrative.append("Gaze direction could not be assessed.")
 
-    except Exception as e:
-        results.append("Behavioral data could not be analyzed due to a processing error.")
-
-    # Compose report
-    full_report = []
-
-    if results:
-        full_report.append("Behavioral observations suggest the following areas of concern:")
-        full_report += results
-    else:
-        full_report.append("No unusual behavior was observed. The person appeared naturally engaged throughout the session.")
-    
-    return full_report, narrative
\ No newline at end of file
+        return findings
@@ -1,13 +1,14 @@
 from difflib import SequenceMatcher
 
-def flag_sensitive_words(transcript_path, reference_path, threshold=0.75, window_size=8): 
+from analysis_result import CheatingIndicators, PhraseMatch
+
+def match_sensitive_words(transcript_path, reference_path, threshold=0.75, window_size=8):
     print("Checking transcript for LLM-like phrasing...")
-    flagged_lines = []
 
     # Load LLM-style reference phrases
     with open(reference_path, "r", encoding="utf-8") as ref_file:
         reference_phrases = [line.strip().lower() for line in ref_file if line.strip()]
-    phrase_hits = {phrase: 0 for phrase in reference_phrases}
+    result = CheatingIndicators(phrase_hits={phrase: 0 for phrase in reference_phrases})
 
     # Process transcript
     with open(transcript_path, "r", encoding="utf-8") as f:
@@ -21,25 +22,17 @@ def flag_sensitive_words(transcript_path, reference_path, threshold=0.75, window
                     for phrase in reference_phrases:
                         similarity = SequenceMatcher(None, ngram, phrase).ratio()
                         if similarity >= threshold:
-                            flagged_lines.append((i, ngram, phrase, round(similarity * 100, 2)))
-                            phrase_hits[phrase] += 1
+                            result.matches.append(PhraseMatch(i, ngram, phrase, round(similarity * 100, 2)))
+                            result.phrase_hits[phrase] += 1
                             break
                     else:
                         continue
                     break
 
-    # Report
-    output_lines = []
-    if flagged_lines:
-        output_lines.append("[Warning!] Gemini-style phrases detected:")
-        for line_num, found_ngram, matched_phrase, similarity in flagged_lines:
-            output_lines.append(f"  Line {line_num}: \"{found_ngram}\" → \"{matched_phrase}\" ({similarity}%)")
-        output_lines.append("\nSummary of matched phrases:")
-        for phrase, count in phrase_hits.items():
-            if count > 0:
-                output_lines.append(f"  \"{phrase}\": {count} occurrence(s)")
-    else:
-        output_lines.append("[check] No Script-like phrases found.")
+    return result
 
+def flag_sensitive_words(transcript_path, reference_path, threshold=0.75, window_size=8):
+    # Report
+    output_lines = match_sensitive_words(transcript_path, reference_path, threshold, window_size).summary_lines()
     print("\n".join(output_lines))
     return output_lines
@@ -0,0 +1,179 @@
+import json
+from dataclasses import dataclass, field, asdict
+from functools import cached_property
+from typing import Dict, List, Optional
+
+
+# ─── ANALYZER OUTPUTS ───────────────────────────────────────────────────────────
+# Each analyzer returns one of these; `summary_lines()` reproduces the text the
+# analyzer used to return, so rendering stays a separate step.
+
+@dataclass
+class PhraseMatch:
+    line: int
+    text: str
+    phrase: str
+    similarity: float
+
+
+@dataclass
+class CheatingIndicators:
+    matches: List[PhraseMatch] = field(default_factory=list)
+    phrase_hits: Dict[str, int] = field(default_factory=dict)
+
+    def summary_lines(self):
+        if not self.matches:
+            return ["[check] No Script-like phrases found."]
+        lines = ["[Warning!] Gemini-style phrases detected:"]
+        for m in self.matches:
+            lines.append(f"  Line {m.line}: \"{m.text}\" → \"{m.phrase}\" ({m.similarity}%)")
+        lines.append("\nSummary of matched phrases:")
+        for phrase, count in self.phrase_hits.items():
+            if count > 0:
+                lines.append(f"  \"{phrase}\": {count} occurrence(s)")
+        return lines
+
+
+@dataclass
+class KeyboardFindings:
+    onsets: int
+    onsets_per_sec: float
+    typing_suspected: bool
+    onset_times: List[float] = field(default_factory=list)  # seconds
+
+    def summary_lines(self):
+        lines = [f"Detected {self.onsets} onsets ({self.onsets_per_sec:.2f} per sec)"]
+        if self.typing_suspected:
+            lines.append("[Warning!] Possible keyboard typing detected.")
+        else:
+            lines.append("[check] No strong evidence of typing detected.")
+        return lines
+
+
+@dataclass
+class SpeechPattern:
+    speech_rate: float  # syllables per minute
+    volume_std: float
+    unusual_rate: bool
+    monotone: bool
+
+    def summary_lines(self):
+        lines = [
+            f"Detected speech rate: {self.speech_rate:.1f} syllables/min (~{self.speech_rate/60:.1f} per sec)",
+            f"Volume variation (std): {self.volume_std:.4f}",
+        ]
+        if self.unusual_rate:
+            lines.append("[Warning!] Unusual speaking rate (too fast or too slow).")
+        if self.monotone:
+            lines.append("[Warning!] Voice sounds flat or monotone.")
+        else:
+            lines.append("[check] Voice shows natural variation.")
+        return lines
+
+
+@dataclass
+class VocalFeatures:
+    pitch: Optional[float]
+    energy: Optional[float]
+    jitter: Optional[float]
+    flags: List[str] = field(default_factory=list)
+
+    def summary_lines(self):
+        lines = [
+            f"Pitch (F0final_sma_amean): {self.pitch:.2f}" if self.pitch is not None else "Pitch: N/A",
+            f"Energy (RMSenergy): {self.energy:.2f}" if self.energy is not None else "Energy: N/A",
+            f"Jitter (local): {self.jitter:.4f}" if self.jitter is not None else "Jitter: N/A",
+        ]
+        return lines + self.flags
+
+
+@dataclass
+class BehaviorEpisode:
+    signal: str  # a behavior_timeline.SIGNALS key
+    label: str
+    start: float  # seconds
+    end: float
+    peak: float  # highest windowed ratio inside the episode
+
+    def summary_line(self):
+        return f"{self.label} {_clock(self.start)}–{_clock(self.end)}"
+
+
+def _clock(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+@dataclass
+class BehaviorFindings:
+    ratios: Dict[str, float] = field(default_factory=dict)
+    concerns: List[str] = field(default_factory=list)
+    narrative: List[str] = field(default_factory=list)
+    # time ranges where a signal stayed above its threshold; see behavior_timeline
+    episodes: List[BehaviorEpisode] = field(default_factory=list)
+
+    def summary_lines(self):
+        if self.concerns:
+            return ["Behavioral observations suggest the following areas of concern:"] + self.concerns
+        return ["No unusual behavior was observed. The person appeared naturally engaged throughout the session."]
+
+    def episode_lines(self):
+        if not self.episodes:
+            return []
+        return ["Episodes:"] + [f"  {e.summary_line()}" for e in sorted(self.episodes, key=lambda e: e.start)]
+
+
+# ─── JOB RESULT ─────────────────────────────────────────────────────────────────
+
+@dataclass
+class AnalysisResult:
+    job_id: str
+    transcript: str
+    cheating_indicators: CheatingIndicators
+    keyboard: KeyboardFindings
+    speech: SpeechPattern
+    vocal: VocalFeatures
+    openface: BehaviorFindings
+    artifacts: Dict[str, str] = field(default_factory=dict)
+    # sampling.Timeline.to_dict() when only windows of the recording were analyzed
+    timeline: Optional[Dict[str, list]] = None
+
+    def to_dict(self):
+        return asdict(self)
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def _sections(self):
+        return [
+            ("Cheating Indicator Analysis", self.cheating_indicators.summary_lines()),
+            ("Keyboard Sound Analysis", self.keyboard.summary_lines()),
+            ("Speech Rhythm Analysis", self.speech.summary_lines()),
+            ("Behavioral Analysis", self.vocal.summary_lines()),
+            ("OpenFace Analysis", self.openface.summary_lines() + self.openface.episode_lines()
+             + self.openface.narrative),
+        ]
+
+    # cached_property keeps rendering lazy: nothing is formatted until asked for
+    @cached_property
+    def text(self):
+        parts = [self.transcript.rstrip("\n"), "\n\n---\n"]
+        for title, lines in self._sections():
+            parts.append(f"\n### {title}\n")
+            parts.extend(line + "\n" for line in lines)
+        return "".join(parts)
+
+    @cached_property
+    def markdown(self):
+        parts = ["## Transcript\n", "```", self.transcript.rstrip("\n"), "```\n"]
+        for title, lines in self._sections():
+            parts.append(f"### {title}\n")
+            parts.extend(f"- {line.strip()}" for line in lines if line.strip())
+            parts.append("")
+        return "\n".join(parts)
+
+    def to_text(self):
+        return self.text
+
+    def to_markdown(self):
+        return self.markdown
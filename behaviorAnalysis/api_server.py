@@ -1,12 +1,16 @@
+import os
 import uuid
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
-from typing import Dict, Optional
+from typing import Any, Dict, Optional
 
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 
 from hitl_runner import HITLRunner
+from model_pool import models, DEFAULT_PRELOAD
+from cancellation import CancellationToken, Cancelled
+from workspace import remove_job
 
 app = FastAPI(title="Overwatch Analysis API")
 
@@ -21,12 +25,19 @@ class JobState(BaseModel):
     status: str
     progress: int
     transcript: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
 
 
 # In-memory job store; replace with Redis/DB for production
 jobs: Dict[str, JobState] = {}
-executor = ThreadPoolExecutor(max_workers=2)
+# Tokens of jobs that are still running, for DELETE /api/analyze/{job_id}
+cancel_tokens: Dict[str, CancellationToken] = {}
+# Output root each job publishes under, so DELETE can remove a finished job's files
+job_roots: Dict[str, str] = {}
+DEFAULT_OUTPUT_DIR = "./out"
+# Jobs run in isolated workspaces, so concurrency is bounded only by the host
+executor = ThreadPoolExecutor(max_workers=int(os.environ.get("OVERWATCH_API_WORKERS", os.cpu_count() or 2)))
 
 
 def _update_job(job_id: str, status: Optional[str] = None, progress: Optional[int] = None):
@@ -37,14 +48,49 @@ def _update_job(job_id: str, status: Optional[str] = None, progress: Optional[in
         status=status or current.status,
         progress=progress if progress is not None else current.progress,
         transcript=current.transcript,
+        result=current.result,
         error=current.error,
     )
 
 
-def _run_analysis(job_id: str, req: AnalyzeRequest):
+def _result_payload(result) -> Dict[str, Any]:
+    return {
+        "transcript": result.transcript,
+        "report": result.to_markdown(),
+        "cheatingIndicators": [vars(m) for m in result.cheating_indicators.matches],
+        "keyboardFindings": result.keyboard.summary_lines(),
+        "behaviorSummary": result.vocal.summary_lines(),
+        "openfaceInsights": result.openface.summary_lines() + result.openface.narrative,
+        "metrics": {
+            "keyboard": {
+                "onsets": result.keyboard.onsets,
+                "onsetsPerSec": result.keyboard.onsets_per_sec,
+                "typingSuspected": result.keyboard.typing_suspected,
+                "onsetTimes": result.keyboard.onset_times,
+            },
+            "speech": {
+                "speechRate": result.speech.speech_rate,
+                "volumeStd": result.speech.volume_std,
+                "unusualRate": result.speech.unusual_rate,
+                "monotone": result.speech.monotone,
+            },
+            "voice": {
+                "pitch": result.vocal.pitch,
+                "energy": result.vocal.energy,
+                "jitter": result.vocal.jitter,
+            },
+            "headPose": result.openface.ratios,
+        },
+        "log": [],
+    }
+
+
+def _run_analysis(job_id: str, req: AnalyzeRequest, cancel_token: CancellationToken):
     try:
-        output_dir = req.outputDir or "./out"
-        runner = HITLRunner(output_dir)
+        output_dir = job_roots[job_id]
+        # nobody watches the video in API mode, so no playback copy is made and
+        # OpenFace runs headless
+        runner = HITLRunner(output_dir, playback="skip", openface_visualize=False)
 
         def progress_callback(pct: int):
             _update_job(job_id, progress=min(max(int(pct), 0), 100))
@@ -52,12 +98,25 @@ def _run_analysis(job_id: str, req: AnalyzeRequest):
         def status_callback(msg: str):
             _update_job(job_id, status=msg)
 
-        transcript = runner.run_analysis(
+        result = runner.run_analysis(
             req.videoUrl,
             progress_callback=progress_callback,
             status_callback=status_callback,
+            job_id=job_id,
+            cancel_token=cancel_token,
+        )
+        jobs[job_id] = JobState(
+            status="completed",
+            progress=100,
+            transcript=result.transcript,
+            result=_result_payload(result),
+        )
+    except Cancelled:
+        jobs[job_id] = JobState(
+            status="cancelled",
+            progress=jobs[job_id].progress,
+            transcript=None,
         )
-        jobs[job_id] = JobState(status="completed", progress=100, transcript=transcript)
     except Exception as exc:  # noqa: BLE001
         jobs[job_id] = JobState(
             status="error",
@@ -65,6 +124,14 @@ def _run_analysis(job_id: str, req: AnalyzeRequest):
             error=str(exc),
             transcript=None,
         )
+    finally:
+        cancel_tokens.pop(job_id, None)
+
+
+@app.on_event("startup")
+async def preload_models():
+    # Warm the shared models in the background so the first job doesn't pay for them
+    models.preload(DEFAULT_PRELOAD, background=True)
 
 
 @app.post("/api/analyze")
@@ -74,9 +141,11 @@ async def analyze(req: AnalyzeRequest):
 
     job_id = str(uuid.uuid4())
     jobs[job_id] = JobState(status="running", progress=5)
+    cancel_tokens[job_id] = CancellationToken()
+    job_roots[job_id] = req.outputDir or DEFAULT_OUTPUT_DIR
 
     loop = asyncio.get_event_loop()
-    loop.run_in_executor(executor, _run_analysis, job_id, req)
+    loop.run_in_executor(executor, _run_analysis, job_id, req, cancel_tokens[job_id])
     return {"jobId": job_id}
 
 
@@ -85,22 +154,28 @@ async def get_status(job_id: str):
     job = jobs.get(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
-    payload = job.model_dump()
-    if job.status == "completed" and job.transcript:
-        payload["result"] = {
-            "transcript": job.transcript,
-            "cheatingIndicators": [],
-            "keyboardFindings": [],
-            "behaviorSummary": [],
-            "openfaceInsights": [],
-            "log": [],
-        }
-    return payload
+    return job.model_dump()
+
+
+@app.delete("/api/analyze/{job_id}")
+async def cancel(job_id: str):
+    """Cancel a running job; delete a finished one and its published files."""
+    if job_id not in jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    token = cancel_tokens.get(job_id)
+    if token is None:
+        remove_job(job_roots.pop(job_id, DEFAULT_OUTPUT_DIR), job_id)
+        jobs.pop(job_id, None)
+        return {"jobId": job_id, "status": "deleted"}
+    # child processes are stopped now; the job reports "cancelled" once it unwinds
+    token.cancel()
+    _update_job(job_id, status="cancelling")
+    return {"jobId": job_id, "status": "cancelling"}
 
 
 @app.get("/health")
 async def health():
-    return {"ok": True}
+    return {"ok": True, "modelsLoaded": models.loaded()}
 
 
 if __name__ == "__main__":
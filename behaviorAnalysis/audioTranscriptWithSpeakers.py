@@ -1,21 +1,17 @@
-import whisper
-from pyannote.audio import Pipeline
 import os
-import torch
+from model_pool import models
 
 def transcribe_and_diarize(audio_path, transcript_path):
     hf_token = os.environ.get("HF_TOKEN")
     if not hf_token:
         raise ValueError("HF_TOKEN not set in environment variables")
 
-    model = whisper.load_model("base", device="cuda")
-    result = model.transcribe(audio_path, verbose=True)
+    # Both models are loaded once per process and shared between jobs
+    with models.lease("whisper:base") as model:
+        result = model.transcribe(audio_path, verbose=True)
 
-    pipeline = Pipeline.from_pretrained(
-        "pyannote/speaker-diarization",
-        use_auth_token=hf_token
-    ).to(torch.device("cuda"))
-    diarization = pipeline(audio_path)
+    with models.lease("pyannote:pyannote/speaker-diarization") as pipeline:
+        diarization = pipeline(audio_path)
 
     def format_time(t):
         h = int(t // 3600)
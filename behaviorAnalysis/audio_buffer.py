@@ -0,0 +1,43 @@
+import hashlib
+import numpy as np
+import soundfile as sf
+
+TARGET_SR = 16000
+
+
+class AudioBuffer:
+    """Decoded mono float32 audio at 16 kHz, shared by every audio analyzer."""
+
+    def __init__(self, samples, sample_rate=TARGET_SR, path=None):
+        self.samples = np.ascontiguousarray(samples, dtype=np.float32)
+        self.sample_rate = sample_rate
+        self.path = path
+        self._fingerprint = None
+
+    @classmethod
+    def load(cls, path):
+        # float32 straight from the decoder, no float64 intermediate
+        samples, sr = sf.read(path, dtype="float32", always_2d=True)
+        samples = samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+        if sr != TARGET_SR:
+            import soxr
+            samples = soxr.resample(samples, sr, TARGET_SR)
+        return cls(samples, TARGET_SR, path=path)
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.sample_rate
+
+    def fingerprint(self):
+        # content hash used by the stage cache
+        if self._fingerprint is None:
+            digest = hashlib.sha256(str(self.sample_rate).encode())
+            digest.update(memoryview(self.samples).cast("B"))
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __repr__(self):
+        return f"AudioBuffer({self.duration:.1f}s @ {self.sample_rate} Hz)"
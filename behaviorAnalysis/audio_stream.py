@@ -0,0 +1,150 @@
+import os
+import threading
+
+import numpy as np
+
+import cancellation
+
+TARGET_SR = 16000
+# HITLRunner default; "1" analyzes audio while it is still downloading
+DEFAULT_STREAMING = os.environ.get("OVERWATCH_STREAM_AUDIO", "0") == "1"
+# memory bound for audio the slowest consumer hasn't read yet
+DEFAULT_CAPACITY_SECONDS = 30
+DEFAULT_BLOCK_SECONDS = 1.0
+
+
+class PCMRingBuffer:
+    """Bounded float32 ring with one writer and a fixed set of named readers.
+
+    The writer blocks while the slowest reader is a full ring behind, so a
+    slow analyzer throttles ffmpeg instead of growing memory. Readers must be
+    named up front so none of them misses the start of the stream.
+    """
+
+    def __init__(self, capacity, readers):
+        self.capacity = int(capacity)
+        self._data = np.zeros(self.capacity, dtype=np.float32)
+        self._written = 0
+        self._cursors = {name: 0 for name in readers}
+        self._closed = False
+        self._error = None
+        self._cond = threading.Condition()
+
+    def _wait(self):
+        # waits are short so a cancelled job gets out of here promptly
+        self._cond.wait(0.2)
+        cancellation.check()
+
+    def write(self, samples):
+        pos = 0
+        while pos < len(samples):
+            with self._cond:
+                while True:
+                    slowest = min(self._cursors.values(), default=self._written)
+                    free = self.capacity - (self._written - slowest)
+                    if free > 0:
+                        break
+                    self._wait()
+                n = min(free, len(samples) - pos)
+                start = self._written % self.capacity
+                first = min(n, self.capacity - start)
+                self._data[start:start + first] = samples[pos:pos + first]
+                self._data[:n - first] = samples[pos + first:pos + n]
+                self._written += n
+                pos += n
+                self._cond.notify_all()
+
+    def read(self, reader, size):
+        """Next `size` samples for `reader`; fewer at the end, empty when done."""
+        with self._cond:
+            while self._written - self._cursors[reader] < size and not self._closed:
+                self._wait()
+            if self._error is not None:
+                raise self._error
+            cursor = self._cursors[reader]
+            n = min(size, self._written - cursor)
+            start = cursor % self.capacity
+            first = min(n, self.capacity - start)
+            out = np.concatenate([self._data[start:start + first], self._data[:n - first]])
+            self._cursors[reader] = cursor + n
+            self._cond.notify_all()
+            return out
+
+    def detach(self, reader):
+        # a reader that stopped early must not hold the writer back
+        with self._cond:
+            self._cursors.pop(reader, None)
+            self._cond.notify_all()
+
+    def close(self, error=None):
+        with self._cond:
+            self._closed = True
+            self._error = error
+            self._cond.notify_all()
+
+
+class AudioStream:
+    """16 kHz mono PCM arriving from ffmpeg, fanned out while it downloads.
+
+    `pump()` reads s16le from a pipe, appends it to the WAV file and feeds the
+    ring buffer; each consumer iterates `blocks(reader)` in its own thread.
+    """
+
+    def __init__(self, readers, capacity_seconds=DEFAULT_CAPACITY_SECONDS,
+                 block_seconds=DEFAULT_BLOCK_SECONDS, on_partial=None):
+        self.readers = tuple(readers)
+        self.block_size = int(block_seconds * TARGET_SR)
+        self.ring = PCMRingBuffer(max(capacity_seconds * TARGET_SR, 2 * self.block_size), self.readers)
+        # called as on_partial(reader, findings) while the stream is running
+        self.on_partial = on_partial
+        self.error = None
+
+    def pump(self, pipe, wav_path):
+        import soundfile as sf
+        try:
+            with sf.SoundFile(wav_path, "w", samplerate=TARGET_SR, channels=1, subtype="PCM_16") as wav:
+                carry = b""
+                while True:
+                    raw = pipe.read(self.block_size * 2)
+                    if not raw:
+                        break
+                    raw = carry + raw
+                    usable = len(raw) - len(raw) % 2
+                    raw, carry = raw[:usable], raw[usable:]
+                    pcm = np.frombuffer(raw, dtype="<i2")
+                    wav.write(pcm)
+                    self.ring.write(pcm.astype(np.float32) / 32768.0)
+        except BaseException as e:
+            # runs in its own thread; the downloader re-raises it after join.
+            # Drain the pipe so ffmpeg isn't left blocked on a full stdout.
+            self.error = e
+            try:
+                while pipe.read(1 << 16):
+                    pass
+            except (OSError, ValueError):
+                pass
+        finally:
+            self.ring.close(self.error)
+
+    def close(self, error=None):
+        self.ring.close(error)
+
+    def blocks(self, reader):
+        try:
+            while True:
+                block = self.ring.read(reader, self.block_size)
+                if not len(block):
+                    return
+                yield block
+        finally:
+            self.ring.detach(reader)
+
+    def consume(self, reader, tracker, partial_every=30.0):
+        """Feed every block to `tracker`; returns tracker.finish()."""
+        next_partial = partial_every * TARGET_SR
+        for block in self.blocks(reader):
+            tracker.feed(block)
+            if self.on_partial and tracker.total >= next_partial:
+                next_partial += partial_every * TARGET_SR
+                self.on_partial(reader, tracker.partial())
+        return tracker.finish()
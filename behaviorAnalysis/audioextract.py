@@ -1,20 +1,15 @@
 import os
 import subprocess
 
-def extract_audio(video_path, audio_path):
+import media_info
+
+def extract_audio(video_path, audio_path, media=None):
     # 1. probe for audio
-    probe_cmd = [
-        "ffprobe", "-v", "error",
-        "-select_streams", "a:0",
-        "-show_entries", "stream=codec_type",
-        "-of", "default=noprint_wrappers=1:nokey=1",
-        video_path
-    ]
     try:
-        has_audio = subprocess.check_output(probe_cmd, stderr=subprocess.DEVNULL)
+        has_audio = (media or media_info.probe(video_path)).has_audio
     except subprocess.CalledProcessError:
-        has_audio = b""
-    if not has_audio.strip():
+        has_audio = False
+    if not has_audio:
         print("[Info] No audio stream found. Skipping extraction.")
         return None
 
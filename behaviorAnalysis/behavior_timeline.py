@@ -0,0 +1,148 @@
+import numpy as np
+
+from analysis_result import BehaviorEpisode
+from Openface_Analysis import OpenFaceStats
+
+# windowed ratios are centered on every OpenFace row
+WINDOW_SECONDS = 10.0
+# blinks come every few seconds; a short window without one means little
+BLINK_WINDOW_SECONDS = 30.0
+# runs closer than this are one episode; shorter episodes are dropped
+MERGE_GAP_SECONDS = 2.0
+MIN_EPISODE_SECONDS = 2.0
+# windows with fewer rows than this are never flagged
+MIN_WINDOW_ROWS = 3
+
+# signal: (label, window seconds, ratio of hits that flags a window)
+SIGNALS = {
+    "downward":  ("looked down", WINDOW_SECONDS, OpenFaceStats.RATIO),
+    "turning":   ("turned head away", WINDOW_SECONDS, OpenFaceStats.RATIO),
+    "tilt":      ("tilted head", WINDOW_SECONDS, OpenFaceStats.RATIO),
+    # a hit is a row without a blink; flagged when blinks fall under 1%
+    "blink":     ("did not blink", BLINK_WINDOW_SECONDS, 0.99),
+    "offscreen": ("looked away", WINDOW_SECONDS, OpenFaceStats.RATIO),
+}
+
+
+def params():
+    """The windowing constants, for stage cache keys."""
+    return {"window": WINDOW_SECONDS, "blink_window": BLINK_WINDOW_SECONDS,
+            "merge_gap": MERGE_GAP_SECONDS, "min_episode": MIN_EPISODE_SECONDS,
+            "min_window_rows": MIN_WINDOW_ROWS}
+
+
+def signal_hits(stats):
+    """Per-row boolean hits for each signal whose columns OpenFace wrote."""
+    S = OpenFaceStats
+    columns = stats.columns or set()
+    col = stats.column
+    hits = {}
+    # NaN compares False, as in OpenFaceStats
+    with np.errstate(invalid="ignore"):
+        if "pose_Rx" in columns:
+            hits["downward"] = col("pose_Rx") < S.PITCH_DOWN
+        if "pose_Ry" in columns:
+            hits["turning"] = np.abs(col("pose_Ry")) > S.YAW
+        if "pose_Rz" in columns:
+            hits["tilt"] = np.abs(col("pose_Rz")) > S.ROLL
+        if "AU45_r" in columns:
+            hits["blink"] = ~(col("AU45_r") > S.BLINK)
+        if "gaze_angle_x" in columns and "gaze_angle_y" in columns:
+            hits["offscreen"] = (np.abs(col("gaze_angle_x")) > S.GAZE) | (np.abs(col("gaze_angle_y")) > S.GAZE)
+    return hits
+
+
+def window_ratio(t, hits, window):
+    """Share of hits in the `window` seconds centered on each row, and the row count.
+
+    One cumulative sum plus two binary searches; rows need not be evenly spaced.
+    """
+    csum = np.concatenate(([0], np.cumsum(hits, dtype=np.int64)))
+    lo = np.searchsorted(t, t - window / 2, side="left")
+    hi = np.searchsorted(t, t + window / 2, side="right")
+    rows = hi - lo
+    return (csum[hi] - csum[lo]) / np.maximum(rows, 1), rows
+
+
+def runs(active):
+    """(starts, ends) of the True runs in `active`, ends exclusive."""
+    edges = np.diff(np.concatenate(([0], active.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+class BehaviorTimeline:
+    """Windowed behavior ratios over one session and the episodes they flag.
+
+    `t` holds the row times; `ratios[signal]` the windowed ratio per row.
+    """
+
+    def __init__(self, t, ratios, episodes):
+        self.t = t
+        self.ratios = ratios
+        self.episodes = episodes
+
+    @classmethod
+    def from_stats(cls, stats):
+        t = stats.column("timestamp") if "timestamp" in (stats.columns or ()) else np.zeros(0, np.float32)
+        finite = np.isfinite(t)
+        t = t[finite].astype(np.float64)
+        ratios, episodes = {}, []
+        for signal, hits in signal_hits(stats).items():
+            label, window, threshold = SIGNALS[signal]
+            hits = hits[finite]
+            ratio, rows = window_ratio(t, hits, window)
+            ratios[signal] = ratio.astype(np.float32)
+            episodes += _episodes(signal, label, t, hits, ratio, (ratio > threshold) & (rows >= MIN_WINDOW_ROWS))
+        return cls(t.astype(np.float32), ratios, episodes)
+
+    def save(self, path):
+        """Write everything as a compressed .npz of flat arrays."""
+        signals = list(SIGNALS)
+        np.savez_compressed(
+            path,
+            t=self.t,
+            signals=np.array(signals),
+            **{f"ratio_{name}": r.astype(np.float16) for name, r in self.ratios.items()},
+            episode_signal=np.array([signals.index(e.signal) for e in self.episodes], dtype=np.uint8),
+            episode_start=np.array([e.start for e in self.episodes], dtype=np.float32),
+            episode_end=np.array([e.end for e in self.episodes], dtype=np.float32),
+            episode_peak=np.array([e.peak for e in self.episodes], dtype=np.float32),
+        )
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            signals = [str(s) for s in data["signals"]]
+            ratios = {name: data[f"ratio_{name}"].astype(np.float32)
+                      for name in signals if f"ratio_{name}" in data}
+            episodes = [
+                BehaviorEpisode(signals[i], SIGNALS[signals[i]][0], float(start), float(end), float(peak))
+                for i, start, end, peak in zip(data["episode_signal"], data["episode_start"],
+                                               data["episode_end"], data["episode_peak"])
+            ]
+            return cls(data["t"], ratios, episodes)
+
+
+def _episodes(signal, label, t, hits, ratio, active):
+    starts, ends = runs(active)
+    if not len(starts):
+        return []
+    # close gaps between neighbouring runs
+    gaps = t[starts[1:]] - t[ends[:-1] - 1]
+    breaks = gaps > MERGE_GAP_SECONDS
+    starts = starts[np.concatenate(([True], breaks))]
+    ends = ends[np.concatenate((breaks, [True]))]
+
+    episodes = []
+    for s, e in zip(starts, ends):
+        # report the span of actual hits, not of the windows around them
+        inside = np.flatnonzero(hits[s:e])
+        if not len(inside):
+            continue
+        start, end = float(t[s + inside[0]]), float(t[s + inside[-1]])
+        if end - start < MIN_EPISODE_SECONDS:
+            continue
+        episodes.append(BehaviorEpisode(signal, label, round(start, 3), round(end, 3),
+                                        round(float(ratio[s:e].max()), 3)))
+    return episodes
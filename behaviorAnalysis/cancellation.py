@@ -0,0 +1,106 @@
+import threading
+import contextvars
+from contextlib import contextmanager
+
+_current_token = contextvars.ContextVar("overwatch_cancel_token", default=None)
+
+# how long a child gets to exit after terminate() before it is killed
+KILL_GRACE_SECONDS = 0.5
+
+
+class Cancelled(Exception):
+    pass
+
+
+class CancellationToken:
+    """Cooperative cancellation for one job.
+
+    Stages call `raise_if_cancelled()` between units of work. Child processes
+    registered through `track()` are terminated as soon as `cancel()` is
+    called, so ffmpeg / OpenFace stop using CPU right away.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._procs = set()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            self._event.set()
+            procs = list(self._procs)
+        for proc in procs:
+            _stop_process(proc)
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise Cancelled("Analysis was cancelled")
+
+    def wait(self, timeout=None):
+        return self._event.wait(timeout)
+
+    @contextmanager
+    def track(self, proc):
+        with self._lock:
+            self._procs.add(proc)
+            cancelled = self._event.is_set()
+        if cancelled:
+            _stop_process(proc)
+        try:
+            yield proc
+        finally:
+            with self._lock:
+                self._procs.discard(proc)
+
+    def activate(self):
+        # returns a token for deactivate()
+        return _current_token.set(self)
+
+    def deactivate(self, token):
+        _current_token.reset(token)
+
+
+def _stop_process(proc):
+    if proc.poll() is not None:
+        return
+    try:
+        proc.terminate()
+    except OSError:
+        return
+
+    def kill_if_alive():
+        if proc.poll() is None:
+            try:
+                proc.kill()
+            except OSError:
+                pass
+
+    timer = threading.Timer(KILL_GRACE_SECONDS, kill_if_alive)
+    timer.daemon = True
+    timer.start()
+
+
+def current_token():
+    return _current_token.get()
+
+
+def check():
+    """Raise Cancelled if the active job has been cancelled."""
+    token = _current_token.get()
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+@contextmanager
+def tracked(proc):
+    """Register a child process with the active job's token, if any."""
+    token = _current_token.get()
+    if token is None:
+        yield proc
+        return
+    with token.track(proc):
+        yield proc
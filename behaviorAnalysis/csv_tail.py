@@ -0,0 +1,68 @@
+import os
+
+# bytes read per step when a finished file is read through in chunks
+CHUNK_BYTES = 1024 * 1024
+
+
+class CSVTail:
+    """Reads a CSV that another process is still appending to.
+
+    Only bytes appended since the last call are read; a trailing partial line
+    is kept until the writer finishes it. The first line is taken as the
+    header and stored in `header`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.header = None
+        self.rows_read = 0
+        self.at_end = False
+        self._file = None
+        self._partial = b""
+
+    def read_lines(self, final=False, size=-1):
+        """New complete data lines; with `final`, also an unterminated last line.
+
+        `size` caps the bytes read by this call; `final` then only applies
+        once the end of the file is reached (`at_end`).
+        """
+        if self._file is None:
+            if not os.path.exists(self.path):
+                return []
+            self._file = open(self.path, "rb")
+
+        data = self._file.read(size)
+        self.at_end = size < 0 or not data
+        chunks = self._partial + data
+        lines = chunks.split(b"\n")
+        self._partial = lines.pop()
+        if final and self.at_end and self._partial.strip():
+            lines.append(self._partial)
+            self._partial = b""
+
+        text = [line.decode("utf-8", errors="ignore").rstrip("\r") for line in lines if line.strip()]
+        if self.header is None and text:
+            self.header = [name.strip() for name in text.pop(0).split(",")]
+        self.rows_read += len(text)
+        return text
+
+    def read_chunks(self, size=CHUNK_BYTES):
+        """The rest of a finished file as lists of lines, about `size` bytes each.
+
+        Only one chunk is held at a time; `header` is set after the first.
+        """
+        while True:
+            yield self.read_lines(final=True, size=size)
+            if self._file is None or self.at_end:
+                return
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
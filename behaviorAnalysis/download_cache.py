@@ -0,0 +1,203 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+import cancellation
+from segmented_download import DEFAULT_RETRIES, HEADERS, range_probe, retry
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "OVERWATCH_DOWNLOAD_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".overwatch", "downloads"),
+)
+DEFAULT_MAX_BYTES = int(os.environ.get("OVERWATCH_DOWNLOAD_CACHE_MAX_BYTES", 50 * 1024**3))
+
+# Query parameters that only authorize a request (GCS, S3, Azure signed URLs);
+# they change on every link and say nothing about which object it is.
+SIGNATURE_PARAMS = {
+    "googleaccessid", "expires", "signature",
+    "x-goog-algorithm", "x-goog-credential", "x-goog-date", "x-goog-expires",
+    "x-goog-signedheaders", "x-goog-signature",
+    "x-amz-algorithm", "x-amz-credential", "x-amz-date", "x-amz-expires",
+    "x-amz-signedheaders", "x-amz-signature", "x-amz-security-token",
+    "sv", "ss", "srt", "sp", "se", "st", "spr", "sig", "sr", "skoid", "sktid",
+}
+
+
+def object_identity(url):
+    """`url` without signature parameters: the same recording, whatever the link."""
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if k.lower() not in SIGNATURE_PARAMS)
+    identity = f"{parts.scheme}://{parts.netloc}{parts.path}"
+    return identity + ("?" + urlencode(query) if query else "")
+
+
+class SourceURL(str):
+    """A video URL whose stage-cache fingerprint is the object, not the link.
+
+    Behaves as a plain string everywhere else.
+    """
+
+    def fingerprint(self):
+        identity = object_identity(self)
+        try:
+            size, etag, _ = range_probe(self)
+            identity += f"|{size}|{etag}"
+        except Exception:
+            pass  # offline or not HTTP: the path alone identifies it
+        return hashlib.sha256(identity.encode()).hexdigest()
+
+
+class DownloadCache:
+    """Local copies of remote recordings, keyed by object identity plus size/ETag.
+
+    Partial downloads are kept and resumed with HTTP Range; complete ones are
+    served from disk. Least recently used entries are evicted past `max_bytes`.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None, retries=DEFAULT_RETRIES):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes or DEFAULT_MAX_BYTES
+        self.retries = retries
+        self._locks = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry(self, url):
+        key = hashlib.sha256(object_identity(url).encode()).hexdigest()
+        entry = os.path.join(self.cache_dir, key)
+        return key, os.path.join(entry, "data"), os.path.join(entry, "meta.json")
+
+    def _read_meta(self, meta_path):
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, meta_path, meta):
+        tmp = meta_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, meta_path)
+
+    def fetch(self, url, dest=None, chunk_size=1024 * 1024):
+        """Local path of the object at `url`, downloading only what is missing.
+
+        With `dest` the file is also linked (or copied) there.
+        """
+        key, data_path, meta_path = self._entry(url)
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            path = self._fetch(url, data_path, meta_path, chunk_size)
+        if dest:
+            _link_or_copy(path, dest)
+            path = dest
+        self.evict()
+        return path
+
+    def _fetch(self, url, data_path, meta_path, chunk_size):
+        meta = self._read_meta(meta_path)
+        try:
+            size, etag, _ = range_probe(url)
+        except Exception as e:
+            if meta.get("complete") and os.path.exists(data_path):
+                print(f"WARNING: Could not reach source ({e}); using cached copy")
+                os.utime(meta_path)
+                return data_path
+            raise
+
+        if meta.get("size") != size or meta.get("etag") != etag:
+            # a different object at that path (or nothing cached yet)
+            if os.path.exists(data_path):
+                os.remove(data_path)
+            meta = {"identity": object_identity(url), "size": size, "etag": etag, "complete": False}
+        if meta.get("complete") and os.path.exists(data_path):
+            print(f"[download cache] reusing {meta['identity']}")
+            os.utime(meta_path)
+            return data_path
+
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        self._write_meta(meta_path, meta)
+        # each attempt resumes from whatever the last one wrote
+        retry(lambda: self._resume(url, data_path, size, chunk_size), "download", self.retries)
+
+        meta["complete"] = True
+        self._write_meta(meta_path, meta)
+        return data_path
+
+    def _resume(self, url, data_path, size, chunk_size):
+        import requests
+        have = os.path.getsize(data_path) if os.path.exists(data_path) else 0
+        if size is not None and have >= size:
+            return
+        headers = dict(HEADERS)
+        if have:
+            headers["Range"] = f"bytes={have}-"
+        with requests.get(url, headers=headers, stream=True, timeout=30) as r:
+            r.raise_for_status()
+            if have and r.status_code != 206:
+                have = 0  # server ignored the range; start over
+            with open(data_path, "r+b" if have else "wb") as f:
+                f.seek(have)
+                f.truncate()
+                for chunk in r.iter_content(chunk_size=chunk_size):
+                    cancellation.check()
+                    f.write(chunk)
+                    have += len(chunk)
+        if size is not None and have < size:
+            raise IOError(f"short read: {have} of {size} bytes")
+
+    def entries(self):
+        found = []
+        for name in os.listdir(self.cache_dir):
+            meta_path = os.path.join(self.cache_dir, name, "meta.json")
+            data_path = os.path.join(self.cache_dir, name, "data")
+            if not os.path.isfile(meta_path):
+                continue
+            try:
+                size = os.path.getsize(data_path) if os.path.exists(data_path) else 0
+                found.append((os.path.getmtime(meta_path), size, name))
+            except OSError:
+                continue
+        return found
+
+    def evict(self):
+        with self._lock:
+            entries = sorted(self.entries())  # oldest access first
+            total = sum(size for _, size, _ in entries)
+            # the newest entry stays even when it alone is over the cap
+            while len(entries) > 1 and total > self.max_bytes:
+                _, size, name = entries.pop(0)
+                shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+                total -= size
+
+    def clear(self):
+        with self._lock:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+
+def _link_or_copy(src, dest):
+    os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+    if os.path.exists(dest):
+        os.remove(dest)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copy2(src, dest)
+
+
+_default_cache = None
+
+
+def fetch(url, dest=None):
+    """Fetch through the process-wide default cache."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = DownloadCache()
+    return _default_cache.fetch(url, dest)
@@ -0,0 +1,294 @@
+import os
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+import cv2
+import numpy as np
+
+import cancellation
+import media_info
+import tracing
+from frame_sequence import FrameSequence
+
+# frames per forward pass; requests from several jobs are packed together
+BATCH_SIZE = int(os.environ.get("OVERWATCH_FACE_BATCH", 16))
+MODEL_DIR = os.environ.get(
+    "OVERWATCH_FACE_MODEL_DIR",
+    os.path.join(os.path.expanduser("~"), ".overwatch", "models", "face"),
+)
+MODEL_URLS = {
+    "deploy.prototxt":
+        "https://raw.githubusercontent.com/opencv/opencv/4.x/samples/dnn/face_detector/deploy.prototxt",
+    "res10_300x300_ssd_iter_140000.caffemodel":
+        "https://raw.githubusercontent.com/opencv/opencv_3rdparty/dnn_samples_face_detector_20170830/"
+        "res10_300x300_ssd_iter_140000.caffemodel",
+    "lbfmodel.yaml":
+        "https://raw.githubusercontent.com/kurnianggoro/GSOC2017/master/data/lbfmodel.yaml",
+}
+
+# the OpenFace columns analyze_behavior reads, in FeatureExtraction's order
+COLUMNS = ("frame", "face_id", "timestamp", "confidence", "success",
+           "pose_Rx", "pose_Ry", "pose_Rz", "gaze_angle_x", "gaze_angle_y", "AU45_r")
+
+MIN_CONFIDENCE = 0.5
+# eye aspect ratio of an open / a closed eye; AU45_r scales 0..5 between them
+EAR_OPEN = 0.25
+EAR_CLOSED = 0.15
+# radians of gaze for a pupil at the edge of the eye opening
+EYE_GAIN = 0.5
+
+# generic face in camera axes (x right, y down, z away), nose tip at the origin;
+# 68-point landmark indices: nose tip, chin, outer eye corners, mouth corners
+MODEL_POINTS = np.array([
+    (0.0, 0.0, 0.0),
+    (0.0, 330.0, 65.0),
+    (-225.0, -170.0, 135.0),
+    (225.0, -170.0, 135.0),
+    (-150.0, 150.0, 125.0),
+    (150.0, 150.0, 125.0),
+])
+LANDMARKS = [30, 8, 36, 45, 48, 54]
+
+
+def _model_path(name, model_dir):
+    path = os.path.join(model_dir, name)
+    if not os.path.exists(path):
+        import requests
+        os.makedirs(model_dir, exist_ok=True)
+        print(f"Downloading face model {name}...")
+        with requests.get(MODEL_URLS[name], stream=True, timeout=60) as r:
+            r.raise_for_status()
+            with open(path + ".tmp", "wb") as f:
+                for chunk in r.iter_content(chunk_size=1024 * 1024):
+                    f.write(chunk)
+        os.replace(path + ".tmp", path)
+    return path
+
+
+class FaceEngine:
+    """CPU face detection, head pose, blink and coarse gaze with OpenCV.
+
+    The res10 SSD detector (OpenCV DNN) runs on whole batches; 68 LBF
+    landmarks per detected face then give head pose (solvePnP on a generic
+    face), an eye-aspect-ratio blink intensity and a gaze angle from head
+    pose plus the darkest spot in each eye. Rows carry the OpenFace columns
+    analyze_behavior reads, with pose_Rx negative when looking down as
+    OpenFaceStats expects. Not thread-safe; share it through FaceBatcher.
+    """
+
+    def __init__(self, model_dir=None):
+        model_dir = model_dir or MODEL_DIR
+        self.detector = cv2.dnn.readNetFromCaffe(
+            _model_path("deploy.prototxt", model_dir),
+            _model_path("res10_300x300_ssd_iter_140000.caffemodel", model_dir))
+        self.detector.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.detector.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.facemark = cv2.face.createFacemarkLBF()
+        self.facemark.loadModel(_model_path("lbfmodel.yaml", model_dir))
+
+    def analyze(self, images):
+        """One row per image (None for unreadable images), without frame/timestamp."""
+        valid = [i for i, image in enumerate(images) if image is not None]
+        best = {}
+        if valid:
+            blob = cv2.dnn.blobFromImages([images[i] for i in valid], 1.0, (300, 300), (104.0, 177.0, 123.0))
+            self.detector.setInput(blob)
+            # (K, 7): batch index, class, confidence, x1, y1, x2, y2 (relative)
+            for b, _, conf, x1, y1, x2, y2 in self.detector.forward()[0, 0]:
+                i = valid[int(b)]
+                if conf >= MIN_CONFIDENCE and conf > best.get(i, (0.0,))[0]:
+                    best[i] = (float(conf), (x1, y1, x2, y2))
+
+        rows = []
+        for i, image in enumerate(images):
+            if i not in best:
+                rows.append(_failed(0.0))
+                continue
+            conf, box = best[i]
+            rows.append(self._measure(image, conf, box))
+        return rows
+
+    def _measure(self, image, conf, box):
+        h, w = image.shape[:2]
+        x1, y1, x2, y2 = (np.clip(box, 0.0, 1.0) * [w, h, w, h]).astype(np.int32)
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        ok, landmarks = self.facemark.fit(gray, np.array([[x1, y1, x2 - x1, y2 - y1]], dtype=np.int32))
+        if not ok:
+            return _failed(conf)
+        pts = landmarks[0][0].astype(np.float64)
+
+        camera = np.array([[w, 0, w / 2], [0, w, h / 2], [0, 0, 1]], dtype=np.float64)
+        ok, rvec, _ = cv2.solvePnP(MODEL_POINTS, pts[LANDMARKS], camera, None, flags=cv2.SOLVEPNP_ITERATIVE)
+        if not ok:
+            return _failed(conf)
+        pitch, yaw, roll = _euler(cv2.Rodrigues(rvec)[0])
+
+        ear = (_eye_aspect(pts[36:42]) + _eye_aspect(pts[42:48])) / 2
+        blink = 5.0 * float(np.clip((EAR_OPEN - ear) / (EAR_OPEN - EAR_CLOSED), 0.0, 1.0))
+        ox, oy = np.mean([_pupil_offset(gray, pts[36:42]), _pupil_offset(gray, pts[42:48])], axis=0)
+
+        return {
+            "confidence": round(conf, 3), "success": 1,
+            "pose_Rx": -pitch, "pose_Ry": yaw, "pose_Rz": roll,
+            "gaze_angle_x": yaw + EYE_GAIN * ox, "gaze_angle_y": pitch + EYE_GAIN * oy,
+            "AU45_r": blink,
+        }
+
+
+def _failed(conf):
+    # what FeatureExtraction writes for a frame without a tracked face
+    row = {name: 0.0 for name in COLUMNS[5:]}
+    row.update(confidence=round(conf, 3), success=0)
+    return row
+
+
+def _euler(R):
+    # R = Rx(pitch) @ Ry(yaw) @ Rz(roll), the convention OpenFace reports
+    pitch = np.arctan2(-R[1, 2], R[2, 2])
+    yaw = np.arcsin(np.clip(R[0, 2], -1.0, 1.0))
+    roll = np.arctan2(-R[0, 1], R[0, 0])
+    return float(pitch), float(yaw), float(roll)
+
+
+def _eye_aspect(eye):
+    vertical = np.linalg.norm(eye[1] - eye[5]) + np.linalg.norm(eye[2] - eye[4])
+    horizontal = 2 * np.linalg.norm(eye[0] - eye[3])
+    return vertical / horizontal if horizontal else 0.0
+
+
+def _pupil_offset(gray, eye):
+    # darkest point of the eye opening, -1..1 from its center on each axis
+    x, y, w, h = cv2.boundingRect(eye.astype(np.int32))
+    if w < 4 or h < 2:
+        return 0.0, 0.0
+    crop = cv2.GaussianBlur(gray[y:y + h, x:x + w], (3, 3), 0)
+    _, _, (px, py), _ = cv2.minMaxLoc(crop)
+    return (px - w / 2) / (w / 2), (py - h / 2) / (h / 2)
+
+
+class FaceBatcher:
+    """Packs frame batches from any number of jobs into shared forward passes.
+
+    `submit(images)` returns a Future of their rows. One worker thread owns
+    the engine and takes whatever requests are queued, up to `batch_size`
+    frames, per pass.
+    """
+
+    def __init__(self, model="face_engine", batch_size=BATCH_SIZE):
+        self.model = model
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, images):
+        future = Future()
+        self._queue.put((list(images), future))
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="face-batcher", daemon=True)
+                self._thread.start()
+        return future
+
+    def _run(self):
+        from model_pool import models
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0][0])
+            while size < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            try:
+                engine = models.get(self.model)
+                with tracing.span("face_batch", cat="cpu", frames=size, requests=len(batch)):
+                    rows = engine.analyze([image for images, _ in batch for image in images])
+            except BaseException as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            at = 0
+            for images, future in batch:
+                future.set_result(rows[at:at + len(images)])
+                at += len(images)
+
+
+_shared_batcher = None
+_shared_lock = threading.Lock()
+
+
+def shared_batcher():
+    """The process-wide batcher every job's face analysis goes through."""
+    global _shared_batcher
+    with _shared_lock:
+        if _shared_batcher is None:
+            _shared_batcher = FaceBatcher()
+        return _shared_batcher
+
+
+def run_face_engine(video_path, output_dir, media=None, frames=None, on_progress=None, stats=None,
+                    batcher=None):
+    """In-process replacement for runOpenface: same <name>.csv, same `stats` feed.
+
+    Works on the FrameSequence `frames` (sampled like OpenFace's input when
+    not given). Rows go straight to `stats`; the CSV is only written for
+    reviewers. Returns the CSV path; raises OpenFaceIncomplete when there
+    were no frames.
+    """
+    media = media or media_info.probe(video_path)
+    if frames is None:
+        frames = FrameSequence.plan(video_path, os.path.join(output_dir, "frames"), media)
+    paths = frames.files()
+    batcher = batcher or shared_batcher()
+
+    video_name = os.path.splitext(os.path.basename(video_path))[0]
+    csv_path = os.path.join(output_dir, f"{video_name}.csv")
+    start, done = time.time(), 0
+    # one batch in flight while the next is read from disk
+    pending = deque()
+
+    with open(csv_path, "w", encoding="utf-8", newline="") as out, \
+            tracing.span("face_engine", cat="cpu", frames=len(paths)):
+        out.write(", ".join(COLUMNS) + "\n")
+
+        def collect():
+            nonlocal done
+            first, future = pending.popleft()
+            for k, row in enumerate(future.result()):
+                row = dict(row, frame=frames.frame_number(first + k), face_id=0,
+                           timestamp=frames.timestamp(first + k))
+                out.write(", ".join(_format(row[name]) for name in COLUMNS) + "\n")
+                if stats is not None:
+                    stats.add(row)
+            done += len(future.result())
+            elapsed = time.time() - start
+            rate = done / elapsed if elapsed > 0 else 0.0
+            eta = (len(paths) - done) / rate if rate > 0 else None
+            if on_progress:
+                on_progress(done, len(paths), rate, eta)
+
+        for first in range(0, len(paths), batcher.batch_size):
+            cancellation.check()
+            pending.append((first, batcher.submit(
+                cv2.imread(p) for p in paths[first:first + batcher.batch_size])))
+            if len(pending) > 1:
+                collect()
+        while pending:
+            collect()
+
+    print(f"[Check] Face engine completed. {done} frames processed.")
+    if not done:
+        from Openface_Analysis import OpenFaceIncomplete
+        raise OpenFaceIncomplete("no frames to analyze")
+    return csv_path
+
+
+def _format(value):
+    return str(value) if isinstance(value, int) else f"{value:.3f}"
@@ -0,0 +1,59 @@
+import subprocess
+from contextlib import contextmanager
+
+import cancellation
+
+
+class FFmpegError(RuntimeError):
+    """An ffmpeg / ffprobe run that exited non-zero; the message is the end of its stderr."""
+
+    def __init__(self, cmd, returncode, stderr=""):
+        self.cmd = cmd
+        self.returncode = returncode
+        self.stderr = stderr or ""
+        super().__init__(self.stderr.strip()[-300:] or f"{cmd[0]} exited with {returncode}")
+
+
+def run_ffmpeg(cmd, capture=False):
+    """Run `cmd` to completion under the job's cancellation token.
+
+    Returns its stdout (text) when `capture`, else None; raises FFmpegError
+    if it fails.
+    """
+    stdout = subprocess.PIPE if capture else subprocess.DEVNULL
+    proc = subprocess.Popen(cmd, stdout=stdout, stderr=subprocess.PIPE, text=True)
+    with cancellation.tracked(proc):
+        out, stderr = proc.communicate()
+    cancellation.check()
+    if proc.returncode != 0:
+        raise FFmpegError(cmd, proc.returncode, stderr)
+    return out
+
+
+@contextmanager
+def ffmpeg_pipe(cmd, wait=True):
+    """`cmd`'s binary stdout for the duration of the block.
+
+    With `wait` the process is waited for after the block and a failure
+    raises FFmpegError; without it (the reader may stop before the end) a
+    process still running is killed. Leaving the block on an exception
+    always kills it.
+    """
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    with cancellation.tracked(proc):
+        try:
+            yield proc.stdout
+        except BaseException:
+            proc.kill()
+            raise
+        else:
+            if not wait and proc.poll() is None:
+                proc.kill()
+            stderr = proc.stderr.read().decode(errors="ignore") if wait else ""
+        finally:
+            proc.stdout.close()
+            proc.stderr.close()
+            proc.wait()
+    cancellation.check()
+    if wait and proc.returncode != 0:
+        raise FFmpegError(cmd, proc.returncode, stderr)
@@ -0,0 +1,76 @@
+import os
+
+import cv2
+import numpy as np
+
+import cancellation
+import tracing
+from ffmpeg_run import ffmpeg_pipe
+
+# "sequential": one OpenCV pass, grab() every frame and retrieve() the targets;
+# "ffmpeg": one ffmpeg select pass piping resized BGR frames
+DEFAULT_MODE = os.environ.get("OVERWATCH_FRAME_GRAB", "sequential")
+
+
+def read_frames(video_path, frame_indices, size=None, mode=None):
+    """Yield (index, BGR frame) for each 0-based frame index, in increasing order.
+
+    The video is read front to back once; no frame is seeked to. `size`
+    (width, height) resizes the frames; the ffmpeg mode requires it. Frames
+    past the end of the video are skipped.
+    """
+    targets = sorted({int(i) for i in frame_indices if i >= 0})
+    mode = mode or DEFAULT_MODE
+    with tracing.span("read_frames", cat="cpu", frames=len(targets), mode=mode):
+        if mode == "ffmpeg":
+            yield from _ffmpeg_frames(video_path, targets, size)
+        else:
+            yield from _sequential_frames(video_path, targets, size)
+
+
+def _sequential_frames(video_path, targets, size):
+    # grab() only demuxes and decodes; the BGR conversion in retrieve() is
+    # paid for the targets alone
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise Exception(f"Failed to open video: {video_path}")
+    try:
+        pos = 0
+        for target in targets:
+            cancellation.check()
+            while pos <= target:
+                if not cap.grab():
+                    return
+                pos += 1
+            ok, frame = cap.retrieve()
+            if not ok:
+                continue
+            yield target, cv2.resize(frame, size) if size else frame
+    finally:
+        cap.release()
+
+
+def _ffmpeg_frames(video_path, targets, size):
+    if not size:
+        raise ValueError("ffmpeg frame reading needs an output size")
+    if not targets:
+        return
+    w, h = size
+    # a sum of eq() terms is fine for frame-sheet sized target lists
+    select = "+".join(f"eq(n,{t})" for t in targets)
+    cmd = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-i", video_path, "-map", "0:v:0", "-an",
+        "-vf", f"select='{select}',scale={w}:{h}",
+        "-vsync", "vfr", "-pix_fmt", "bgr24", "-f", "rawvideo", "pipe:1"
+    ]
+    frame_bytes = w * h * 3
+    # the consumer may stop early, and the last target is usually well
+    # before the end; don't leave ffmpeg decoding the rest
+    with ffmpeg_pipe(cmd, wait=False) as pipe:
+        for target in targets:
+            raw = pipe.read(frame_bytes)
+            if len(raw) < frame_bytes:
+                break
+            # copied: callers draw on the frames
+            yield target, np.frombuffer(raw, dtype=np.uint8).reshape(h, w, 3).copy()
@@ -0,0 +1,144 @@
+import os
+import math
+import hashlib
+import threading
+
+import tracing
+import motion_sampling
+from ffmpeg_run import ffmpeg_pipe, run_ffmpeg
+
+# "frames" feeds OpenFace ffmpeg-sampled images (-fdir); "video" lets it
+# decode the whole video and skip frames itself (-frame_skip)
+DEFAULT_FEED = os.environ.get("OVERWATCH_OPENFACE_FEED", "frames")
+TARGET_FPS = 3
+MAX_FRAMES = 10000
+# sampled frames are scaled down to at most this height; faces in an
+# interview still span well over OpenFace's minimum size
+DEFAULT_HEIGHT = int(os.environ.get("OVERWATCH_FRAME_HEIGHT", 480))
+
+
+def frame_skip(fps, total, target_fps=TARGET_FPS, max_frames=MAX_FRAMES):
+    """Keep every n-th frame: ~`target_fps`, but never more than `max_frames`."""
+    skip = max(1, int(round(fps / target_fps)))
+    if total / skip > max_frames:
+        skip = math.ceil(total / max_frames)
+    return skip
+
+
+class FrameSequence:
+    """Every `skip`-th frame of a video as numbered JPEGs in `directory`.
+
+    Nothing is decoded until `ensure()`, so a stage can hand this on and a
+    cached consumer never pays for the extraction. Image i (0-based) is
+    frame `i * skip` of the video. With `motion_budget` (a share of that
+    even sample) the frames are instead chosen where the picture changes;
+    see motion_sampling.
+    """
+
+    def __init__(self, video_path, directory, fps, skip, height=DEFAULT_HEIGHT, total=0, motion_budget=None):
+        self.video_path = video_path
+        self.directory = directory
+        self.fps = fps
+        self.skip = skip
+        self.height = height
+        self.total = total
+        self.motion_budget = motion_budget
+        # video frame of each image when they aren't evenly spaced
+        self.indices = None
+        self._files = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def plan(cls, video_path, directory, media, height=DEFAULT_HEIGHT, motion_budget=None):
+        fps = media.fps or 30.0
+        return cls(video_path, directory, fps, frame_skip(fps, media.frame_count), height,
+                   media.frame_count, motion_budget)
+
+    @property
+    def sample_fps(self):
+        return self.fps / self.skip
+
+    def ensure(self):
+        """Extract the frames if that hasn't happened yet; returns the directory."""
+        with self._lock:
+            if self._files is None:
+                if self.motion_budget:
+                    self._extract_adaptive()
+                else:
+                    self._extract()
+                self._files = sorted(f for f in os.listdir(self.directory) if f.endswith(".jpg"))
+        return self.directory
+
+    def _extract_adaptive(self):
+        # one decode: candidates at twice the even rate are written out while
+        # their tiny gray copies are scored; the budget then keeps the ones
+        # around motion and the rest are deleted
+        os.makedirs(self.directory, exist_ok=True)
+        dense = max(1, self.skip // 2)
+        w, h = motion_sampling.PROBE_SIZE
+        cmd = [
+            "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+            "-i", self.video_path, "-an",
+            "-filter_complex",
+            f"[0:v:0]select='not(mod(n,{dense}))',split=2[p][k];"
+            f"[p]scale={w}:{h},format=gray[probe];"
+            f"[k]scale=-2:'min({self.height},ih)'[keep]",
+            "-vsync", "vfr",
+            "-map", "[probe]", "-f", "rawvideo", "pipe:1",
+            "-map", "[keep]", "-q:v", "3", os.path.join(self.directory, "frame_%06d.jpg")
+        ]
+        with tracing.span("extract_frames", cat="ext", skip=dense, height=self.height, adaptive=True):
+            with ffmpeg_pipe(cmd) as pipe:
+                scores = motion_sampling.motion_scores(motion_sampling.read_gray(pipe))
+
+        candidates = sorted(f for f in os.listdir(self.directory) if f.endswith(".jpg"))
+        scores = scores[:len(candidates)]
+        even = math.ceil(self.total / self.skip) if self.total else len(candidates) // 2
+        budget = min(max(1, int(even * self.motion_budget)), MAX_FRAMES)
+        keep = motion_sampling.allocate(scores, budget)
+        kept = set(keep.tolist())
+        for i, name in enumerate(candidates):
+            if i not in kept:
+                os.remove(os.path.join(self.directory, name))
+        self.indices = [int(i) * dense for i in keep]
+        print(f"Motion sampling kept {len(keep)} of {len(candidates)} candidate frames")
+
+    def _extract(self):
+        os.makedirs(self.directory, exist_ok=True)
+        cmd = [
+            "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+            "-i", self.video_path, "-map", "0:v:0", "-an",
+            "-vf", f"select='not(mod(n,{self.skip}))',scale=-2:'min({self.height},ih)'",
+            "-vsync", "vfr", "-q:v", "3",
+            os.path.join(self.directory, "frame_%06d.jpg")
+        ]
+        with tracing.span("extract_frames", cat="ext", skip=self.skip, height=self.height):
+            run_ffmpeg(cmd)
+
+    def files(self):
+        self.ensure()
+        return [os.path.join(self.directory, f) for f in self._files]
+
+    def __len__(self):
+        self.ensure()
+        return len(self._files)
+
+    def _frame(self, index):
+        # 0-based video frame of image `index`
+        return self.indices[index] if self.indices is not None else index * self.skip
+
+    def timestamp(self, index):
+        return round(self._frame(index) / self.fps, 3)
+
+    def frame_number(self, index):
+        # 1-based, as OpenFace numbers frames
+        return self._frame(index) + 1
+
+    def fingerprint(self):
+        # stands for its content without extracting it
+        from stage_cache import fingerprint
+        key = f"{fingerprint(self.video_path)}|{self.skip}|{self.height}|{self.motion_budget}"
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def __repr__(self):
+        return f"FrameSequence({self.directory!r}, every {self.skip} of {self.fps:.2f} fps)"
@@ -1,159 +1,446 @@
 import os
-import shutil
-import opensmile
-from threading import Thread
+from dataclasses import replace
+from functools import partial
+
+import numpy as np
 
 # from videoDL import download_video
 # from audioextract import extract_audio
 from AudioVideoTreadingDL import download_video_audio
-from speechRythm_torch import analyze_speech_pattern
-from SpeechPattern import flag_sensitive_words
+from speechRythm_torch import measure_speech_pattern, analyze_speech_pattern_shared, SpeechRhythmTracker
+from SpeechPattern import match_sensitive_words
 # from AudioTranscript import transcribe_audio
 # from audioTranscriptWithSpeakers import transcribe_and_diarize
 from google_transcribe import transcribe_and_diarize
-from soundAnalysis_torch import detect_keyboard_sounds
-from BehaviorAnalysis import interpret_behavior
-from Openface_Analysis import runOpenface, analyze_behavior
-
+from soundAnalysis_torch import analyze_keyboard_sounds, KeyboardOnsetTracker
+from BehaviorAnalysis import describe_voice, extract_speech_features
+from Openface_Analysis import runOpenface, retime_csv, OpenFaceStats, OpenFaceIncomplete, FACE_BACKEND
+from behavior_timeline import BehaviorTimeline, params as timeline_params
+from media_info import probe
+from playback import prepare_playback, DEFAULT_MODE as PLAYBACK_MODE
+from stage_graph import Stage, StageGraph, Incomplete
+from audio_buffer import AudioBuffer
+from audio_stream import AudioStream, DEFAULT_STREAMING
+from download_cache import SourceURL
+from stage_cache import StageCache
+from workspace import JobWorkspace, prune_jobs, remove_job
+from tracing import Tracer
+from model_pool import models
+from process_pool import get_dispatcher, shared_array
+from analysis_result import AnalysisResult
+from cancellation import CancellationToken
+import tracing
+import sampling
+from openface_shards import DEFAULT_SHARDS as OPENFACE_SHARDS
+from frame_sequence import FrameSequence, DEFAULT_FEED as OPENFACE_FEED, TARGET_FPS, MAX_FRAMES
+from motion_sampling import DEFAULT_ENABLED as MOTION_SAMPLING, BUDGET_SHARE as MOTION_BUDGET
+
+# analyzers that read the streamed PCM (see HITLRunner.stream_audio)
+STREAM_READERS = ("speech_pattern", "keyboard_sounds")
 
 
 class HITLRunner:
-    def __init__(self, output_dir=None):
+    def __init__(self, output_dir=None, cache_dir=None, cache_max_bytes=None, use_cache=True,
+                 process_workers=None, playback=None, stream_audio=None, download_segments=None,
+                 sample_windows=None, openface_shards=None, openface_visualize=None, openface_feed=None,
+                 face_backend=None, motion_sampling=None):
         self.output_dir      = output_dir or r"C:\Users\julius\Alignerr_vids"
         os.makedirs(self.output_dir, exist_ok=True)
-        self.video_path      = os.path.join(self.output_dir, "video.mp4")
-        self.audio_path      = os.path.join(self.output_dir, "temp_audio.wav")
-        self.transcript_path = os.path.join(self.output_dir, "transcript.txt")
         self.reference_path  = r"C:\Users\julius\Documents\vscode codes\behaviorAnalysis\response_reference.txt"
-
-    def clear_output_folder(self):
-        if os.path.exists(self.output_dir):
-            shutil.rmtree(self.output_dir)
-        os.makedirs(self.output_dir, exist_ok=True)
-
-    def run_analysis(self, video_url, progress_callback=None, status_callback=None):
+        self.percent_download = 40
+        self.whisper_model   = "base"
+        self.phrase_threshold = 0.75
+        self.cache           = StageCache(cache_dir, cache_max_bytes) if use_cache else None
+        # CPU-bound pure-Python analyzers go to worker processes when enabled
+        self.processes       = get_dispatcher(process_workers)
+        # "auto" | "remux" | "encode" | "skip"; see playback.prepare_playback
+        self.playback        = playback or PLAYBACK_MODE
+        # analyze speech rhythm / keyboard sounds while the audio downloads
+        self.stream_audio    = DEFAULT_STREAMING if stream_audio is None else stream_audio
+        # parallel connections per download (segmented_download); None uses the default
+        self.download_segments = download_segments
+        # K > 0 analyzes percent_download% of the video as K windows spread over
+        # the whole recording instead of its first percent_download%
+        self.sample_windows  = sampling.DEFAULT_WINDOWS if sample_windows is None else sample_windows
+        # N > 1 runs OpenFace as N parallel time shards (openface_shards)
+        self.openface_shards = OPENFACE_SHARDS if openface_shards is None else openface_shards
+        # OpenFace's tracking window; only the desktop GUI turns it on
+        self.openface_visualize = openface_visualize
+        # "frames": ffmpeg samples ~3 fps into the job's frames/ directory for
+        # OpenFace (and any other visual stage); "video": OpenFace decodes it all
+        self.openface_feed   = openface_feed or OPENFACE_FEED
+        # "openface": FeatureExtraction per job; "opencv": face_engine in this
+        # process, batched across jobs
+        self.face_backend    = face_backend or FACE_BACKEND
+        # sampled frames follow on-screen motion instead of the clock; only
+        # MOTION_BUDGET of the even sample reaches the face analysis
+        self.motion_sampling = MOTION_SAMPLING if motion_sampling is None else motion_sampling
+
+    def workspace(self, job_id=None):
+        # every job gets its own directory under output_dir; finished jobs
+        # past the retention limits (workspace.KEEP_JOBS / KEEP_DAYS) go first
+        prune_jobs(self.output_dir)
+        return JobWorkspace(self.output_dir, job_id)
+
+    def job_file(self, job_id, name):
+        # where a job publishes `name`; usable before the file exists
+        return os.path.join(self.output_dir, job_id, name)
+
+    def remove_job(self, job_id):
+        # only that job's directory; other jobs may share output_dir
+        return remove_job(self.output_dir, job_id)
+
+    # ─── STAGES ─────────────────────────────────────────────────────────────────
+
+    def download_task(self, video_url, ws, audio_stream=None):
+        return download_video_audio(video_url, ws.work_dir, self.percent_download,
+                                    audio_stream=audio_stream, segments=self.download_segments,
+                                    windows=self.sample_windows)
+
+    def load_audio_task(self, audio_file):
+        # Decoded once; every audio analyzer shares this buffer
+        return AudioBuffer.load(audio_file)
+
+    def probe_task(self, video_file):
+        # the one ffprobe of the job; later consumers get this instead of re-probing
+        return probe(video_file)
+
+    def playback_task(self, video_file, media, ws):
+        # off the critical path: only the GUI waits for this
+        return prepare_playback(video_file, ws.path("playback.mp4"), media, self.playback)
+
+    def frames_task(self, video_file, media, ws):
+        # only planned here; the first stage that needs the images extracts them
+        return FrameSequence.plan(video_file, ws.path("frames"), media,
+                                  motion_budget=MOTION_BUDGET if self.motion_sampling else None)
+
+    def openface_task(self, video_file, media, ws, frames=None, on_progress=None):
+        def report(done, expected, rate, eta):
+            if on_progress:
+                eta_text = f", ~{eta:.0f}s left" if eta is not None else ""
+                on_progress("openface", min(done / expected, 1.0) if expected else 0.0,
+                            f"OpenFace: {done}/{expected} frames at {rate:.1f} fps{eta_text}")
+        # rows are summarized as OpenFace writes them, so the findings are
+        # ready when it exits
+        stats = OpenFaceStats()
+        incomplete = None
+        try:
+            if self.face_backend == "opencv":
+                # OpenCV is only needed, and only imported, for this backend
+                from face_engine import run_face_engine
+                run_face_engine(video_file, ws.work_dir, media, frames, on_progress=report, stats=stats)
+            else:
+                runOpenface(video_file, ws.work_dir, media, on_progress=report, stats=stats,
+                            shards=self.openface_shards, visualize=self.openface_visualize, frames=frames)
+        except OpenFaceIncomplete as e:
+            # the rows so far still go into the report, but never into the cache
+            incomplete = e
+        name = os.path.splitext(os.path.basename(video_file))[0]
+        findings = stats.findings()
+        # the same rows in sliding windows: when each behavior happened
+        with tracing.span("behavior_timeline", cat="cpu", rows=stats.rows):
+            timeline = BehaviorTimeline.from_stats(stats)
+            findings.episodes = timeline.episodes
+            timeline_path = timeline.save(ws.path("behavior_timeline.npz"))
+        outputs = ws.path(f"{name}.csv"), findings, timeline_path
+        if incomplete is not None:
+            raise Incomplete(outputs, str(incomplete))
+        return outputs
+
+    def speech_pattern_task(self, audio):
+        if not self.processes.enabled:
+            return measure_speech_pattern(audio)
+        with shared_array(audio.samples) as samples:
+            return self.processes.call(analyze_speech_pattern_shared, samples, audio.sample_rate)
+
+    def speech_stream_task(self, audio_stream):
+        print("Analyzing speech rhythm while downloading...")
+        result = audio_stream.consume("speech_pattern", SpeechRhythmTracker())
+        print("\n".join(result.summary_lines()))
+        return result
+
+    def keyboard_stream_task(self, audio_stream):
+        print("Analyzing keyboard sounds while downloading...")
+        result = audio_stream.consume("keyboard_sounds", KeyboardOnsetTracker())
+        print("\n".join(result.summary_lines()))
+        return result
+
+    def transcribe_task(self, audio_file, audio, ws):
+        transcript_path = ws.path("transcript.txt")
+        try:
+            # this writes transcript_path itself
+            transcript_text, _ = transcribe_and_diarize(audio_file, transcript_path)
+            print("SUCCESS: Diarized transcript saved.")
+
+            # transcript_text only carries the events; the file has the conversation too
+            with open(transcript_path, "r", encoding="utf-8") as f:
+                transcript = f.read()
+
+        except ValueError as e:
+            print(f"WARNING: Diarization failed: {e}")
+            print("INFO: Falling back to Whisper-only transcript...")
+
+            with models.lease(f"whisper:{self.whisper_model}") as model:
+                result = model.transcribe(audio.samples)
+
+            transcript_lines = [
+                f"[{seg['start']:.2f}s - {seg['end']:.2f}s] [UNKNOWN] {seg['text']}"
+                for seg in result["segments"]
+            ]
+
+            transcript = "### FALLBACK: Whisper-only transcript\n\n" + "".join(line + "\n" for line in transcript_lines)
+            with open(transcript_path, "w", encoding="utf-8") as f:
+                f.write(transcript)
+
+            print("SUCCESS: Whisper-only transcript saved.")
+
+        except Exception as e:
+            print(f"ERROR: Transcription error: {e}")
+            transcript = ""
+
+        return transcript_path, transcript
+
+    def sensitive_words_task(self, transcript_path, reference_path):
+        return self.processes.call(match_sensitive_words, transcript_path, reference_path,
+                                   threshold=self.phrase_threshold)
+
+    def build_graph(self, ws, on_progress=None):
+        # on_progress(stage_name, fraction, message) for stages that report
+        # progress while they run (OpenFace)
+        # stages that hand their work to the process pool just wait on it
+        cpu_bound = "process" if self.processes.enabled else "cpu"
+
+        # Audio-only analyzers hang directly off the download so they overlap
+        # with OpenFace and transcription instead of waiting for them.
+        # `params` makes a stage cacheable; anything that changes its result
+        # besides the input content belongs there.
+        if self.stream_audio:
+            # Fed block by block from the download through "audio_stream". A
+            # live stream has to be fed, so these stages are never cached.
+            speech_stage = Stage("speech_pattern", self.speech_stream_task,
+                                 inputs=["audio_stream"], outputs=["speech"],
+                                 resource="stream", status="Analyzing speech rhythm...")
+            keyboard_stage = Stage("keyboard_sounds", self.keyboard_stream_task,
+                                   inputs=["audio_stream"], outputs=["keyboard"],
+                                   resource="stream", status="Analyzing audio for keyboard sounds...")
+            download_inputs, download_params = ["video_url", "audio_stream"], None
+        else:
+            speech_stage = Stage("speech_pattern", self.speech_pattern_task,
+                                 inputs=["audio"], outputs=["speech"],
+                                 resource=cpu_bound, status="Analyzing speech rhythm...",
+                                 params={"frame_length": 1024, "hop_length": 512})
+            keyboard_stage = Stage("keyboard_sounds", analyze_keyboard_sounds,
+                                   inputs=["audio"], outputs=["keyboard"],
+                                   status="Analyzing audio for keyboard sounds...",
+                                   params={"n_fft": 1024, "hop_length": 512, "onsets_per_sec": 15})
+            download_inputs = ["video_url"]
+            download_params = {"percent_download": self.percent_download, "sample_windows": self.sample_windows}
+
+        # the in-process face engine always works on sampled frames
+        use_frames = self.openface_feed == "frames" or self.face_backend == "opencv"
+        openface_inputs = ["video_file", "media"] + (["frames"] if use_frames else [])
+
+        stages = [
+            Stage("download", partial(self.download_task, ws=ws),
+                  inputs=download_inputs, outputs=["video_file", "audio_file", "timeline"],
+                  resource="io", status="Downloading video and extracting audio...",
+                  params=download_params,
+                  artifacts=["video_file", "audio_file"]),
+            Stage("load_audio", self.load_audio_task,
+                  inputs=["audio_file"], outputs=["audio"],
+                  status="Decoding audio..."),
+            Stage("speech_features", extract_speech_features,
+                  inputs=["audio"], outputs=["features"],
+                  status="Extracting speech features...",
+                  params={"feature_set": "ComParE_2016", "feature_level": "Functionals"}),
+            Stage("behavior_summary", describe_voice,
+                  inputs=["features"], outputs=["vocal"],
+                  status="Analyzing behavior summary..."),
+            Stage("probe", self.probe_task,
+                  inputs=["video_file"], outputs=["media"],
+                  resource="io", status="Reading media info..."),
+            Stage("openface", partial(self.openface_task, ws=ws, on_progress=on_progress),
+                  inputs=openface_inputs, outputs=["openface_csv", "behavior", "behavior_timeline"],
+                  resource="ext" if self.face_backend == "openface" else "cpu",
+                  status="Running OpenFace analysis...",
+                  params={"backend": self.face_backend,
+                          "target_fps": TARGET_FPS, "max_frames": MAX_FRAMES, "shards": self.openface_shards,
+                          "feed": self.openface_feed,
+                          **OpenFaceStats.params(), **timeline_params()},
+                  artifacts=["openface_csv", "behavior_timeline"]),
+            Stage("transcribe", partial(self.transcribe_task, ws=ws),
+                  inputs=["audio_file", "audio"], outputs=["transcript_path", "transcript"],
+                  resource="io", status="Transcribing audio...",
+                  params={"engine": "google", "fallback_model": self.whisper_model},
+                  artifacts=["transcript_path"]),
+            speech_stage,
+            Stage("sensitive_words", self.sensitive_words_task,
+                  inputs=["transcript_path", "reference_path"], outputs=["cheating_indicators"],
+                  resource=cpu_bound, status="Checking transcript for scripted phrasing...",
+                  params={"threshold": self.phrase_threshold, "window_size": 8}),
+            keyboard_stage,
+        ]
+        if use_frames:
+            stages.append(Stage("frames", partial(self.frames_task, ws=ws),
+                                inputs=["video_file", "media"], outputs=["frames"],
+                                resource="io", status="Planning frame sampling..."))
+        if self.playback != "skip":
+            stages.append(Stage("playback", partial(self.playback_task, ws=ws),
+                                inputs=["video_file", "media"], outputs=["playback_copy"],
+                                status="Preparing playback copy...",
+                                params={"mode": self.playback},
+                                artifacts=["playback_copy"]))
+        return StageGraph(stages, cache=self.cache, workdir=ws.work_dir,
+                          # every stream reader needs its own thread or the ring stalls
+                          resource_limits={"process": max(1, self.processes.workers),
+                                           "stream": len(STREAM_READERS)})
+
+    def retime_artifacts(self, results, behavior, timeline):
+        # the scratch copies are rewritten; cached entries hold their own copies
+        path = results["transcript_path"]
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(timeline.retime_text(text))
+        if os.path.exists(results["openface_csv"]):
+            retime_csv(results["openface_csv"], lambda frame, t: timeline.to_original(t),
+                       results["media"].fps or 30.0)
+        path = results["behavior_timeline"]
+        if os.path.exists(path):
+            saved = BehaviorTimeline.load(path)
+            saved.t = np.array([timeline.to_original(float(t)) for t in saved.t], dtype=np.float32)
+            saved.episodes = behavior.episodes
+            saved.save(path)
+
+    # ─── PIPELINE ───────────────────────────────────────────────────────────────
+
+    def run_analysis(self, video_url, progress_callback=None, status_callback=None, job_id=None,
+                     cancel_token=None):
         if not video_url:
             raise Exception("Video URL is missing or invalid.")
 
-        if status_callback: status_callback("Clearing output folder...")
-        self.clear_output_folder()
+        if status_callback: status_callback("Preparing job workspace...")
+        ws = self.workspace(job_id)
         if progress_callback: progress_callback(10)
 
-        # if status_callback: status_callback("Downloading video...")
-        # video_file = download_video(video_url, self.video_path)
-        # if progress_callback: progress_callback(20)
-
-        # if status_callback: status_callback("Extracting audio...")
-        # audio_file = extract_audio(video_file, self.audio_path)
-        # if progress_callback: progress_callback(30)
-        
-        if status_callback: status_callback("Downloading video and extracting audio...")
-        video_file, audio_file, playback_copy = download_video_audio(video_url, self.output_dir)
-        # Playback copy is created during download for immediate GUI playback
-
-        if progress_callback: progress_callback(25)
-
-        if status_callback: status_callback("Extracting speech features...")
-        smile = opensmile.Smile(
-            feature_set=opensmile.FeatureSet.ComParE_2016,
-            feature_level=opensmile.FeatureLevel.Functionals
-        )
-        features = smile.process_file(audio_file)
-        if progress_callback: progress_callback(40)
-
-        if status_callback: status_callback("Analyzing behavior summary...")
-        behavior_summary = interpret_behavior(features)
-        if progress_callback: progress_callback(50)
-
-        # Shared result container
-        thread_results = {"openface": []}
-
-        def run_openface_task():
-            if status_callback: status_callback("Running OpenFace analysis...")
-            runOpenface(video_file, self.output_dir)
-            if progress_callback: progress_callback(60)
-
-            if status_callback: status_callback("Processing OpenFace results...")
-            thread_results["openface"] = analyze_behavior(video_file, self.output_dir)
-            if progress_callback: progress_callback(70)
-
-        def transcribe_task():
+        # Stages and the child processes they start watch this token;
+        # cancel_token.cancel() makes run_analysis raise cancellation.Cancelled.
+        cancel_token = cancel_token or CancellationToken()
+        cancel_scope = cancel_token.activate()
+
+        # One Chrome/Perfetto trace per job, published even when the job fails
+        tracer = Tracer(f"job {ws.job_id}")
+        trace_scope = tracer.activate()
+        try:
+            with tracer.span("run_analysis", cat="job"):
+                result = self._run_job(ws, video_url, progress_callback, status_callback)
+        finally:
+            tracer.deactivate(trace_scope)
+            cancel_token.deactivate(cancel_scope)
             try:
-                if status_callback: status_callback("Transcribing audio...")
-                # this writes self.transcript_path itself
-                transcript_text, _ = transcribe_and_diarize(audio_file, self.transcript_path)
-                print("SUCCESS: Diarized transcript saved.")
-                if progress_callback: progress_callback(80)
-
-            except ValueError as e:
-                print(f"WARNING: Diarization failed: {e}")
-                print("INFO: Falling back to Whisper-only transcript...")
-
-                import whisper
-                import torch
-                device = "cuda" if torch.cuda.is_available() else "cpu"
-                model = whisper.load_model("base", device=device)
-                result = model.transcribe(audio_file)
-
-                transcript_lines = [
-                    f"[{seg['start']:.2f}s - {seg['end']:.2f}s] [UNKNOWN] {seg['text']}"
-                    for seg in result["segments"]
-                ]
-
-                with open(self.transcript_path, "w", encoding="utf-8") as f:
-                    f.write("### FALLBACK: Whisper-only transcript\n\n")
-                    for line in transcript_lines:
-                        f.write(line + "\n")
-
-                print("SUCCESS: Whisper-only transcript saved.")
-                if progress_callback: progress_callback(80)
-
-            except Exception as e:
-                print(f"ERROR: Transcription error: {e}")
-                
-                
-        t1 = Thread(target=run_openface_task)
-        t2 = Thread(target=transcribe_task)
-        t1.start()
-        t2.start()
-        t1.join()
-        t2.join()
-
-        analyze_speech_pattern(audio_file)
-        flagged_summary = flag_sensitive_words(self.transcript_path, self.reference_path)
-        sound_summary = detect_keyboard_sounds(audio_file)
-        if progress_callback: progress_callback(90)
-
-        with open(self.transcript_path, "a", encoding="utf-8") as f:
-            f.write("\n\n---\n\n")
-            f.write("### Cheating Indicator Analysis\n")
-            for item in flagged_summary:
-                f.write(str(item) + "\n")
-
-            f.write("\n### Keyboard Sound Analysis\n")
-            for item in sound_summary:
-                f.write(str(item) + "\n")
-
-            f.write("\n### Behavioral Analysis\n")
-            for item in behavior_summary:
-                f.write(str(item) + "\n")
-
-            f.write("\n### OpenFace Analysis\n")
-            for item in thread_results["openface"]:
-                f.write(str(item) + "\n")
+                ws.publish(tracer.save(ws.path("trace.json")))
+            except OSError as e:
+                print(f"WARNING: Could not write trace: {e}")
+            ws.cleanup()
 
-        if status_callback: status_callback("Finalizing output...")
-        if progress_callback: progress_callback(95)
+        if progress_callback: progress_callback(100)
+        if status_callback: status_callback("Analysis complete")
 
-        with open(self.transcript_path, "r", encoding="utf-8") as f:
-            transcript = f.read()
+        return result
+
+    def _run_job(self, ws, video_url, progress_callback, status_callback):
+        # Stages finish in whatever order the graph allows; progress moves from
+        # 10% to 90% as they complete, plus the fraction reported by running ones.
+        completed = []
+        running = {}
+        reported = [10]
+
+        def report_progress():
+            done = len(completed) + sum(running.values())
+            pct = 10 + int(80 * done / len(graph.stages))
+            # several stages report at once; never move the bar backwards
+            if progress_callback and pct > reported[0]:
+                reported[0] = pct
+                progress_callback(pct)
+
+        def on_stage_progress(name, fraction, message):
+            running[name] = fraction
+            report_progress()
+            if status_callback and message: status_callback(message)
+
+        graph = self.build_graph(ws, on_progress=on_stage_progress)
+
+        def on_stage_start(stage):
+            if status_callback and stage.status: status_callback(stage.status)
+
+        def on_stage_done(stage, outputs):
+            completed.append(stage.name)
+            if stage.name == "probe":
+                tracing.current_tracer().metadata["video_fps"] = outputs["media"].fps
+            if stage.name == "load_audio":
+                tracing.current_tracer().metadata["audio_seconds"] = round(outputs["audio"].duration, 2)
+            if stage.name == "playback" and outputs["playback_copy"]:
+                ws.publish(outputs["playback_copy"])
+            running.pop(stage.name, None)
+            report_progress()
+
+        # signed links change every time; the download is cached per recording
+        initial = {"video_url": SourceURL(video_url), "reference_path": self.reference_path}
+        if self.stream_audio:
+            def on_partial(reader, findings):
+                if status_callback: status_callback(f"{reader} (so far): {findings.summary_lines()[0]}")
+            initial["audio_stream"] = AudioStream(STREAM_READERS, on_partial=on_partial)
 
         try:
-            os.remove(audio_file)
-        except:
-            pass
+            results = graph.run(
+                initial,
+                on_stage_start=on_stage_start,
+                on_stage_done=on_stage_done,
+            )
+        except BaseException as e:
+            # a stage that died before the download ends the stream too
+            if "audio_stream" in initial:
+                initial["audio_stream"].close(e)
+            raise
 
-        if progress_callback: progress_callback(100)
-        if status_callback: status_callback("Analysis complete")
+        if status_callback: status_callback("Finalizing output...")
+        # Report text / Markdown is rendered lazily from this by the caller
+        with tracing.span("report_assembly", cat="cpu"):
+            # analyzers see the stitched sample; every reported time and the
+            # published transcript, OpenFace CSV and behavior timeline are in
+            # the original recording. Only video_file is the stitched clip.
+            timeline = results["timeline"]
+            keyboard = results["keyboard"]
+            behavior = results["behavior"]
+            transcript = results["transcript"]
+            if timeline:
+                keyboard = replace(keyboard, onset_times=[timeline.to_original(t) for t in keyboard.onset_times])
+                behavior = replace(behavior, episodes=[
+                    replace(e, start=timeline.to_original(e.start), end=timeline.to_original(e.end))
+                    for e in behavior.episodes])
+                transcript = timeline.retime_text(transcript)
+                self.retime_artifacts(results, behavior, timeline)
+            result = AnalysisResult(
+                job_id=ws.job_id,
+                transcript=transcript,
+                cheating_indicators=results["cheating_indicators"],
+                keyboard=keyboard,
+                speech=results["speech"],
+                vocal=results["vocal"],
+                openface=behavior,
+                timeline=timeline.to_dict() if timeline else None,
+            )
+        if progress_callback: progress_callback(95)
 
-        return transcript
+        # Audio is scratch only; everything else the reviewer may open later
+        for name in ("transcript_path", "video_file", "openface_csv", "behavior_timeline"):
+            if os.path.exists(results[name]):
+                result.artifacts[name] = ws.publish(results[name])
+        if os.path.exists(ws.published_path("playback.mp4")):
+            result.artifacts["playback_copy"] = ws.published_path("playback.mp4")
+        with open(ws.path("result.json"), "w", encoding="utf-8") as f:
+            f.write(result.to_json(indent=1))
+        result.artifacts["result"] = ws.publish(ws.path("result.json"))
+
+        return result
@@ -1,19 +1,26 @@
 import sys
 import os
+import uuid
 import vlc
 from PyQt5.QtWidgets import QApplication, QMainWindow, QFrame
 from PyQt5.QtCore    import QObject, QThread, pyqtSignal, QTimer
 
 from hitl_app_copy_ui import Ui_BehaviorAnalysis
 from hitl_runner      import HITLRunner
+from model_pool       import models, DEFAULT_PRELOAD
+from cancellation     import CancellationToken, Cancelled
 
 def run_hitl_analysis(video_url,
                     progress_callback=None,
-                    status_callback=None):
-    return HITLRunner().run_analysis(
+                    status_callback=None,
+                    job_id=None,
+                    cancel_token=None):
+    return HITLRunner(openface_visualize=True).run_analysis(
         video_url,
         progress_callback,
-        status_callback
+        status_callback,
+        job_id=job_id,
+        cancel_token=cancel_token
     )
 
 class Worker(QObject):
@@ -24,20 +31,27 @@ class Worker(QObject):
     error             = pyqtSignal(str)
     interrupted       = pyqtSignal()
 
-    def __init__(self, url):
+    def __init__(self, url, job_id):
         super().__init__()
         self.url = url
+        self.job_id = job_id
+        self.cancel_token = CancellationToken()
 
     def run(self):
         if QThread.currentThread().isInterruptionRequested():
             self.interrupted.emit()
             return
         try:
-            transcript = run_hitl_analysis(
+            result = run_hitl_analysis(
                 self.url,
                 progress_callback=self.progress.emit,
-                status_callback=self.status.emit
+                status_callback=self.status.emit,
+                job_id=self.job_id,
+                cancel_token=self.cancel_token
             )
+        except Cancelled:
+            self.interrupted.emit()
+            return
         except Exception as e:
             if QThread.currentThread().isInterruptionRequested():
                 self.interrupted.emit()
@@ -49,8 +63,9 @@ class Worker(QObject):
             self.interrupted.emit()
             return
 
-        self.result_ready.emit(transcript or "[no transcript]")
-        self.finished.emit(transcript or "")
+        report = result.to_text()
+        self.result_ready.emit(report or "[no transcript]")
+        self.finished.emit(report or "")
 
 
 class MyApp(QMainWindow):
@@ -104,6 +119,8 @@ class MyApp(QMainWindow):
         self.video_check_timer = QTimer()
         self.video_check_timer.timeout.connect(self.check_for_video)
         self.expected_video_path = None
+        # the last job started here; Clear removes its directory
+        self.job_id = None
 
 
     def start_analysis(self):
@@ -119,13 +136,16 @@ class MyApp(QMainWindow):
         self.ui.progressBar.setValue(0)
         self.ui.statusbar.showMessage("Starting analysis")
 
-        # Set expected video path to the playback copy (not locked by OpenFace)
+        # Set expected video path to the playback copy (not locked by OpenFace);
+        # it is published atomically, so it is complete once it exists
+        job_id = uuid.uuid4().hex
+        self.job_id = job_id
         runner = HITLRunner()
-        self.expected_video_path = os.path.join(runner.output_dir, "playback.mp4")
+        self.expected_video_path = runner.job_file(job_id, "playback.mp4")
         self.video_check_timer.start(500)  # Check every 500ms for video
 
         self.thread = QThread()
-        self.worker = Worker(url)
+        self.worker = Worker(url, job_id)
         self.worker.moveToThread(self.thread)
 
         # connect signals
@@ -203,9 +223,14 @@ class MyApp(QMainWindow):
         self.ui.statusbar.showMessage("Ready")
 
         try:
-            runner = HITLRunner()  # use default output_dir
-            runner.clear_output_folder()
-            self.ui.statusbar.showMessage("Output folder cleared")
+            if self.thread and self.thread.isRunning():
+                self.ui.statusbar.showMessage("Stop the analysis before clearing its output")
+                return
+            if self.job_id:
+                HITLRunner().remove_job(self.job_id)  # use default output_dir
+                self.job_id = None
+                self.expected_video_path = None
+            self.ui.statusbar.showMessage("Job output cleared")
         except Exception as e:
             self.ui.statusbar.showMessage(f"Error clearing folder: {e}")
             
@@ -213,6 +238,9 @@ class MyApp(QMainWindow):
         try:
             if self.thread and self.thread.isRunning():
                 self.ui.statusbar.showMessage("Terminating analysis...")
+                # stops ffmpeg / OpenFace right away; the worker then unwinds
+                if self.worker is not None:
+                    self.worker.cancel_token.cancel()
                 self.thread.requestInterruption()
                 self.thread.quit()
 
@@ -234,6 +262,7 @@ class MyApp(QMainWindow):
 
 
 def main():
+    models.preload(DEFAULT_PRELOAD, background=True)
     app = QApplication(sys.argv)
     window = MyApp()
     window.show()
@@ -0,0 +1,181 @@
+import os
+import json
+import hashlib
+import threading
+from dataclasses import dataclass, field, asdict
+from typing import List, Optional
+
+import tracing
+from ffmpeg_run import run_ffmpeg
+
+
+def _rate(value):
+    # ffprobe rates look like "30000/1001"; "0/0" means unknown
+    try:
+        num, _, den = str(value).partition("/")
+        num, den = float(num), float(den or 1)
+    except ValueError:
+        return None
+    return num / den if num and den else None
+
+
+def _number(value, cast=float):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class StreamInfo:
+    index: int
+    codec_type: str
+    codec_name: Optional[str] = None
+    duration: Optional[float] = None
+    # video
+    width: Optional[int] = None
+    height: Optional[int] = None
+    fps: Optional[float] = None
+    nb_frames: Optional[int] = None
+    # audio
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
+
+    @classmethod
+    def from_ffprobe(cls, s):
+        return cls(
+            index=s.get("index", 0),
+            codec_type=s.get("codec_type", ""),
+            codec_name=s.get("codec_name"),
+            duration=_number(s.get("duration")),
+            width=_number(s.get("width"), int),
+            height=_number(s.get("height"), int),
+            fps=_rate(s.get("avg_frame_rate")) or _rate(s.get("r_frame_rate")),
+            nb_frames=_number(s.get("nb_frames"), int),
+            sample_rate=_number(s.get("sample_rate"), int),
+            channels=_number(s.get("channels"), int),
+        )
+
+
+@dataclass
+class MediaInfo:
+    """What one ffprobe call knows about a file or URL."""
+
+    source: str
+    format_name: Optional[str] = None
+    duration: Optional[float] = None
+    size: Optional[int] = None
+    bit_rate: Optional[int] = None
+    streams: List[StreamInfo] = field(default_factory=list)
+
+    @classmethod
+    def from_ffprobe(cls, source, data):
+        fmt = data.get("format", {})
+        return cls(
+            source=source,
+            format_name=fmt.get("format_name"),
+            duration=_number(fmt.get("duration")),
+            size=_number(fmt.get("size"), int),
+            bit_rate=_number(fmt.get("bit_rate"), int),
+            streams=[StreamInfo.from_ffprobe(s) for s in data.get("streams", [])],
+        )
+
+    def _first(self, codec_type):
+        return next((s for s in self.streams if s.codec_type == codec_type), None)
+
+    @property
+    def video(self):
+        return self._first("video")
+
+    @property
+    def audio(self):
+        return self._first("audio")
+
+    @property
+    def has_audio(self):
+        return self.audio is not None
+
+    @property
+    def fps(self):
+        return self.video.fps if self.video else None
+
+    @property
+    def frame_count(self):
+        # containers without nb_frames (webm, fragmented mp4) get an estimate,
+        # as cv2's CAP_PROP_FRAME_COUNT does
+        video = self.video
+        if video is None:
+            return 0
+        if video.nb_frames:
+            return video.nb_frames
+        duration = video.duration or self.duration
+        if duration and video.fps:
+            return int(round(duration * video.fps))
+        return 0
+
+    def fingerprint(self):
+        # stage cache key: the same media probed at another path is the same input
+        data = asdict(self)
+        data.pop("source")
+        return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+
+# ─── PROBE ──────────────────────────────────────────────────────────────────────
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _cache_key(source):
+    # local files are re-probed when they change; URLs are probed once
+    if os.path.exists(source):
+        st = os.stat(source)
+        return (os.path.abspath(source), st.st_size, st.st_mtime_ns)
+    return (source,)
+
+
+def probe(source):
+    """Return the MediaInfo for `source`, running ffprobe at most once per file/URL."""
+    key = _cache_key(source)
+    info = _cache.get(key)
+    if info is not None:
+        return info
+
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-print_format", "json",
+        "-show_format", "-show_streams",
+        source
+    ]
+    with tracing.span("ffprobe", cat="io"):
+        out = run_ffmpeg(cmd, capture=True)
+    info = MediaInfo.from_ffprobe(source, json.loads(out or "{}"))
+    with _cache_lock:
+        _cache[key] = info
+    return info
+
+
+def keyframe_before(source, t):
+    """Time of the last video keyframe at or before `t` seconds (t if unknown).
+
+    ffprobe seeks as a stream copy does, landing on that keyframe, and reads
+    a single packet there.
+    """
+    if t <= 0:
+        return 0.0
+    cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-read_intervals", f"{t:.3f}%+#1",
+        "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0",
+        source
+    ]
+    with tracing.span("ffprobe_keyframe", cat="io"):
+        out = run_ffmpeg(cmd, capture=True)
+    for line in out.splitlines():
+        pts, _, flags = line.partition(",")
+        if "K" in flags:
+            try:
+                return min(float(pts), t)
+            except ValueError:
+                break
+    return t
@@ -0,0 +1,146 @@
+import os
+import threading
+from contextlib import contextmanager
+
+import tracing
+
+
+class ModelRegistry:
+    """Process-wide, lazily loaded models shared by every job.
+
+    Loaders are registered by name. A name may carry a variant after a colon
+    ("whisper:base"), which is passed to the loader registered for the family.
+    Models registered as `exclusive` are not safe to call from two threads at
+    once; use `lease()` to borrow them.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._exclusive = set()
+        self._models = {}
+        self._load_locks = {}
+        self._use_locks = {}
+        self._lock = threading.Lock()
+
+    def register(self, family, loader, exclusive=False):
+        with self._lock:
+            self._loaders[family] = loader
+            if exclusive:
+                self._exclusive.add(family)
+
+    def _family(self, name):
+        family, _, variant = name.partition(":")
+        if family not in self._loaders:
+            raise KeyError(f"No model registered for '{name}'")
+        return family, variant or None
+
+    def get(self, name):
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        family, variant = self._family(name)
+        with self._lock:
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+        with load_lock:
+            # another thread may have finished loading while we waited
+            if name not in self._models:
+                print(f"Loading model {name}...")
+                with tracing.span(f"load_model {name}", cat="model"):
+                    loader = self._loaders[family]
+                    self._models[name] = loader(variant) if variant else loader()
+            return self._models[name]
+
+    @contextmanager
+    def lease(self, name):
+        model = self.get(name)
+        family, _ = self._family(name)
+        if family not in self._exclusive:
+            yield model
+            return
+        with self._lock:
+            use_lock = self._use_locks.setdefault(name, threading.Lock())
+        with use_lock:
+            yield model
+
+    def preload(self, names, background=False):
+        def load_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"WARNING: Could not preload {name}: {e}")
+
+        if not background:
+            load_all()
+            return None
+        thread = threading.Thread(target=load_all, name="model-preload", daemon=True)
+        thread.start()
+        return thread
+
+    def loaded(self):
+        return sorted(self._models)
+
+
+# ─── LOADERS ────────────────────────────────────────────────────────────────────
+
+def _torch_device():
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def _load_opensmile(feature_set="ComParE_2016"):
+    import opensmile
+    return opensmile.Smile(
+        feature_set=getattr(opensmile.FeatureSet, feature_set),
+        feature_level=opensmile.FeatureLevel.Functionals
+    )
+
+
+def _load_whisper(name="base"):
+    import whisper
+    return whisper.load_model(name, device=_torch_device())
+
+
+def _load_pyannote(name="pyannote/speaker-diarization"):
+    import torch
+    from pyannote.audio import Pipeline
+    hf_token = os.environ.get("HF_TOKEN")
+    if not hf_token:
+        raise ValueError("HF_TOKEN not set in environment variables")
+    pipeline = Pipeline.from_pretrained(name, use_auth_token=hf_token)
+    return pipeline.to(torch.device(_torch_device()))
+
+
+def _load_yamnet():
+    import pandas as pd
+    import tensorflow as tf
+    import tensorflow_hub as hub
+    model = hub.load("https://tfhub.dev/google/yamnet/1")
+    class_map_path = tf.keras.utils.get_file(
+        'yamnet_class_map.csv',
+        'https://raw.githubusercontent.com/tensorflow/models/master/research/audioset/yamnet/yamnet_class_map.csv'
+    )
+    class_names = pd.read_csv(class_map_path)['display_name'].to_list()
+    return model, class_names
+
+
+def _load_face_engine():
+    from face_engine import FaceEngine
+    return FaceEngine()
+
+
+models = ModelRegistry()
+models.register("opensmile", _load_opensmile)
+models.register("whisper", _load_whisper, exclusive=True)
+models.register("pyannote", _load_pyannote, exclusive=True)
+models.register("yamnet", _load_yamnet)
+# only FaceBatcher's worker thread calls it
+models.register("face_engine", _load_face_engine)
+
+# What API / GUI startup warms up; override with a comma-separated list
+DEFAULT_PRELOAD = [
+    name.strip()
+    for name in os.environ.get("OVERWATCH_PRELOAD_MODELS", "opensmile:ComParE_2016,whisper:base").split(",")
+    if name.strip()
+]
@@ -0,0 +1,99 @@
+import os
+
+import numpy as np
+
+import tracing
+from ffmpeg_run import ffmpeg_pipe
+
+# "1" spends the visual frame budget where the picture changes instead of
+# evenly over time
+DEFAULT_ENABLED = os.environ.get("OVERWATCH_MOTION_SAMPLING", "0") == "1"
+# frames kept, as a share of the even ~3 fps sample
+BUDGET_SHARE = float(os.environ.get("OVERWATCH_MOTION_BUDGET", 0.5))
+# share of the budget spread evenly, so static stretches are still seen
+FLOOR_SHARE = 0.3
+# motion is scored on tiny grayscale frames
+PROBE_SIZE = (64, 36)
+PROBE_FPS = 6
+# candidates this close to a moving one are worth keeping too
+SMOOTH_FRAMES = 5
+
+
+def motion_scores(frames):
+    """Mean absolute difference of each gray frame to the one before it.
+
+    `frames` is any iterable of equally sized uint8 arrays; only the
+    previous one is kept.
+    """
+    scores, prev = [], None
+    for frame in frames:
+        cur = frame.astype(np.int16)
+        scores.append(float(np.abs(cur - prev).mean()) if prev is not None else 0.0)
+        prev = cur
+    scores = np.asarray(scores, dtype=np.float32)
+    if len(scores) > 1:
+        scores[0] = scores[1]
+    if len(scores) >= SMOOTH_FRAMES:
+        scores = np.convolve(scores, np.ones(SMOOTH_FRAMES) / SMOOTH_FRAMES, mode="same").astype(np.float32)
+    return scores
+
+
+def allocate(scores, budget, floor_share=FLOOR_SHARE):
+    """Sorted positions of `budget` candidates (all of them if fewer), dense where `scores` are high.
+
+    A `floor_share` of the budget is spread evenly; the rest follows the
+    scores. Positions are read off the cumulative weights at evenly spaced
+    quantiles, so the result is deterministic. Quantiles that land on the
+    same candidate leave a remainder, which goes to the highest-weighted
+    candidates not yet picked.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    n = len(scores)
+    if budget >= n:
+        return np.arange(n)
+    if budget <= 0:
+        return np.zeros(0, dtype=np.int64)
+    total = scores.sum()
+    if total > 0:
+        weights = floor_share / n + (1 - floor_share) * scores / total
+    else:
+        weights = np.full(n, 1.0 / n)
+    cdf = np.cumsum(weights)
+    targets = (np.arange(budget) + 0.5) / budget * cdf[-1]
+    picked = np.unique(np.minimum(np.searchsorted(cdf, targets), n - 1))
+    short = budget - len(picked)
+    if short:
+        rest = np.setdiff1d(np.arange(n), picked)
+        order = np.argsort(-weights[rest], kind="stable")
+        picked = np.sort(np.concatenate([picked, rest[order[:short]]]))
+    return picked
+
+
+def read_gray(pipe, size=PROBE_SIZE):
+    """Yield (h, w) uint8 frames from a rawvideo gray pipe."""
+    w, h = size
+    frame_bytes = w * h
+    while True:
+        raw = pipe.read(frame_bytes)
+        if len(raw) < frame_bytes:
+            return
+        yield np.frombuffer(raw, dtype=np.uint8).reshape(h, w)
+
+
+def probe_motion(video_path, fps, probe_fps=PROBE_FPS):
+    """(frame_indices, scores) for every n-th frame of the video at ~`probe_fps`.
+
+    One decode of the video; only PROBE_SIZE gray frames leave ffmpeg.
+    """
+    stride = max(1, int(round(fps / probe_fps)))
+    w, h = PROBE_SIZE
+    cmd = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-i", video_path, "-map", "0:v:0", "-an",
+        "-vf", f"select='not(mod(n,{stride}))',scale={w}:{h},format=gray",
+        "-vsync", "vfr", "-f", "rawvideo", "pipe:1"
+    ]
+    with tracing.span("motion_probe", cat="ext", stride=stride):
+        with ffmpeg_pipe(cmd) as pipe:
+            scores = motion_scores(read_gray(pipe))
+    return np.arange(len(scores)) * stride, scores
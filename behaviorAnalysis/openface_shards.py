@@ -0,0 +1,226 @@
+import os
+import sys
+import time
+import shutil
+import threading
+import subprocess
+import contextvars
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+import cancellation
+import media_info
+from ffmpeg_run import run_ffmpeg
+from csv_tail import CSVTail
+from segmented_download import split
+
+# 1 keeps the single FeatureExtraction run; N > 1 runs N time shards at once
+DEFAULT_SHARDS = int(os.environ.get("OVERWATCH_OPENFACE_SHARDS", 1))
+# a shard pays for OpenFace model loading and face re-detection; keep them long
+MIN_SHARD_SECONDS = 60
+
+
+def plan_shards(duration, shards):
+    """(start, length) time ranges for `shards` workers; one range if too short."""
+    return split(float(duration), shards, MIN_SHARD_SECONDS)
+
+
+def plan_frame_shards(frames, shards):
+    """(first, count) image ranges of a FrameSequence for `shards` workers."""
+    return split(len(frames), shards, max(1, int(MIN_SHARD_SECONDS * frames.sample_fps)))
+
+
+class Shard(ABC):
+    """One part of the input, prepared as its own OpenFace source and run headless."""
+
+    def __init__(self, index, shard_dir, source):
+        self.index = index
+        self.name = f"shard{index:03d}"
+        self.source = source
+        self.csv = os.path.join(shard_dir, f"{self.name}.csv")
+        self.proc = None
+        self.tail = CSVTail(self.csv)
+
+    def prepare(self):
+        pass
+
+    @abstractmethod
+    def original_time(self, frame, timestamp):
+        """Time in the full video of a row OpenFace wrote for this shard."""
+
+    def extract(self, cmd):
+        self.proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        with cancellation.tracked(self.proc):
+            self.proc.wait()
+        cancellation.check()
+        if self.proc.returncode != 0:
+            print(f"\n[Warning] OpenFace shard {self.index} exited with {self.proc.returncode}")
+
+    def terminate(self):
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.terminate()
+
+    def rows_read(self):
+        self.tail.read_lines()
+        return self.tail.rows_read
+
+
+class VideoShard(Shard):
+    """A time range of the video, stream-copied to its own file."""
+
+    def __init__(self, index, shard_dir, video_path, start, length):
+        super().__init__(index, shard_dir, os.path.join(shard_dir, f"shard{index:03d}.mp4"))
+        self.video_path = video_path
+        self.start = start
+        self.length = length
+
+    def prepare(self):
+        # video only, stream copy: cheap, but it starts on the keyframe at or
+        # before `start`, so the real start is worked out from what was cut
+        cmd = [
+            "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+            "-ss", f"{self.start:.3f}", "-i", self.video_path, "-t", f"{self.length:.3f}",
+            "-map", "0:v:0", "-c", "copy", "-an", "-avoid_negative_ts", "make_zero",
+            self.source
+        ]
+        run_ffmpeg(cmd)
+        cut = media_info.probe(self.source).duration or self.length
+        self.start = round(max(0.0, self.start + self.length - cut), 3)
+
+    def original_time(self, frame, timestamp):
+        return self.start + timestamp
+
+
+class FrameShard(Shard):
+    """A run of images from a FrameSequence, linked into their own directory."""
+
+    def __init__(self, index, shard_dir, sequence, first, count):
+        super().__init__(index, shard_dir, os.path.join(shard_dir, f"shard{index:03d}"))
+        self.sequence = sequence
+        self.first = first
+        self.count = count
+
+    def prepare(self):
+        os.makedirs(self.source, exist_ok=True)
+        for path in self.sequence.files()[self.first:self.first + self.count]:
+            dest = os.path.join(self.source, os.path.basename(path))
+            try:
+                os.link(path, dest)
+            except OSError:
+                shutil.copy2(path, dest)
+
+    def original_time(self, frame, timestamp):
+        # OpenFace numbers images from 1 and times them at its own default fps
+        return self.sequence.timestamp(self.first + frame - 1)
+
+
+def run_sharded(csv_path, plan, fps, command, timeout, expected_max,
+                on_progress=None, stats=None, video_path=None, frames=None):
+    """Run OpenFace over each part of `plan` in parallel and merge into `csv_path`.
+
+    The parts are (start, length) time ranges of `video_path`, or (first,
+    count) image ranges of the FrameSequence `frames`. `command(source,
+    out_dir, name)` builds the FeatureExtraction command for one shard.
+    Workers are bounded by the core count. Rows get their full-video
+    `frame`/`timestamp`; rows a shard repeats from the previous one's range
+    (keyframe lead-in) are dropped. Returns the number of merged rows;
+    raises OpenFaceIncomplete after a timeout, a failed shard or when there
+    are none.
+    """
+    from Openface_Analysis import retime_rows, OpenFaceIncomplete
+    shard_dir = os.path.splitext(csv_path)[0] + ".shards"
+    os.makedirs(shard_dir, exist_ok=True)
+    if frames is not None:
+        shards = [FrameShard(i, shard_dir, frames, first, count) for i, (first, count) in enumerate(plan)]
+    else:
+        shards = [VideoShard(i, shard_dir, video_path, start, length) for i, (start, length) in enumerate(plan)]
+    workers = min(len(shards), os.cpu_count() or 1)
+    stop = threading.Event()
+
+    def work(shard):
+        if stop.is_set():
+            return
+        shard.prepare()
+        if stop.is_set():
+            return
+        shard.extract(command(shard.source, shard_dir, shard.name))
+
+    print(f"Running OpenFace on {len(shards)} shards with {workers} workers...")
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # each worker runs in a copy of the caller's context (cancellation, tracing)
+            futures = [pool.submit(contextvars.copy_context().run, work, s) for s in shards]
+            start = time.time()
+            try:
+                while not all(f.done() for f in futures):
+                    cancellation.check()
+                    if time.time() - start > timeout and not stop.is_set():
+                        print(f"\n[Warning] OpenFace timed out after {timeout / 60:.0f} minutes. Terminating.")
+                        stop.set()
+                        for shard in shards:
+                            shard.terminate()
+
+                    done = sum(shard.rows_read() for shard in shards)
+                    elapsed = time.time() - start
+                    rate = done / elapsed if elapsed > 0 else 0.0
+                    eta = (expected_max - done) / rate if rate > 0 else None
+                    if on_progress:
+                        on_progress(done, expected_max, rate, eta)
+                    else:
+                        eta_text = f"{eta:.0f}s" if eta is not None else "?"
+                        sys.stdout.write(f"\r{done}/{expected_max} frames  {rate:.1f} fps  ETA {eta_text}")
+                        sys.stdout.flush()
+                    time.sleep(0.5)
+            except BaseException:
+                stop.set()
+                for shard in shards:
+                    shard.terminate()
+                raise
+            for future in futures:
+                future.result()
+
+        rows = merge(shards, csv_path, fps, retime_rows, stats)
+    finally:
+        for shard in shards:
+            shard.tail.close()
+        shutil.rmtree(shard_dir, ignore_errors=True)
+    print(f"\n[Check] OpenFace completed. {rows} frames processed in {len(shards)} shards.")
+    if stop.is_set():
+        raise OpenFaceIncomplete(f"OpenFace timed out; {rows} frames processed")
+    failed = [shard.index for shard in shards if shard.proc is None or shard.proc.returncode != 0]
+    if failed:
+        raise OpenFaceIncomplete(f"OpenFace shards {failed} failed; their ranges are missing")
+    if not rows:
+        raise OpenFaceIncomplete("OpenFace wrote no rows")
+    return rows
+
+
+def merge(shards, csv_path, fps, retime, stats=None):
+    """Concatenate shard CSVs in time order with `frame`/`timestamp` moved to the full video."""
+    header, rows = None, 0
+    last_t = [-1.0]
+
+    def after_previous(t):
+        if t <= last_t[0]:
+            return False  # already covered by the previous shard
+        last_t[0] = t
+        return True
+
+    with open(csv_path, "w", encoding="utf-8", newline="") as out:
+        for shard in shards:
+            # a chunk at a time; no shard CSV is held in memory whole
+            with CSVTail(shard.csv) as tail:
+                for lines in tail.read_chunks():
+                    if tail.header is None:
+                        break
+                    if header is None:
+                        header = tail.header
+                        out.write(", ".join(header) + "\n")
+                    kept = retime(header, lines, shard.original_time, fps, keep=after_previous)
+                    out.writelines(line + "\n" for line in kept)
+                    if stats is not None:
+                        stats.feed(header, kept)
+                    rows += len(kept)
+            if tail.header is None:
+                print(f"\n[Warning] no CSV from OpenFace shard {shard.index}; its range is missing.")
+    return rows
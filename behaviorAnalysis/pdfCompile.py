@@ -3,36 +3,44 @@ from PIL import Image
 import cv2
 import numpy as np
 
-def extract_even_frames_with_timestamps(video_path, output_folder, num_frames=200, resize_width=640, resize_height=360):
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        raise Exception(f"Failed to open video: {video_path}")
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    frame_indices = np.linspace(0, total_frames - 1, num_frames, dtype=int)
+import media_info
+import motion_sampling
+from frame_grabber import read_frames
 
-    for count, i in enumerate(frame_indices):
-        cap.set(cv2.CAP_PROP_POS_FRAMES, i)
-        success, frame = cap.read()
-        if not success:
-            continue
+def extract_even_frames_with_timestamps(video_path, output_folder, num_frames=200, resize_width=640, resize_height=360, media=None,
+                                        motion=None, mode=None):
+    # motion: pick the num_frames where the picture changes most instead of
+    # evenly spaced ones (OVERWATCH_MOTION_SAMPLING)
+    # mode: how the frames are read in one forward pass; see frame_grabber
+    media = media or media_info.probe(video_path)
+    motion = motion_sampling.DEFAULT_ENABLED if motion is None else motion
+    total_frames = media.frame_count
+    fps = media.fps or 30.0
+    if motion:
+        candidates, scores = motion_sampling.probe_motion(video_path, fps)
+        frame_indices = candidates[motion_sampling.allocate(scores, num_frames)]
+    else:
+        frame_indices = np.linspace(0, total_frames - 1, num_frames, dtype=int)
 
+    saved = 0
+    frames = read_frames(video_path, frame_indices, (resize_width, resize_height), mode)
+    for count, (i, frame_resized) in enumerate(frames):
         timestamp_sec = i / fps
         minutes = int(timestamp_sec // 60)
         seconds = int(timestamp_sec % 60)
         millis = int((timestamp_sec % 1) * 1000)
         timestamp_text = f"{minutes:02d}:{seconds:02d}.{millis:03d}"
 
-        frame_resized = cv2.resize(frame, (resize_width, resize_height))
         cv2.putText(frame_resized, timestamp_text, (10, 30),
                     fontFace=cv2.FONT_HERSHEY_SIMPLEX, fontScale=0.8,
                     color=(255, 255, 255), thickness=2, lineType=cv2.LINE_AA)
 
-        frame_filename = os.path.join(output_folder, f"frame_{count:02d}.webp")
+        # four digits so sorting by name keeps frames 100+ in order
+        frame_filename = os.path.join(output_folder, f"frame_{count:04d}.webp")
         cv2.imwrite(frame_filename, frame_resized)
+        saved += 1
 
-    cap.release()
-    print(f"Saved {num_frames} timestamped frames to: {output_folder}")
+    print(f"Saved {saved} timestamped frames to: {output_folder}")
     
 
 def save_frames_to_pdf_and_cleanup(output_folder, pdf_filename="video_frames.pdf"):
@@ -0,0 +1,103 @@
+import os
+import subprocess
+
+import tracing
+from ffmpeg_run import FFmpegError, run_ffmpeg
+
+# auto: remux when the codecs already play everywhere, encode otherwise
+# remux / encode: force one of those; skip: no playback copy (headless / API)
+DEFAULT_MODE = os.environ.get("OVERWATCH_PLAYBACK", "auto")
+
+PLAYABLE_VIDEO = {"h264"}
+PLAYABLE_AUDIO = {"aac", "mp3"}
+
+# tried in order; the software encoder works everywhere, hardware ones only
+# where the driver is present, so a failure moves on to the next
+H264_ENCODERS = [
+    ("libx264", ["-preset", "ultrafast", "-crf", "23"]),
+    ("h264_nvenc", ["-preset", "fast", "-b:v", "2M"]),
+    ("h264_qsv", ["-b:v", "2M"]),
+    ("h264_videotoolbox", ["-b:v", "2M"]),
+]
+
+_encoders = None
+
+
+def available_encoders():
+    global _encoders
+    if _encoders is None:
+        try:
+            out = subprocess.check_output(["ffmpeg", "-hide_banner", "-encoders"],
+                                          stderr=subprocess.DEVNULL, text=True)
+        except (OSError, subprocess.CalledProcessError):
+            out = ""
+        _encoders = {line.split()[1] for line in out.splitlines()
+                     if len(line.split()) > 1 and line.startswith(" V")}
+    return _encoders
+
+
+def is_playable(media):
+    video, audio = media.video, media.audio
+    return (video is not None and video.codec_name in PLAYABLE_VIDEO
+            and (audio is None or audio.codec_name in PLAYABLE_AUDIO))
+
+
+def _ffmpeg(cmd, span_name):
+    with tracing.span(span_name, cat="ext"):
+        run_ffmpeg(cmd)
+
+
+def remux(video_path, playback_path):
+    _ffmpeg([
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+        "-i", video_path,
+        "-c", "copy", "-movflags", "+faststart",
+        playback_path
+    ], "playback_remux")
+
+
+def encode(video_path, playback_path):
+    available = available_encoders()
+    for encoder, options in H264_ENCODERS:
+        if encoder not in available:
+            continue
+        try:
+            _ffmpeg([
+                "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+                "-i", video_path,
+                "-c:v", encoder, *options, "-pix_fmt", "yuv420p",
+                "-c:a", "aac", "-b:a", "192k",
+                "-movflags", "+faststart",
+                playback_path
+            ], f"playback_encode {encoder}")
+            return encoder
+        except FFmpegError as e:
+            print(f"WARNING: {encoder} failed: {e.stderr.strip()[-200:]}")
+    raise RuntimeError("No working H.264 encoder found for the playback copy")
+
+
+def prepare_playback(video_path, playback_path, media, mode=None):
+    """Make a browser/VLC friendly copy of `video_path`.
+
+    Returns the playback path, or None when skipped or when no copy could be
+    made; playback is a convenience, so it never fails the job.
+    """
+    mode = mode or DEFAULT_MODE
+    if mode == "skip":
+        return None
+    if mode == "auto":
+        mode = "remux" if is_playable(media) else "encode"
+
+    try:
+        if mode == "remux":
+            print("Remuxing for playback...")
+            remux(video_path, playback_path)
+        else:
+            print("Encoding for playback...")
+            encode(video_path, playback_path)
+    except RuntimeError as e:
+        print(f"WARNING: Playback copy not created: {e}")
+        return None
+
+    print("Playback video created:", playback_path)
+    return playback_path
@@ -0,0 +1,113 @@
+import multiprocessing
+import os
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import cancellation
+
+# 0 keeps CPU-bound analyzers in-process (threads); N > 0 uses N worker processes
+DEFAULT_WORKERS = int(os.environ.get("OVERWATCH_PROCESS_WORKERS", 0))
+
+
+class SharedArray:
+    """Picklable handle to a numpy array living in shared memory."""
+
+    def __init__(self, name, shape, dtype):
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype).str
+
+    @contextmanager
+    def attach(self):
+        # Worker side. The array is a view into the segment and must not be
+        # kept past the `with` block.
+        shm = shared_memory.SharedMemory(name=self.name)
+        try:
+            yield np.ndarray(self.shape, dtype=self.dtype, buffer=shm.buf)
+        finally:
+            shm.close()
+
+
+@contextmanager
+def shared_array(array):
+    """Copy `array` into a shared memory segment for the duration of the block."""
+    array = np.ascontiguousarray(array)
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    try:
+        view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+        view[...] = array
+        del view
+        yield SharedArray(shm.name, array.shape, array.dtype)
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _init_worker():
+    # the pool already fills the cores; one intra-op thread per worker keeps
+    # torch from oversubscribing them
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(1)
+
+
+class ProcessDispatcher:
+    """Runs picklable top-level functions in a shared ProcessPoolExecutor.
+
+    With `workers` <= 0 calls run inline in the calling thread.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = DEFAULT_WORKERS if workers is None else workers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.workers > 0
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # spawned, not forked: the server's threads, locks and
+                # torch state don't survive a fork
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+            return self._pool
+
+    def call(self, fn, *args, **kwargs):
+        if not self.enabled:
+            return fn(*args, **kwargs)
+        future = self._get_pool().submit(fn, *args, **kwargs)
+        token = cancellation.current_token()
+        while True:
+            try:
+                return future.result(timeout=0.2)
+            except TimeoutError:
+                if token is not None and token.cancelled:
+                    # a task that already started keeps its worker until it
+                    # finishes; workers are shared, so they aren't killed here
+                    future.cancel()
+                    token.raise_if_cancelled()
+
+
+_dispatchers = {}
+_dispatchers_lock = threading.Lock()
+
+
+def get_dispatcher(workers=None):
+    # one pool per size per process, shared by every job
+    workers = DEFAULT_WORKERS if workers is None else workers
+    with _dispatchers_lock:
+        if workers not in _dispatchers:
+            _dispatchers[workers] = ProcessDispatcher(workers)
+        return _dispatchers[workers]
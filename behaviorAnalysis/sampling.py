@@ -0,0 +1,111 @@
+import os
+import re
+import bisect
+import random
+
+import tracing
+import media_info
+import segmented_download
+
+# 0 keeps the contiguous "first percent_download%" prefix; K > 0 samples K windows
+DEFAULT_WINDOWS = int(os.environ.get("OVERWATCH_SAMPLE_WINDOWS", 0))
+# shorter windows cut speech mid-sentence and mostly cost keyframe overhead
+MIN_WINDOW_SECONDS = 20
+
+# times as the transcribers write them: "01:05.250" (Google) and
+# "[65.25s - 67.80s]" (Whisper fallback)
+CLOCK_RE = re.compile(r"\b(\d{2,}):(\d{2}\.\d{3})\b")
+SPAN_RE = re.compile(r"\[(\d+(?:\.\d+)?)s - (\d+(?:\.\d+)?)s\]")
+
+
+def plan_windows(duration, coverage=0.4, windows=8, jitter=0.0, seed=0):
+    """Pick `windows` (start, length) ranges spread over [0, duration).
+
+    The recording is cut into equal strata and one window of
+    `coverage * duration / windows` seconds is placed in each, centered
+    unless `jitter` (0..1) moves it randomly within its stratum.
+    """
+    coverage = min(max(coverage, 0.0), 1.0)
+    total = duration * coverage
+    windows = max(1, min(windows, int(total // MIN_WINDOW_SECONDS) or 1))
+    stratum = duration / windows
+    length = total / windows
+    slack = stratum - length
+    rng = random.Random(seed)
+
+    plan = []
+    for i in range(windows):
+        offset = slack / 2 + (rng.uniform(-0.5, 0.5) * slack * jitter if jitter else 0.0)
+        plan.append((round(i * stratum + offset, 3), round(length, 3)))
+    return plan
+
+
+class Timeline:
+    """Maps time in a stitched recording back to the original recording.
+
+    Each piece is (stitched_start, original_start, length) in seconds.
+    """
+
+    def __init__(self, pieces=()):
+        self.pieces = [tuple(p) for p in pieces]
+        self._starts = [p[0] for p in self.pieces]
+
+    @classmethod
+    def from_lengths(cls, windows):
+        # windows: (original_start, length) in stitch order
+        pieces, at = [], 0.0
+        for start, length in windows:
+            pieces.append((round(at, 3), start, length))
+            at += length
+        return cls(pieces)
+
+    @property
+    def duration(self):
+        return sum(p[2] for p in self.pieces)
+
+    def to_original(self, t):
+        if not self.pieces:
+            return t
+        i = max(0, bisect.bisect_right(self._starts, t) - 1)
+        stitched_start, original_start, _ = self.pieces[i]
+        return round(original_start + (t - stitched_start), 3)
+
+    def retime_text(self, text):
+        """`text` with every transcript time in it moved to the original recording."""
+        def clock(m):
+            t = self.to_original(int(m.group(1)) * 60 + float(m.group(2)))
+            minutes = int(t // 60)
+            return f"{minutes:02d}:{t - minutes * 60:06.3f}"
+
+        def span(m):
+            return f"[{self.to_original(float(m.group(1))):.2f}s - {self.to_original(float(m.group(2))):.2f}s]"
+
+        return SPAN_RE.sub(span, CLOCK_RE.sub(clock, text))
+
+    def to_dict(self):
+        return {"pieces": [list(p) for p in self.pieces]}
+
+    def __len__(self):
+        return len(self.pieces)
+
+    def __repr__(self):
+        return f"Timeline({len(self.pieces)} pieces, {self.duration:.1f}s)"
+
+
+def fetch_windows(url, dest, plan):
+    """Fetch only the planned windows of `url` into one stitched file.
+
+    Stream copy starts each window on the keyframe at or before its planned
+    start, so the timeline is built from the lengths actually fetched.
+    """
+    actual = list(plan)
+
+    def measure(index, path):
+        start, length = plan[index]
+        fetched = media_info.probe(path).duration or length
+        # the extra lead-in comes from before the planned start
+        actual[index] = (round(max(0.0, start + length - fetched), 3), fetched)
+
+    with tracing.span("sampled_download", cat="io", windows=len(plan)):
+        segmented_download.fetch_ranges(url, dest, plan, on_segment=measure)
+    return Timeline.from_lengths(actual)
@@ -0,0 +1,188 @@
+import os
+import math
+import time
+import shutil
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+import cancellation
+from ffmpeg_run import run_ffmpeg
+
+# 1 keeps the single-connection download; N > 1 fetches N segments at once
+DEFAULT_SEGMENTS = int(os.environ.get("OVERWATCH_DOWNLOAD_SEGMENTS", 1))
+DEFAULT_RETRIES = 3
+# below these a segment isn't worth its own connection
+MIN_SEGMENT_SECONDS = 30
+MIN_SEGMENT_BYTES = 8 * 1024 * 1024
+
+HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
+
+
+def is_http(url):
+    return url.lower().startswith(("http://", "https://"))
+
+
+def split(total, parts, minimum):
+    """Split [0, total) into at most `parts` (start, length) pieces of >= `minimum`."""
+    parts = max(1, min(parts, int(total // minimum)))
+    if isinstance(total, int):
+        bounds = [total * i // parts for i in range(parts + 1)]
+    else:
+        bounds = [total * i / parts for i in range(parts + 1)]
+    return [(bounds[i], bounds[i + 1] - bounds[i]) for i in range(parts)]
+
+
+def retry(fn, what, retries=DEFAULT_RETRIES):
+    for attempt in range(retries + 1):
+        cancellation.check()
+        try:
+            return fn()
+        except cancellation.Cancelled:
+            raise
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = 0.5 * 2 ** attempt
+            print(f"WARNING: {what} failed ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def _run_parallel(tasks):
+    # each segment runs in a copy of the caller's context (cancellation, tracing)
+    with ThreadPoolExecutor(max_workers=len(tasks)) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, fn, *args) for fn, *args in tasks]
+        for future in futures:
+            future.result()
+
+
+# ─── BYTE RANGES (HTTP) ─────────────────────────────────────────────────────────
+
+def range_probe(url):
+    """(size, etag, ranged) of `url` from a one-byte ranged request; None where unknown."""
+    import requests
+    with requests.get(url, headers=dict(HEADERS, Range="bytes=0-0"), stream=True, timeout=30) as r:
+        r.raise_for_status()
+        etag = r.headers.get("ETag")
+        ranged = r.status_code == 206
+        if ranged:
+            # Content-Range: bytes 0-0/123456
+            total = r.headers.get("Content-Range", "").rpartition("/")[2]
+            size = int(total) if total.isdigit() else None
+        else:
+            size = int(r.headers["Content-Length"]) if "Content-Length" in r.headers else None
+    return size, etag, ranged
+
+
+def content_length(url):
+    """Size of `url` if the server supports byte ranges, else None."""
+    size, _, ranged = range_probe(url)
+    return size if ranged else None
+
+
+def fetch_byte_ranges(url, dest, segments=None, retries=DEFAULT_RETRIES, chunk_size=1024 * 1024):
+    """Download the whole object at `url` over several ranged connections."""
+    import requests
+    segments = segments or DEFAULT_SEGMENTS
+    total = content_length(url)
+    parts = split(total, segments, MIN_SEGMENT_BYTES) if total else [(0, None)]
+
+    tmp = dest + ".part"
+    with open(tmp, "wb") as f:
+        if total:
+            f.truncate(total)
+
+    def fetch(index, start, length):
+        written = 0
+
+        def attempt():
+            nonlocal written
+            headers = dict(HEADERS)
+            if length is not None:
+                # resume: whatever this segment already wrote is kept
+                headers["Range"] = f"bytes={start + written}-{start + length - 1}"
+            elif written:
+                written = 0  # no range support; start over
+            with requests.get(url, headers=headers, stream=True, timeout=30) as r:
+                r.raise_for_status()
+                if length is not None and r.status_code != 206:
+                    raise IOError(f"server ignored Range (HTTP {r.status_code})")
+                with open(tmp, "r+b") as f:
+                    f.seek(start + written)
+                    for chunk in r.iter_content(chunk_size=chunk_size):
+                        cancellation.check()
+                        f.write(chunk)
+                        written += len(chunk)
+            if length is not None and written < length:
+                raise IOError(f"short read: {written} of {length} bytes")
+
+        retry(attempt, f"byte segment {index}", retries)
+
+    print(f"Downloading {total or '?'} bytes in {len(parts)} segment(s)...")
+    _run_parallel([(fetch, i, start, length) for i, (start, length) in enumerate(parts)])
+    os.replace(tmp, dest)
+    return dest
+
+
+# ─── TIME SEGMENTS (ffmpeg) ─────────────────────────────────────────────────────
+
+def fetch_time_segments(url, dest, duration, segments=None, retries=DEFAULT_RETRIES):
+    """Copy [0, duration) of `url` as parallel time segments joined with the concat demuxer.
+
+    Stream copy can only start on a keyframe, so every cut is moved back to
+    the keyframe at or before it; each segment then ends exactly where the
+    next begins and the join matches a single-pass copy.
+    """
+    segments = segments or DEFAULT_SEGMENTS
+    fetch_ranges(url, dest, keyframe_parts(url, duration, segments), retries)
+    return dest
+
+
+def keyframe_parts(url, duration, segments):
+    """Contiguous (start, length) parts of [0, duration) that start on keyframes."""
+    import media_info
+    planned = [start for start, _ in split(float(duration), segments, MIN_SEGMENT_SECONDS)]
+    with ThreadPoolExecutor(max_workers=len(planned)) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, media_info.keyframe_before, url, t) for t in planned]
+        starts = [future.result() for future in futures]
+    # a long GOP can pull two cuts onto the same keyframe
+    starts = sorted(set(starts))
+    bounds = starts + [float(duration)]
+    return [(bounds[i], bounds[i + 1] - bounds[i]) for i in range(len(starts))]
+
+
+def fetch_ranges(url, dest, parts, retries=DEFAULT_RETRIES, on_segment=None):
+    """Fetch each (start, length) of `url` concurrently and concatenate them into `dest`.
+
+    `on_segment(index, path)` is called for every segment before they are joined.
+    """
+    ext = os.path.splitext(dest)[1] or ".mp4"
+    seg_dir = dest + ".segments"
+    os.makedirs(seg_dir, exist_ok=True)
+    paths = [os.path.join(seg_dir, f"seg{i:03d}{ext}") for i in range(len(parts))]
+
+    def fetch(index, start, length):
+        # rounded up, so a start on a keyframe seeks to that keyframe, not the one before
+        retry(lambda: run_ffmpeg([
+            "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+            "-ss", f"{math.ceil(start * 1000) / 1000:.3f}", "-i", url, "-t", f"{length:.3f}",
+            "-c", "copy", "-avoid_negative_ts", "make_zero",
+            paths[index]
+        ]), f"time segment {index}", retries)
+
+    print(f"Downloading {sum(length for _, length in parts):.1f}s in {len(parts)} segment(s)...")
+    try:
+        _run_parallel([(fetch, i, start, length) for i, (start, length) in enumerate(parts)])
+        if on_segment:
+            for index, path in enumerate(paths):
+                on_segment(index, path)
+        list_path = os.path.join(seg_dir, "segments.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            f.writelines(f"file '{os.path.basename(p)}'\n" for p in paths)
+        run_ffmpeg([
+            "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            "-c", "copy", dest
+        ])
+    finally:
+        shutil.rmtree(seg_dir, ignore_errors=True)
+    return dest
@@ -1,12 +1,12 @@
-import pandas as pd
 import tensorflow as tf
-import tensorflow_hub as hub
 import librosa
 
 import os
 import shutil
 import tempfile
 
+from model_pool import models
+
 tfhub_cache = os.path.join(tempfile.gettempdir(), "tfhub_modules")
 shutil.rmtree(tfhub_cache, ignore_errors=True)
 
@@ -15,16 +15,11 @@ shutil.rmtree(tfhub_cache, ignore_errors=True)
 
 def detect_keyboard_sounds(audio_path):
     print("Analyzing audio for keyboard sounds...")
-    model = hub.load("https://tfhub.dev/google/yamnet/1")
+    # YAMNet and its class map are downloaded once per process
+    model, class_names = models.get("yamnet")
     waveform, sr = librosa.load(audio_path, sr=16000)
     scores, embeddings, spectrogram = model(waveform)
 
-    class_map_path = tf.keras.utils.get_file(
-        'yamnet_class_map.csv',
-        'https://raw.githubusercontent.com/tensorflow/models/master/research/audioset/yamnet/yamnet_class_map.csv'
-    )
-
-    class_names = pd.read_csv(class_map_path)['display_name'].to_list()
     mean_scores = tf.reduce_mean(scores, axis=0).numpy()
     top_indexes = mean_scores.argsort()[-10:][::-1]
     top_classes = [class_names[i] for i in top_indexes]
@@ -1,59 +1,108 @@
 import torch
-import torchaudio.transforms
-import soundfile as sf
-import numpy as np
+from audio_buffer import AudioBuffer
+from analysis_result import KeyboardFindings
 
 def detect_keyboard_sounds(audio_path):
+    return detect_keyboard_sounds_buffer(AudioBuffer.load(audio_path))
+
+def detect_keyboard_sounds_buffer(audio):
+    return analyze_keyboard_sounds(audio).summary_lines()
+
+def analyze_keyboard_sounds(audio, n_fft=1024, hop_length=512):
     print("Analyzing audio for keyboard sounds...")
 
-    # 1) Load + resample + mono using soundfile directly
-    waveform, sr = sf.read(audio_path)
-    waveform = torch.from_numpy(waveform).float()
-    if len(waveform.shape) > 1:  # If stereo
-        waveform = waveform.T  # Shape: [channels, samples]
-    else:
-        waveform = waveform.unsqueeze(0)  # Shape: [1, samples]
-    if sr != 16000:
-        waveform = torchaudio.transforms.Resample(sr, 16000)(waveform)
-    y = waveform.mean(dim=0)  # shape: [T]
-
-    # 2) Compute complex STFT, then magnitude spectrogram [freq_bins, frames]
-    spec = torch.stft(
-        y,
-        n_fft=1024,
-        hop_length=512,
-        win_length=1024,
-        return_complex=True
-    )
-    spec_mag = spec.abs()
-
-    # 3) Spectral flux: difference along time frames, keep only positive changes
-    #    diff shape: [freq_bins, frames-1]
-    diff = spec_mag[:, 1:] - spec_mag[:, :-1]
-    positive_diff = diff.clamp(min=0)
-
-    # 4) Sum over frequency axis → flux per time frame (length = frames-1)
-    flux = positive_diff.sum(dim=0)
-
-    # 5) Onset count: local peaks in the 1-D flux signal
-    if flux.numel() < 3:
-        num_onsets = 0
-    else:
-        peaks = (flux[1:-1] > flux[:-2]) & (flux[1:-1] > flux[2:])
-        num_onsets = int(peaks.sum().item())
-
-    # 6) Normalize by duration
-    duration_sec = y.shape[0] / 16000
-    onsets_per_sec = num_onsets / duration_sec if duration_sec > 0 else 0.0
-
-    # 7) Build the summary
-    summary = [f"Detected {num_onsets} onsets ({onsets_per_sec:.2f} per sec)"]
-    # Keyboard typing is typically 15+ rapid onsets/sec (3-5 keystrokes/sec with multiple harmonics)
-    # Normal speech is 2-8 onsets/sec, so threshold at 15 to avoid false positives
-    if onsets_per_sec > 15:
-        summary.append("[Warning!] Possible keyboard typing detected.")
-    else:
-        summary.append("[check] No strong evidence of typing detected.")
-
-    print("\n".join(summary))
-    return summary
+    # Mono 16 kHz float32 waveform shared with the other analyzers (no copy)
+    tracker = KeyboardOnsetTracker(n_fft, hop_length, audio.sample_rate)
+    tracker.feed(audio.samples)
+    result = tracker.finish()
+    print("\n".join(result.summary_lines()))
+    return result
+
+
+class KeyboardOnsetTracker:
+    """Spectral-flux onsets, computed block by block.
+
+    Frames match torch.stft(center=True, reflect padding, rectangular window),
+    so feeding the signal in pieces gives the same result as one call.
+    """
+
+    def __init__(self, n_fft=1024, hop_length=512, sample_rate=16000):
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.sample_rate = sample_rate
+        self.pad = n_fft // 2
+        self.total = 0
+        self._head = torch.zeros(0)     # raw samples until the leading pad can be built
+        self._tail = torch.zeros(0)     # last pad+1 raw samples, for the trailing pad
+        self._pending = torch.zeros(0)  # padded samples still needed by a frame
+        self._prev_mag = None
+        self._flux = []
+
+    def feed(self, samples):
+        block = torch.as_tensor(samples, dtype=torch.float32)
+        self.total += block.shape[0]
+        self._tail = torch.cat([self._tail, block])[-(self.pad + 1):].clone()
+        if self._head is not None:
+            self._head = torch.cat([self._head, block])
+            if self._head.shape[0] <= self.pad:
+                return
+            # reflect padding mirrors the samples after the first one
+            block = torch.cat([self._head[1:self.pad + 1].flip(0), self._head])
+            self._head = None
+        self._push(block)
+
+    def _push(self, padded):
+        self._pending = torch.cat([self._pending, padded])
+        count = (self._pending.shape[0] - self.n_fft) // self.hop_length + 1
+        if count <= 0:
+            return
+
+        # 1) Magnitude spectrum of each new frame [frames, freq_bins]
+        frames = self._pending[:(count - 1) * self.hop_length + self.n_fft].unfold(0, self.n_fft, self.hop_length)
+        spec_mag = torch.fft.rfft(frames).abs()
+
+        # 2) Spectral flux: positive change from the previous frame, summed over frequency
+        if self._prev_mag is not None:
+            spec_mag = torch.cat([self._prev_mag.unsqueeze(0), spec_mag])
+        if spec_mag.shape[0] > 1:
+            self._flux.append((spec_mag[1:] - spec_mag[:-1]).clamp(min=0).sum(dim=1))
+        self._prev_mag = spec_mag[-1]
+
+        self._pending = self._pending[count * self.hop_length:].clone()
+
+    def _findings(self):
+        flux = torch.cat(self._flux) if self._flux else torch.zeros(0)
+
+        # Onset count: local peaks in the 1-D flux signal
+        if flux.numel() < 3:
+            num_onsets = 0
+            onset_times = []
+        else:
+            peaks = (flux[1:-1] > flux[:-2]) & (flux[1:-1] > flux[2:])
+            num_onsets = int(peaks.sum().item())
+            # peak i sits at flux index i+1, i.e. between STFT frames i+1 and i+2
+            frames = torch.nonzero(peaks).flatten() + 2
+            onset_times = [round(t, 3) for t in (frames * self.hop_length / self.sample_rate).tolist()]
+
+        # Normalize by duration
+        duration_sec = self.total / self.sample_rate
+        onsets_per_sec = num_onsets / duration_sec if duration_sec > 0 else 0.0
+
+        # Keyboard typing is typically 15+ rapid onsets/sec (3-5 keystrokes/sec with multiple harmonics)
+        # Normal speech is 2-8 onsets/sec, so threshold at 15 to avoid false positives
+        return KeyboardFindings(
+            onsets=num_onsets,
+            onsets_per_sec=onsets_per_sec,
+            typing_suspected=onsets_per_sec > 15,
+            onset_times=onset_times,
+        )
+
+    def partial(self):
+        # frames so far; the last few change once the trailing pad is known
+        return self._findings()
+
+    def finish(self):
+        if self._head is None:
+            # trailing reflect pad: the samples before the last one, mirrored
+            self._push(self._tail[-self.pad - 1:-1].flip(0))
+        return self._findings()
@@ -1,68 +1,113 @@
-import torchaudio.transforms as T
 import torch
-import soundfile as sf
+from audio_buffer import AudioBuffer
+from analysis_result import SpeechPattern
 
 def analyze_speech_pattern(audio_path):
+    return analyze_speech_pattern_buffer(AudioBuffer.load(audio_path))
+
+def analyze_speech_pattern_shared(samples, sample_rate=16000):
+    # process-pool entry point; `samples` is a process_pool.SharedArray
+    with samples.attach() as array:
+        result = measure_speech_pattern(AudioBuffer(array, sample_rate))
+        del array  # the segment can't be closed while a view is alive
+    return result
+
+def analyze_speech_pattern_buffer(audio):
+    result = measure_speech_pattern(audio)
+    return result.speech_rate, result.volume_std
+
+def measure_speech_pattern(audio):
     print("Analyzing speech rhythm...")
 
-    # Load audio using soundfile directly
-    waveform, sr = sf.read(audio_path)
-    waveform = torch.from_numpy(waveform).float()
-    if len(waveform.shape) > 1:  # If stereo
-        waveform = waveform.T  # Shape: [channels, samples]
-    else:
-        waveform = waveform.unsqueeze(0)  # Shape: [1, samples]
-    if sr != 16000:
-        resampler = T.Resample(orig_freq=sr, new_freq=16000)
-        waveform = resampler(waveform)
-    waveform = waveform.mean(dim=0)  # Convert to mono
-
-    # Volume analysis (RMS and variation)
-    rms = torch.sqrt(torch.mean(waveform ** 2))
-    frame_length = 1024
-    hop_length = 512
-    frame_rms = torch.nn.functional.unfold(
-        waveform.unsqueeze(0).unsqueeze(0), kernel_size=(1, frame_length), stride=(1, hop_length)
-    ).squeeze().pow(2).mean(dim=0).sqrt()
-    volume_std = frame_rms.std().item()
+    # Mono 16 kHz float32, shared with the other analyzers (no copy)
+    tracker = SpeechRhythmTracker(audio.sample_rate)
+    tracker.feed(audio.samples)
+    result = tracker.finish()
+    print("\n".join(result.summary_lines()))
+    return result
+
 
-    # Speech rate via RMS energy envelope onsets (syllable/word detection)
-    duration_sec = waveform.shape[0] / 16000
+class SpeechRhythmTracker:
+    """Speech rate and volume variation, computed block by block.
 
-    # Detect speech onsets using RMS envelope
+    Feeding the whole signal at once gives the same result as feeding it in
+    pieces, so the same code serves whole files and streamed audio.
+    """
+
+    # volume variation frames
+    frame_length = 1024
+    hop_length = 512
+    # RMS envelope for speech onsets
     window_size = 400  # ~25ms at 16kHz
     hop = 160  # ~10ms hop
-    rms_envelope = []
-    for i in range(0, len(waveform) - window_size, hop):
-        window = waveform[i:i+window_size]
-        rms_envelope.append(torch.sqrt(torch.mean(window ** 2)).item())
-
-    rms_envelope = torch.tensor(rms_envelope)
-
-    # Find peaks in RMS envelope (speech onsets)
-    if len(rms_envelope) > 2:
-        # Local maxima detection
-        peaks = (rms_envelope[1:-1] > rms_envelope[:-2]) & (rms_envelope[1:-1] > rms_envelope[2:])
-        # Filter by threshold (30% of max RMS)
-        threshold = rms_envelope.max() * 0.3
-        strong_peaks = peaks & (rms_envelope[1:-1] > threshold)
-        num_onsets = strong_peaks.sum().item()
-    else:
-        num_onsets = 0
-
-    # Convert to words/syllables per minute
-    speech_rate = (num_onsets / duration_sec) * 60 if duration_sec > 0 else 0
-
-    print(f"  Detected speech rate: {speech_rate:.1f} syllables/min (~{speech_rate/60:.1f} per sec)")
-    print(f"  Volume variation (std): {volume_std:.4f}")
-
-    # Normal speech: 120-200 syllables/min (2-3.3 per sec)
-    if speech_rate > 250 or (speech_rate < 80 and speech_rate > 0):
-        print("[Warning!] Unusual speaking rate (too fast or too slow).")
-
-    if volume_std < 0.01:
-        print("[Warning!] Voice sounds flat or monotone.")
-    else:
-        print("[check] Voice shows natural variation.")
-
-    return speech_rate, volume_std
+
+    def __init__(self, sample_rate=16000):
+        self.sample_rate = sample_rate
+        self.total = 0
+        self._pending = torch.zeros(0)  # samples still needed by a window
+        self._base = 0                  # stream index of _pending[0]
+        self._next_window = 0
+        self._next_frame = 0
+        self._envelope = []
+        self._frame_rms = []
+
+    def _rms(self, start, last, size, step):
+        # RMS of every window starting at start, start+step, ... <= last
+        count = (last - start) // step + 1
+        offset = start - self._base
+        windows = self._pending[offset:offset + (count - 1) * step + size].unfold(0, size, step)
+        return windows.pow(2).mean(dim=1).sqrt(), start + count * step
+
+    def feed(self, samples):
+        block = torch.as_tensor(samples, dtype=torch.float32)
+        self._pending = torch.cat([self._pending, block])
+        self.total += block.shape[0]
+
+        # envelope windows stop one sample short of the end of the signal
+        last = self.total - self.window_size - 1
+        if last >= self._next_window:
+            rms, self._next_window = self._rms(self._next_window, last, self.window_size, self.hop)
+            self._envelope.append(rms)
+
+        last = self.total - self.frame_length
+        if last >= self._next_frame:
+            rms, self._next_frame = self._rms(self._next_frame, last, self.frame_length, self.hop_length)
+            self._frame_rms.append(rms)
+
+        keep_from = min(self._next_window, self._next_frame)
+        if keep_from > self._base:
+            self._pending = self._pending[keep_from - self._base:].clone()
+            self._base = keep_from
+
+    def finish(self):
+        # also usable mid-stream for a partial result
+        frame_rms = torch.cat(self._frame_rms) if self._frame_rms else torch.zeros(0)
+        volume_std = frame_rms.std().item() if frame_rms.numel() > 1 else 0.0
+
+        # Speech rate via RMS energy envelope onsets (syllable/word detection)
+        duration_sec = self.total / self.sample_rate
+        rms_envelope = torch.cat(self._envelope) if self._envelope else torch.zeros(0)
+
+        # Find peaks in RMS envelope (speech onsets)
+        if len(rms_envelope) > 2:
+            # Local maxima detection
+            peaks = (rms_envelope[1:-1] > rms_envelope[:-2]) & (rms_envelope[1:-1] > rms_envelope[2:])
+            # Filter by threshold (30% of max RMS)
+            threshold = rms_envelope.max() * 0.3
+            strong_peaks = peaks & (rms_envelope[1:-1] > threshold)
+            num_onsets = strong_peaks.sum().item()
+        else:
+            num_onsets = 0
+
+        # Convert to words/syllables per minute
+        speech_rate = (num_onsets / duration_sec) * 60 if duration_sec > 0 else 0
+
+        return SpeechPattern(
+            speech_rate=speech_rate,
+            volume_std=volume_std,
+            # Normal speech: 120-200 syllables/min (2-3.3 per sec)
+            unusual_rate=speech_rate > 250 or (speech_rate < 80 and speech_rate > 0),
+            monotone=volume_std < 0.01,
+        )
+
+    partial = finish
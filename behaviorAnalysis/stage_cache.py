@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import uuid
+import pickle
+import shutil
+import hashlib
+import threading
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "OVERWATCH_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".overwatch", "cache"),
+)
+DEFAULT_MAX_BYTES = int(os.environ.get("OVERWATCH_CACHE_MAX_BYTES", 20 * 1024**3))
+
+# content hashes of files we've already read, keyed by (path, size, mtime)
+_file_hashes = {}
+_file_hashes_lock = threading.Lock()
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _file_hashes_lock:
+        if memo_key in _file_hashes:
+            return _file_hashes[memo_key]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+
+    with _file_hashes_lock:
+        _file_hashes[memo_key] = digest.hexdigest()
+    return digest.hexdigest()
+
+
+def _remember_file_hash(path, file_hash):
+    st = os.stat(path)
+    with _file_hashes_lock:
+        _file_hashes[(os.path.abspath(path), st.st_size, st.st_mtime_ns)] = file_hash
+
+
+def fingerprint(value):
+    if hasattr(value, "fingerprint"):
+        return value.fingerprint()
+    if isinstance(value, str) and os.path.isfile(value):
+        return "file:" + hash_file(value)
+    return hashlib.sha256(pickle.dumps(value, protocol=4)).hexdigest()
+
+
+class _Artifact:
+    # Placeholder for a file output inside a pickled cache entry
+    def __init__(self, name, file_hash):
+        self.name = name
+        self.file_hash = file_hash
+
+
+class StageCache:
+    """Content-addressed store for stage outputs with LRU / size-cap eviction.
+
+    Each entry is a directory named after the stage key, holding the pickled
+    outputs plus copies of any file artifacts. Reading an entry refreshes its
+    timestamp; eviction drops the least recently used entries first.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None, max_entries=None):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes or DEFAULT_MAX_BYTES
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, stage_name, inputs, params=None):
+        payload = {
+            "stage": stage_name,
+            "inputs": {name: fingerprint(value) for name, value in sorted(inputs.items())},
+            "params": params or {},
+        }
+        blob = json.dumps(payload, sort_keys=True, default=str).encode()
+        return hashlib.sha256(blob).hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, key, restore_dir):
+        """Return the cached outputs for `key`, or None on a miss.
+
+        File artifacts are copied into `restore_dir` so the caller can modify
+        them without touching the cached copy.
+        """
+        entry = self._entry_dir(key)
+        meta_path = os.path.join(entry, "meta.json")
+        try:
+            with open(os.path.join(entry, "outputs.pkl"), "rb") as f:
+                outputs = pickle.load(f)
+            os.utime(meta_path)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+
+        os.makedirs(restore_dir, exist_ok=True)
+        for name, value in outputs.items():
+            if isinstance(value, _Artifact):
+                dest = os.path.join(restore_dir, value.name)
+                shutil.copy2(os.path.join(entry, "files", value.name), dest)
+                _remember_file_hash(dest, value.file_hash)
+                outputs[name] = dest
+        return outputs
+
+    def store(self, key, outputs, artifacts=()):
+        tmp = os.path.join(self.cache_dir, f".tmp-{key}-{uuid.uuid4().hex}")
+        os.makedirs(os.path.join(tmp, "files"))
+        try:
+            stored = dict(outputs)
+            size = 0
+            for name in artifacts:
+                path = outputs.get(name)
+                if not path or not os.path.isfile(path):
+                    # incomplete result (e.g. a failed transcription); don't cache it
+                    shutil.rmtree(tmp, ignore_errors=True)
+                    return
+                file_name = os.path.basename(path)
+                shutil.copy2(path, os.path.join(tmp, "files", file_name))
+                stored[name] = _Artifact(file_name, hash_file(path))
+                size += os.path.getsize(path)
+
+            with open(os.path.join(tmp, "outputs.pkl"), "wb") as f:
+                pickle.dump(stored, f, protocol=4)
+            size += os.path.getsize(os.path.join(tmp, "outputs.pkl"))
+
+            with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump({"size": size, "created": time.time()}, f)
+
+            entry = self._entry_dir(key)
+            with self._lock:
+                if os.path.exists(entry):
+                    shutil.rmtree(entry, ignore_errors=True)
+                os.replace(tmp, entry)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+        self.evict()
+
+    def entries(self):
+        found = []
+        for name in os.listdir(self.cache_dir):
+            meta_path = os.path.join(self.cache_dir, name, "meta.json")
+            if name.startswith(".") or not os.path.isfile(meta_path):
+                continue
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    size = json.load(f).get("size", 0)
+                found.append((os.path.getmtime(meta_path), size, name))
+            except (OSError, ValueError):
+                continue
+        return found
+
+    def evict(self):
+        with self._lock:
+            entries = sorted(self.entries())  # oldest access first
+            total = sum(size for _, size, _ in entries)
+            while entries and (total > self.max_bytes or
+                               (self.max_entries and len(entries) > self.max_entries)):
+                _, size, name = entries.pop(0)
+                shutil.rmtree(self._entry_dir(name), ignore_errors=True)
+                total -= size
+
+    def clear(self):
+        with self._lock:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            os.makedirs(self.cache_dir, exist_ok=True)
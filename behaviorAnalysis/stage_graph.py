@@ -0,0 +1,177 @@
+import os
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import tracing
+import cancellation
+
+# How many stages of each resource class may run at the same time.
+#   io  - network / disk bound work (downloads, cloud transcription)
+#   cpu - analyzers that mostly run native code (torch, opensmile, pandas)
+#   ext - external executables that manage their own threads (OpenFace)
+RESOURCE_LIMITS = {
+    "io": 4,
+    "cpu": max(1, (os.cpu_count() or 2) // 2),
+    "ext": 1,
+}
+
+
+class Incomplete(Exception):
+    """Raised by a stage whose result is usable but must not be cached.
+
+    `result` is what the stage would have returned; the graph carries on
+    with it, and a later job runs the stage again.
+    """
+
+    def __init__(self, result, reason=""):
+        super().__init__(reason)
+        self.result = result
+
+
+class Stage:
+    """One node of the analysis graph.
+
+    `func` is called with the named `inputs` as keyword arguments. Its return
+    value is bound to `outputs`: nothing for zero outputs, the value itself for
+    one output and a tuple (in order) for several.
+
+    Stages with `params` (a dict, possibly empty) are cacheable: their key is
+    the content of their inputs plus those params. `artifacts` names the
+    outputs that are file paths and must be stored as files.
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=(), resource="cpu", status=None,
+                 params=None, artifacts=()):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.resource = resource
+        self.status = status
+        self.params = params
+        self.artifacts = tuple(artifacts)
+
+    def bind(self, result):
+        if not self.outputs:
+            return {}
+        if len(self.outputs) == 1:
+            return {self.outputs[0]: result}
+        if len(result) != len(self.outputs):
+            raise ValueError(f"Stage '{self.name}' returned {len(result)} values, expected {len(self.outputs)}")
+        return dict(zip(self.outputs, result))
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, {list(self.inputs)} -> {list(self.outputs)}, {self.resource})"
+
+
+class StageGraph:
+    """Runs stages as soon as all of their inputs exist.
+
+    When the run fails or is cancelled, the remaining stages are cancelled
+    and `run` returns only once none of them is running.
+    """
+
+    def __init__(self, stages, resource_limits=None, cache=None, workdir=None):
+        self.stages = list(stages)
+        self.cache = cache
+        self.workdir = workdir
+        self.resource_limits = dict(RESOURCE_LIMITS)
+        if resource_limits:
+            self.resource_limits.update(resource_limits)
+
+        producers = {}
+        for stage in self.stages:
+            for out in stage.outputs:
+                if out in producers:
+                    raise ValueError(f"'{out}' is produced by both '{producers[out].name}' and '{stage.name}'")
+                producers[out] = stage
+        self.producers = producers
+
+    def validate(self, initial):
+        for stage in self.stages:
+            for name in stage.inputs:
+                if name not in initial and name not in self.producers:
+                    raise ValueError(f"Stage '{stage.name}' needs '{name}' but nothing produces it")
+
+    def call(self, stage, kwargs):
+        """(outputs, complete) of one stage run."""
+        try:
+            return stage.bind(stage.func(**kwargs)), True
+        except Incomplete as e:
+            print(f"[Warning] {stage.name} is incomplete: {e}")
+            return stage.bind(e.result), False
+
+    def execute(self, stage, kwargs):
+        cancellation.check()
+        with tracing.span(stage.name, cat=stage.resource) as span:
+            if self.cache is None or stage.params is None:
+                return self.call(stage, kwargs)[0]
+
+            # output names are part of the key so a changed stage signature never
+            # picks up entries written by an older version
+            key = self.cache.key(stage.name, kwargs, dict(stage.params, outputs=stage.outputs))
+            outputs = self.cache.load(key, self.workdir)
+            span["cached"] = outputs is not None
+            if outputs is not None:
+                print(f"[cache] {stage.name}: reusing cached result")
+                return outputs
+
+            outputs, complete = self.call(stage, kwargs)
+            # a partial result would be reused by every job with this key
+            if complete:
+                self.cache.store(key, outputs, stage.artifacts)
+            span["complete"] = complete
+            return outputs
+
+    def run(self, initial=None, on_stage_start=None, on_stage_done=None, cancel_token=None):
+        cancel_token = cancel_token or cancellation.current_token()
+        values = dict(initial or {})
+        self.validate(values)
+
+        pending = list(self.stages)
+        running = {}
+        executors = {}
+
+        def executor_for(resource):
+            if resource not in executors:
+                workers = self.resource_limits.get(resource, 1)
+                executors[resource] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"stage-{resource}")
+            return executors[resource]
+
+        failed = False
+        try:
+            while pending or running:
+                ready = [s for s in pending if all(name in values for name in s.inputs)]
+                for stage in ready:
+                    pending.remove(stage)
+                    if on_stage_start: on_stage_start(stage)
+                    kwargs = {name: values[name] for name in stage.inputs}
+                    # each stage runs in a copy of our context so it joins the active trace
+                    ctx = contextvars.copy_context()
+                    running[executor_for(stage.resource).submit(ctx.run, self.execute, stage, kwargs)] = stage
+
+                if not running:
+                    names = ", ".join(s.name for s in pending)
+                    raise RuntimeError(f"Stage graph is stuck; unsatisfied stages: {names}")
+
+                # wake up regularly so a cancelled job stops its stages promptly
+                done, _ = wait(running, timeout=0.2, return_when=FIRST_COMPLETED)
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+                for future in done:
+                    stage = running.pop(future)
+                    outputs = future.result()
+                    values.update(outputs)
+                    if on_stage_done: on_stage_done(stage, outputs)
+        except BaseException:
+            failed = True
+            # stop the stages still running; their child processes die now
+            if cancel_token is not None:
+                cancel_token.cancel()
+            raise
+        finally:
+            # never return while a stage may still write into the workspace
+            for ex in executors.values():
+                ex.shutdown(wait=True, cancel_futures=failed)
+
+        return values
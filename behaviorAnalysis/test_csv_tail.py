@@ -0,0 +1,37 @@
+from csv_tail import CHUNK_BYTES, CSVTail
+from Openface_Analysis import analyze_behavior_csv
+
+HEADER = "frame, timestamp, pose_Rx, pose_Ry, pose_Rz, AU45_r, gaze_angle_x, gaze_angle_y"
+
+
+def write_csv(path, rows, terminated=True):
+    lines = [HEADER] + [f"{i + 1}, {i / 30:.3f}, -0.5, 0.0, 0.0, 1.0, 0.0, 0.0" for i in range(rows)]
+    path.write_text("\n".join(lines) + ("\n" if terminated else ""))
+
+
+def test_chunks_match_a_full_read(tmp_path):
+    path = tmp_path / "video.csv"
+    write_csv(path, 50, terminated=False)
+    with CSVTail(str(path)) as tail:
+        expected = tail.read_lines(final=True)
+    with CSVTail(str(path)) as tail:
+        chunks = list(tail.read_chunks(size=64))
+    assert len(chunks) > 10
+    assert [line for chunk in chunks for line in chunk] == expected
+    assert len(expected) == 50
+    assert tail.header == [name.strip() for name in HEADER.split(",")]
+
+
+def test_missing_file_yields_nothing(tmp_path):
+    with CSVTail(str(tmp_path / "missing.csv")) as tail:
+        assert [line for chunk in tail.read_chunks() for line in chunk] == []
+        assert tail.header is None
+
+
+def test_analyze_reads_past_the_first_chunk(tmp_path):
+    path = tmp_path / "video.csv"
+    write_csv(path, 60000)
+    assert path.stat().st_size > 2 * CHUNK_BYTES
+    findings = analyze_behavior_csv(str(path))
+    assert findings.ratios["downward"] == 1.0
+    assert findings.ratios["blink"] == 1.0
@@ -0,0 +1,58 @@
+import download_cache
+from download_cache import DownloadCache, SourceURL, object_identity
+
+GCS = "https://storage.googleapis.com/bucket/interviews/a.mp4"
+
+
+def signed(url, n):
+    return (f"{url}?X-Goog-Algorithm=GOOG4-RSA-SHA256&X-Goog-Credential=sa{n}"
+            f"&X-Goog-Date=2026010{n}T000000Z&X-Goog-Expires=900&X-Goog-Signature=ab{n}cd")
+
+
+def test_identity_ignores_signatures():
+    assert object_identity(signed(GCS, 1)) == object_identity(signed(GCS, 2)) == GCS
+    s3 = "https://b.s3.amazonaws.com/a.mp4?versionId=3&X-Amz-Signature=ff&X-Amz-Date=x"
+    assert object_identity(s3) == "https://b.s3.amazonaws.com/a.mp4?versionId=3"
+    assert object_identity(GCS + "?alt=media") != GCS
+
+
+def fake_remote(monkeypatch, remote):
+    # remote: {"etag": ..., "data": ...}; downloads are counted
+    downloads = []
+
+    def range_probe(url):
+        return len(remote["data"]), remote["etag"], True
+
+    def resume(self, url, data_path, size, chunk_size):
+        downloads.append(url)
+        with open(data_path, "wb") as f:
+            f.write(remote["data"])
+
+    monkeypatch.setattr(download_cache, "range_probe", range_probe)
+    monkeypatch.setattr(DownloadCache, "_resume", resume)
+    return downloads
+
+
+def test_fresh_links_reuse_the_download(tmp_path, monkeypatch):
+    remote = {"etag": '"v1"', "data": b"video"}
+    downloads = fake_remote(monkeypatch, remote)
+    cache = DownloadCache(str(tmp_path / "cache"))
+
+    first = cache.fetch(signed(GCS, 1), str(tmp_path / "a.mp4"))
+    cache.fetch(signed(GCS, 2), str(tmp_path / "b.mp4"))
+    assert len(downloads) == 1
+    assert open(first, "rb").read() == b"video"
+
+    # same path, new object: fetched again
+    remote.update(etag='"v2"', data=b"new video")
+    assert open(cache.fetch(signed(GCS, 3)), "rb").read() == b"new video"
+    assert len(downloads) == 2
+
+
+def test_source_fingerprint_is_the_object(monkeypatch):
+    remote = {"etag": '"v1"', "data": b"video"}
+    fake_remote(monkeypatch, remote)
+    assert SourceURL(signed(GCS, 1)).fingerprint() == SourceURL(signed(GCS, 2)).fingerprint()
+    before = SourceURL(GCS).fingerprint()
+    remote["etag"] = '"v2"'
+    assert SourceURL(GCS).fingerprint() != before
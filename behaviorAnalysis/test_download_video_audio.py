@@ -0,0 +1,63 @@
+import os
+import sys
+
+import pytest
+
+import media_info
+import sampling
+from AudioVideoTreadingDL import download_media, download_video_audio
+from audio_stream import AudioStream
+
+URL = "https://example.com/video.mp4"
+
+
+def fail(*args, **kwargs):
+    raise RuntimeError("unreachable")
+
+
+def test_failed_probe_closes_stream(tmp_path, monkeypatch):
+    monkeypatch.setattr(media_info, "probe", fail)
+    stream = AudioStream(["whisper"])
+    with pytest.raises(RuntimeError):
+        download_video_audio(URL, str(tmp_path), audio_stream=stream, segments=4, windows=0)
+    # the reader gets the download's error instead of waiting for audio
+    with pytest.raises(RuntimeError, match="unreachable"):
+        list(stream.blocks("whisper"))
+
+
+def test_failed_window_fetch_closes_stream(tmp_path, monkeypatch):
+    monkeypatch.setattr(sampling, "fetch_windows", fail)
+    stream = AudioStream(["whisper"])
+    media = media_info.MediaInfo(URL, duration=600.0)
+    with pytest.raises(RuntimeError):
+        download_video_audio(URL, str(tmp_path), media=media, audio_stream=stream, windows=4)
+    with pytest.raises(RuntimeError, match="unreachable"):
+        list(stream.blocks("whisper"))
+
+
+FAKE_FFMPEG = """#!{python}
+import sys
+with open({log!r}, "w") as f:
+    f.write("\\n".join(sys.argv[1:]))
+sys.stderr.write("out_time_us=12000000\\nprogress=continue\\n")
+"""
+
+
+def test_download_is_bounded_by_duration(tmp_path, monkeypatch):
+    log = tmp_path / "args.txt"
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    ffmpeg = bin_dir / "ffmpeg"
+    ffmpeg.write_text(FAKE_FFMPEG.format(python=sys.executable, log=str(log)))
+    ffmpeg.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+    video, audio = str(tmp_path / "out" / "video.mp4"), str(tmp_path / "out" / "audio.wav")
+    media = media_info.MediaInfo(URL, duration=60.0)
+    download_media(URL, video, audio, percent_download=40, media=media)
+
+    args = log.read_text().split("\n")
+    # one -t for each output, not a 'q' sent once progress passes the target
+    limits = [i for i, a in enumerate(args) if a == "-t"]
+    assert [args[i + 1] for i in limits] == ["24.000", "24.000"]
+    assert limits[0] < args.index(video) < limits[1] < args.index(audio)
@@ -0,0 +1,35 @@
+import sys
+import time
+
+import pytest
+
+from ffmpeg_run import FFmpegError, ffmpeg_pipe, run_ffmpeg
+
+
+def python(code):
+    return [sys.executable, "-c", code]
+
+
+def test_failure_carries_stderr():
+    with pytest.raises(FFmpegError, match="bad input") as info:
+        run_ffmpeg(python("import sys; sys.stderr.write('bad input'); sys.exit(1)"))
+    assert info.value.returncode == 1
+
+
+def test_capture():
+    assert run_ffmpeg(python("print('{}')"), capture=True).strip() == "{}"
+    assert run_ffmpeg(python("print('{}')")) is None
+
+
+def test_pipe_checks_the_exit_status():
+    with pytest.raises(FFmpegError):
+        with ffmpeg_pipe(python("import sys; sys.stdout.write('x'); sys.exit(2)")) as pipe:
+            assert pipe.read() == b"x"
+
+
+def test_pipe_without_wait_stops_the_writer():
+    endless = python("import sys\nwhile True: sys.stdout.buffer.write(b'x' * 4096)")
+    start = time.monotonic()
+    with ffmpeg_pipe(endless, wait=False) as pipe:
+        assert len(pipe.read(10)) == 10
+    assert time.monotonic() - start < 5
@@ -0,0 +1,26 @@
+import numpy as np
+
+from motion_sampling import allocate
+
+
+def test_allocate_spends_the_whole_budget():
+    # one burst of motion: its quantiles pile onto the same few candidates
+    scores = np.zeros(200)
+    scores[90:100] = 50.0
+    keep = allocate(scores, 20)
+    assert len(keep) == 20
+    assert len(set(keep.tolist())) == 20
+    assert list(keep) == sorted(keep)
+    # the remainder went to the burst, not to the static stretches
+    assert np.sum((keep >= 90) & (keep < 100)) == 10
+
+
+def test_allocate_even_without_motion():
+    keep = allocate(np.zeros(100), 10)
+    assert len(keep) == 10
+    assert np.all(np.abs(np.diff(keep) - 10) <= 1)
+
+
+def test_allocate_small_inputs():
+    assert list(allocate([1.0, 2.0, 3.0], 5)) == [0, 1, 2]
+    assert len(allocate([1.0, 2.0, 3.0], 0)) == 0
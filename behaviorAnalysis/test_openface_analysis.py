@@ -0,0 +1,52 @@
+import os
+import sys
+
+import pytest
+
+from media_info import MediaInfo, StreamInfo
+from Openface_Analysis import OpenFaceIncomplete, OpenFaceStats, runOpenface
+
+# stands in for FeatureExtraction: writes the whole CSV in one go and exits
+FAKE_FEATURE_EXTRACTION = """#!{python}
+import os, sys
+args = sys.argv[1:]
+out_dir, name = args[args.index("-out_dir") + 1], args[args.index("-of") + 1]
+with open(os.path.join(out_dir, name + ".csv"), "w") as f:
+    f.write("frame, face_id, timestamp, confidence, success, pose_Rx, pose_Ry, pose_Rz\\n")
+    for i in range({rows}):
+        f.write(f"{{i + 1}}, 0, {{i / 10:.3f}}, 0.98, 1, -0.5, 0.0, 0.0\\n")
+"""
+
+
+def fake_binary(tmp_path, rows):
+    path = tmp_path / "FeatureExtraction"
+    path.write_text(FAKE_FEATURE_EXTRACTION.format(python=sys.executable, rows=rows))
+    path.chmod(0o755)
+    return str(path)
+
+
+def media(frames, fps=30.0):
+    return MediaInfo("video.mp4", duration=frames / fps,
+                     streams=[StreamInfo(0, "video", fps=fps, nb_frames=frames)])
+
+
+def test_csv_written_at_once_reaches_stats(tmp_path):
+    video = tmp_path / "video.mp4"
+    video.write_bytes(b"")
+    stats = OpenFaceStats()
+    runOpenface(str(video), str(tmp_path), media=media(3000), stats=stats, shards=1,
+                binary=fake_binary(tmp_path, 110), on_progress=lambda *a: None)
+    # the rows arrive in the same read that first sees the header
+    assert stats.rows == 110
+    assert stats.findings().ratios["downward"] == 1.0
+    assert os.path.exists(tmp_path / "video.csv")
+
+
+def test_no_rows_is_incomplete(tmp_path):
+    video = tmp_path / "video.mp4"
+    video.write_bytes(b"")
+    stats = OpenFaceStats()
+    with pytest.raises(OpenFaceIncomplete):
+        runOpenface(str(video), str(tmp_path), media=media(3000), stats=stats, shards=1,
+                    binary=fake_binary(tmp_path, 0), on_progress=lambda *a: None)
+    assert stats.rows == 0
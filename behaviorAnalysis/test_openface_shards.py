@@ -0,0 +1,97 @@
+import os
+import sys
+
+import pytest
+
+import openface_shards
+from openface_shards import VideoShard, run_sharded
+
+# stands in for FeatureExtraction: a row per image of a directory, or four
+# rows half a second apart for a video, in OpenFace's CSV layout
+FAKE_OPENFACE = """
+import os, sys
+source, out_dir, name = sys.argv[1:4]
+if os.path.isdir(source):
+    times = [i / 30 for i in range(len(os.listdir(source)))]
+else:
+    times = [0.0, 0.5, 1.0, 1.5]
+with open(os.path.join(out_dir, name + ".csv"), "w") as f:
+    f.write("frame, face_id, timestamp, confidence, success\\n")
+    for i, t in enumerate(times):
+        f.write(f"{i + 1}, 0, {t:.3f}, 0.98, 1\\n")
+"""
+
+
+def fake_command(source, out_dir, name):
+    return [sys.executable, "-c", FAKE_OPENFACE, source, out_dir, name]
+
+
+def read_rows(csv_path):
+    with open(csv_path) as f:
+        header = [name.strip() for name in f.readline().split(",")]
+        rows = [[v.strip() for v in line.split(",")] for line in f if line.strip()]
+    return header, rows
+
+
+class FakeSequence:
+    """Just what FrameShard reads of a FrameSequence."""
+
+    def __init__(self, directory, count, fps=30.0, skip=10):
+        os.makedirs(directory)
+        self.paths = []
+        for i in range(count):
+            path = os.path.join(directory, f"frame_{i + 1:06d}.jpg")
+            open(path, "wb").close()
+            self.paths.append(path)
+        self.fps = fps
+        self.skip = skip
+
+    def files(self):
+        return list(self.paths)
+
+    def timestamp(self, index):
+        return round(index * self.skip / self.fps, 3)
+
+
+def test_video_shards(tmp_path, monkeypatch):
+    video = tmp_path / "video.mp4"
+    video.write_bytes(b"")
+
+    def prepare(shard):
+        # the second cut starts on a keyframe half a second early
+        open(shard.source, "wb").close()
+        if shard.index:
+            shard.start -= 0.5
+
+    monkeypatch.setattr(VideoShard, "prepare", prepare)
+    csv_path = str(tmp_path / "video.csv")
+    rows = run_sharded(csv_path, [(0.0, 2.0), (2.0, 2.0)], 30.0, fake_command, timeout=60,
+                       expected_max=8, on_progress=lambda *a: None, video_path=str(video))
+
+    header, lines = read_rows(csv_path)
+    times = [float(row[header.index("timestamp")]) for row in lines]
+    assert rows == len(lines) == 7
+    # the lead-in row at 1.5s repeats the first shard's last row
+    assert times == [0.0, 0.5, 1.0, 1.5, 2.0, 2.5, 3.0]
+    assert [int(row[header.index("frame")]) for row in lines] == [int(t * 30) + 1 for t in times]
+    assert not os.path.exists(str(tmp_path / "video.shards"))
+
+
+def test_frame_shards(tmp_path):
+    sequence = FakeSequence(str(tmp_path / "frames"), 6)
+    csv_path = str(tmp_path / "video.csv")
+    rows = run_sharded(csv_path, [(0, 3), (3, 3)], 30.0, fake_command, timeout=60,
+                       expected_max=6, on_progress=lambda *a: None, frames=sequence)
+
+    header, lines = read_rows(csv_path)
+    assert rows == len(lines) == 6
+    assert [float(row[header.index("timestamp")]) for row in lines] == [sequence.timestamp(i) for i in range(6)]
+    assert [int(row[header.index("frame")]) for row in lines] == [i * 10 + 1 for i in range(6)]
+
+
+def test_shard_needs_original_time(tmp_path):
+    class Bare(openface_shards.Shard):
+        pass
+
+    with pytest.raises(TypeError):
+        Bare(0, str(tmp_path), str(tmp_path / "x"))
@@ -0,0 +1,48 @@
+import pytest
+
+from sampling import MIN_WINDOW_SECONDS, Timeline, plan_windows
+
+
+def test_transcript_times_move_to_the_original():
+    timeline = Timeline.from_lengths([(100.0, 30.0), (400.0, 30.0)])
+    text = ("[00:05.250] Zara: hello\n"
+            "Stutter 'so' at 00:35.000\n"
+            "[5.25s - 36.00s] [UNKNOWN] hello\n"
+            "Pause 2.50s after Zara at 00:10.000\n")
+    assert timeline.retime_text(text) == ("[01:45.250] Zara: hello\n"
+                                          "Stutter 'so' at 06:45.000\n"
+                                          "[105.25s - 406.00s] [UNKNOWN] hello\n"
+                                          "Pause 2.50s after Zara at 01:50.000\n")
+
+
+def test_windows_cover_the_share_in_their_strata():
+    plan = plan_windows(1000.0, coverage=0.4, windows=8)
+    assert len(plan) == 8
+    assert sum(length for _, length in plan) == pytest.approx(400.0)
+    for i, (start, length) in enumerate(plan):
+        assert i * 125.0 <= start and start + length <= (i + 1) * 125.0
+
+
+def test_windows_are_never_too_short():
+    # 60s of coverage only makes three 20s windows
+    plan = plan_windows(150.0, coverage=0.4, windows=8)
+    assert len(plan) == 3
+    assert all(length >= MIN_WINDOW_SECONDS for _, length in plan)
+
+
+def test_jitter_is_reproducible():
+    a = plan_windows(1000.0, windows=8, jitter=1.0, seed=7)
+    assert a == plan_windows(1000.0, windows=8, jitter=1.0, seed=7)
+    assert a != plan_windows(1000.0, windows=8, jitter=1.0, seed=8)
+    assert a != plan_windows(1000.0, windows=8)
+
+
+def test_timeline_maps_back_to_the_original():
+    timeline = Timeline.from_lengths([(100.0, 30.0), (400.0, 30.0)])
+    assert len(timeline) == 2
+    assert timeline.duration == 60.0
+    assert timeline.to_original(0.0) == 100.0
+    assert timeline.to_original(29.5) == 129.5
+    assert timeline.to_original(30.0) == 400.0
+    assert timeline.to_original(45.25) == 415.25
+    assert Timeline().to_original(12.0) == 12.0
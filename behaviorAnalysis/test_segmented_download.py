@@ -0,0 +1,68 @@
+import json
+import os
+import sys
+
+import pytest
+
+import media_info
+import segmented_download
+
+GOP = 7.0
+
+# stands in for ffmpeg: a stream copy from -ss starts on the keyframe at or
+# before it and runs -t seconds from there; each "file" records the source
+# interval it holds, and concat lists them in order
+FAKE_FFMPEG = """#!{python}
+import json, math, os, sys
+args = sys.argv[1:]
+out = args[-1]
+if "concat" in args:
+    listing = args[args.index("-i") + 1]
+    pieces = []
+    for line in open(listing):
+        name = line.strip()[len("file '"):-1]
+        pieces += json.load(open(os.path.join(os.path.dirname(listing), name)))
+    json.dump(pieces, open(out, "w"))
+else:
+    ss, t = float(args[args.index("-ss") + 1]), float(args[args.index("-t") + 1])
+    start = math.floor(ss / {gop}) * {gop}
+    json.dump([[start, start + t]], open(out, "w"))
+"""
+
+FAKE_FFPROBE = """#!{python}
+import math, sys
+args = sys.argv[1:]
+t = float(args[args.index("-read_intervals") + 1].partition("%")[0])
+print(f"{{math.floor(t / {gop}) * {gop}:.6f}},K_")
+"""
+
+
+def install(tmp_path, monkeypatch, name, script):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir(exist_ok=True)
+    path = bin_dir / name
+    path.write_text(script.format(python=sys.executable, gop=GOP))
+    path.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+
+def test_keyframe_before(tmp_path, monkeypatch):
+    install(tmp_path, monkeypatch, "ffprobe", FAKE_FFPROBE)
+    assert media_info.keyframe_before("video.mp4", 30.0) == 28.0
+    assert media_info.keyframe_before("video.mp4", 0.0) == 0.0
+
+
+def test_joined_segments_match_the_source(tmp_path, monkeypatch):
+    install(tmp_path, monkeypatch, "ffmpeg", FAKE_FFMPEG)
+    install(tmp_path, monkeypatch, "ffprobe", FAKE_FFPROBE)
+    dest = str(tmp_path / "source.mp4")
+    segmented_download.fetch_time_segments("https://example.com/video.mp4", dest, 120.0, segments=4)
+
+    pieces = json.load(open(dest))
+    assert len(pieces) == 4
+    # no lead-in repeated at a join, nothing missing
+    assert pieces[0][0] == 0.0
+    for (_, end), (start, _) in zip(pieces, pieces[1:]):
+        assert start == pytest.approx(end, abs=0.002)
+    assert pieces[-1][1] == pytest.approx(120.0, abs=0.002)
+    assert sum(end - start for start, end in pieces) == pytest.approx(120.0, abs=0.002)
@@ -0,0 +1,56 @@
+import os
+
+from stage_cache import StageCache
+
+
+def test_key_follows_content_not_names(tmp_path):
+    cache = StageCache(str(tmp_path / "cache"))
+    a, b = tmp_path / "a.wav", tmp_path / "b.wav"
+    a.write_bytes(b"same audio")
+    b.write_bytes(b"same audio")
+    key = cache.key("transcribe", {"audio": str(a), "lang": "en"}, {"model": "base"})
+    # a file input is keyed by what it holds; input order doesn't matter
+    assert cache.key("transcribe", {"lang": "en", "audio": str(b)}, {"model": "base"}) == key
+    assert cache.key("transcribe", {"audio": str(a), "lang": "en"}, {"model": "small"}) != key
+    assert cache.key("diarize", {"audio": str(a), "lang": "en"}, {"model": "base"}) != key
+    b.write_bytes(b"other audio")
+    assert cache.key("transcribe", {"audio": str(b), "lang": "en"}, {"model": "base"}) != key
+
+
+def test_store_and_load_restore_artifacts(tmp_path):
+    cache = StageCache(str(tmp_path / "cache"))
+    transcript = tmp_path / "transcript.txt"
+    transcript.write_text("hello")
+    cache.store("k", {"transcript": str(transcript), "words": 1}, artifacts=["transcript"])
+    transcript.unlink()
+
+    outputs = cache.load("k", str(tmp_path / "restore"))
+    assert outputs["words"] == 1
+    assert outputs["transcript"] == str(tmp_path / "restore" / "transcript.txt")
+    assert open(outputs["transcript"]).read() == "hello"
+    assert cache.load("missing", str(tmp_path / "restore")) is None
+
+
+def test_missing_artifact_is_not_stored(tmp_path):
+    cache = StageCache(str(tmp_path / "cache"))
+    cache.store("k", {"transcript": str(tmp_path / "never-written.txt")}, artifacts=["transcript"])
+    assert cache.entries() == []
+    assert os.listdir(cache.cache_dir) == []
+
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    cache = StageCache(str(tmp_path / "cache"), max_entries=2)
+    for i, key in enumerate(["first", "second"]):
+        cache.store(key, {"value": key})
+        os.utime(os.path.join(cache.cache_dir, key, "meta.json"), (1000 + i, 1000 + i))
+    # reading "first" makes "second" the least recently used
+    cache.load("first", str(tmp_path / "restore"))
+    cache.store("third", {"value": "third"})
+    assert sorted(name for _, _, name in cache.entries()) == ["first", "third"]
+
+
+def test_size_cap(tmp_path):
+    cache = StageCache(str(tmp_path / "cache"), max_bytes=1)
+    cache.store("a", {"value": "x" * 100})
+    # nothing fits under the cap, so nothing is kept
+    assert cache.entries() == []
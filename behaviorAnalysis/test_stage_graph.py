@@ -0,0 +1,142 @@
+import time
+import threading
+
+import pytest
+
+import cancellation
+from cancellation import CancellationToken, Cancelled
+from stage_cache import StageCache
+from stage_graph import Incomplete, Stage, StageGraph
+
+
+def test_failed_run_returns_after_running_stages():
+    started = threading.Event()
+    finished = []
+
+    def slow():
+        # a stage that only stops between units of work
+        started.set()
+        for _ in range(100):
+            cancellation.check()
+            time.sleep(0.05)
+        finished.append("slow")
+
+    def broken():
+        started.wait(5)
+        raise ValueError("stage failed")
+
+    graph = StageGraph([Stage("slow", slow, resource="io"), Stage("broken", broken, resource="io")])
+    token = CancellationToken()
+    scope = token.activate()
+    try:
+        with pytest.raises(ValueError):
+            graph.run()
+    finally:
+        token.deactivate(scope)
+
+    # the slow stage was told to stop and had stopped before run returned
+    assert token.cancelled
+    assert finished == []
+    assert not any(t.name.startswith("stage-io") for t in threading.enumerate())
+
+
+def test_incomplete_results_are_used_but_not_cached(tmp_path):
+    cache = StageCache(str(tmp_path / "cache"))
+    calls = []
+
+    def partial():
+        calls.append(1)
+        raise Incomplete("half", "timed out")
+
+    def whole():
+        calls.append(1)
+        return "all"
+
+    for _ in range(2):
+        graph = StageGraph([Stage("partial", partial, outputs=["p"], params={}),
+                            Stage("whole", whole, outputs=["w"], params={})],
+                           cache=cache, workdir=str(tmp_path / "work"))
+        values = graph.run(cancel_token=CancellationToken())
+        assert (values["p"], values["w"]) == ("half", "all")
+    # the partial stage ran both times, the complete one came from the cache
+    assert len(calls) == 3
+    assert len(cache.entries()) == 1
+
+
+def test_stages_run_once_their_inputs_exist():
+    order = []
+
+    def stage(name, result=None):
+        def run(**inputs):
+            order.append(name)
+            return result
+        return run
+
+    graph = StageGraph([
+        Stage("report", stage("report", "done"), inputs=["a", "b"], outputs=["report"]),
+        Stage("a", stage("a", 1), inputs=["source"], outputs=["a"], resource="io"),
+        Stage("b", stage("b", 2), inputs=["source"], outputs=["b"]),
+    ])
+    started, finished = [], []
+    values = graph.run({"source": "video.mp4"},
+                       on_stage_start=lambda s: started.append(s.name),
+                       on_stage_done=lambda s, outputs: finished.append((s.name, outputs)))
+    assert values == {"source": "video.mp4", "a": 1, "b": 2, "report": "done"}
+    assert order[-1] == "report" and sorted(order[:2]) == ["a", "b"]
+    assert started[-1] == "report"
+    assert finished[-1] == ("report", {"report": "done"})
+
+
+def test_resource_limits_bound_concurrency():
+    lock = threading.Lock()
+    active, peak = [0], [0]
+
+    def work():
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+
+    graph = StageGraph([Stage(f"s{i}", work, resource="ext") for i in range(4)],
+                       resource_limits={"ext": 1})
+    graph.run()
+    assert peak[0] == 1
+
+
+def test_missing_and_stuck_inputs_are_reported():
+    with pytest.raises(ValueError, match="needs 'audio'"):
+        StageGraph([Stage("s", lambda audio: None, inputs=["audio"])]).run()
+    # both exist, but each waits for the other
+    graph = StageGraph([Stage("a", lambda b: 1, inputs=["b"], outputs=["a"]),
+                        Stage("b", lambda a: 2, inputs=["a"], outputs=["b"])])
+    with pytest.raises(RuntimeError, match="stuck"):
+        graph.run()
+
+
+def test_cancel_stops_the_run():
+    token = CancellationToken()
+    stopped = []
+
+    def slow():
+        try:
+            for _ in range(100):
+                cancellation.check()
+                time.sleep(0.05)
+        except Cancelled:
+            stopped.append("slow")
+            raise
+
+    after = []
+    graph = StageGraph([Stage("slow", slow, outputs=["x"], resource="io"),
+                        Stage("after", after.append, inputs=["x"])])
+    threading.Timer(0.2, token.cancel).start()
+    scope = token.activate()
+    try:
+        with pytest.raises(Cancelled):
+            graph.run()
+    finally:
+        token.deactivate(scope)
+    assert stopped == ["slow"]
+    assert after == []
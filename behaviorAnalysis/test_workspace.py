@@ -0,0 +1,94 @@
+import os
+import time
+
+from workspace import JobWorkspace, prune_jobs, remove_job
+
+DAY = 86400
+
+
+def finished_job(root, job_id, age_days):
+    ws = JobWorkspace(root, job_id)
+    with open(ws.path("report.md"), "w") as f:
+        f.write("report")
+    ws.publish(ws.path("report.md"))
+    ws.cleanup()
+    then = time.time() - age_days * DAY
+    os.utime(ws.job_dir, (then, then))
+    return ws
+
+
+def test_prune_keeps_newest_finished_jobs(tmp_path):
+    root = str(tmp_path)
+    for i in range(5):
+        finished_job(root, f"job{i}", age_days=i)
+    removed = prune_jobs(root, keep=3, max_age_days=30)
+    assert sorted(removed) == ["job3", "job4"]
+    assert sorted(os.listdir(root)) == ["job0", "job1", "job2"]
+
+
+def test_prune_drops_old_jobs(tmp_path):
+    root = str(tmp_path)
+    finished_job(root, "fresh", age_days=1)
+    finished_job(root, "stale", age_days=10)
+    assert prune_jobs(root, keep=10, max_age_days=7) == ["stale"]
+    assert os.listdir(root) == ["fresh"]
+
+
+def test_prune_leaves_running_jobs(tmp_path):
+    root = str(tmp_path)
+    running = JobWorkspace(root, "running")
+    finished_job(root, "done", age_days=0)
+    # a running job doesn't take a finished job's place either
+    assert prune_jobs(root, keep=1, max_age_days=7) == []
+    assert os.path.isdir(running.work_dir)
+
+    then = time.time() - 8 * DAY
+    os.utime(running.work_dir, (then, then))
+    assert prune_jobs(root, keep=1, max_age_days=7) == ["running"]
+
+
+def test_remove_job_only_touches_that_job(tmp_path):
+    root = str(tmp_path)
+    finished_job(root, "a", age_days=0)
+    other = JobWorkspace(root, "b")
+    assert remove_job(root, "a")
+    assert not remove_job(root, "a")
+    assert os.listdir(root) == ["b"]
+    assert os.path.isdir(other.work_dir)
+
+
+def test_prune_ignores_other_folders(tmp_path):
+    root = str(tmp_path)
+    finished_job(root, "job", age_days=30)
+    # someone's own folder under the same output directory
+    mine = tmp_path / "photos"
+    mine.mkdir()
+    (mine / "a.jpg").write_bytes(b"")
+    then = time.time() - 30 * DAY
+    os.utime(mine, (then, then))
+
+    assert prune_jobs(root, keep=0, max_age_days=7) == ["job"]
+    assert not remove_job(root, "photos")
+    assert os.listdir(root) == ["photos"]
+
+
+def test_publish_exposes_a_finished_file(tmp_path):
+    ws = JobWorkspace(str(tmp_path), "job")
+    with open(ws.path("transcript.txt"), "w") as f:
+        f.write("first")
+    dest = ws.publish(ws.path("transcript.txt"))
+    assert dest == os.path.join(ws.job_dir, "transcript.txt")
+    assert open(dest).read() == "first"
+    # republishing replaces the old copy; the scratch file stays where it was
+    with open(ws.path("draft.txt"), "w") as f:
+        f.write("second")
+    ws.publish(ws.path("draft.txt"), "transcript.txt")
+    assert open(dest).read() == "second"
+    assert os.path.exists(ws.path("draft.txt"))
+    assert not [name for name in os.listdir(ws.job_dir) if name.endswith(".tmp")]
+
+    ws.cleanup()
+    assert not os.path.exists(ws.work_dir)
+    assert os.path.exists(dest)
+    ws.cleanup(keep_published=False)
+    assert not os.path.exists(ws.job_dir)
@@ -0,0 +1,163 @@
+import os
+import sys
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+try:
+    import resource  # not available on Windows
+except ImportError:
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+_current_tracer = contextvars.ContextVar("overwatch_tracer", default=None)
+
+
+# ─── RESOURCE PROBES ────────────────────────────────────────────────────────────
+# CPU time is the calling thread's plus finished child processes' (ffmpeg,
+# OpenFace). Peak RSS and bytes read are process-wide, not the span's own:
+# the peak is the process high-water mark when the span ends, and the read
+# delta includes whatever overlapping spans read meanwhile. The `process_`
+# prefix on those span args says so.
+
+def _cpu_seconds():
+    children = os.times()
+    return time.thread_time() + children.children_user + children.children_system
+
+
+def _peak_rss_bytes():
+    if resource is not None:
+        scale = 1 if sys.platform == "darwin" else 1024  # ru_maxrss is KiB on Linux
+        own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+        kids = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+        return own, kids
+    if psutil is not None:
+        mem = psutil.Process().memory_info()
+        return getattr(mem, "peak_wset", mem.rss), 0
+    return 0, 0
+
+
+def _bytes_read():
+    if psutil is not None:
+        try:
+            return psutil.Process().io_counters().read_bytes
+        except (AttributeError, psutil.Error):
+            pass
+    try:
+        with open("/proc/self/io", "r") as f:
+            for line in f:
+                if line.startswith("read_bytes:"):
+                    return int(line.split(":", 1)[1])
+    except OSError:
+        pass
+    return 0
+
+
+# ─── TRACER ─────────────────────────────────────────────────────────────────────
+
+class Tracer:
+    """Collects spans for one job and exports them in Chrome trace format.
+
+    The JSON written by `save` opens in chrome://tracing and ui.perfetto.dev.
+    """
+
+    def __init__(self, name="job"):
+        self.name = name
+        self.pid = os.getpid()
+        self.metadata = {}
+        self.events = []
+        self._threads = {}
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+
+    def _now_us(self):
+        return (time.perf_counter() - self._t0) * 1_000_000
+
+    @contextmanager
+    def span(self, name, cat="stage", **args):
+        """Time a block; the yielded dict can be filled with extra span args.
+
+        Wall and CPU time are the span's; the `process_*` args are process-wide.
+        """
+        thread = threading.current_thread()
+        start = self._now_us()
+        cpu0 = _cpu_seconds()
+        read0 = _bytes_read()
+        try:
+            yield args
+        except BaseException as exc:
+            args["error"] = type(exc).__name__
+            raise
+        finally:
+            end = self._now_us()
+            peak_rss, child_peak_rss = _peak_rss_bytes()
+            args.update({
+                "wall_ms": round((end - start) / 1000, 3),
+                "cpu_ms": round((_cpu_seconds() - cpu0) * 1000, 3),
+                "process_peak_rss_mb": round(peak_rss / 1024**2, 1),
+                "process_child_peak_rss_mb": round(child_peak_rss / 1024**2, 1),
+                "process_bytes_read_delta": _bytes_read() - read0,
+            })
+            with self._lock:
+                self._threads[thread.ident] = thread.name
+                self.events.append({
+                    "name": name, "cat": cat, "ph": "X",
+                    "ts": round(start, 1), "dur": round(end - start, 1),
+                    "pid": self.pid, "tid": thread.ident,
+                    "args": args,
+                })
+
+    def activate(self):
+        # returns a token for deactivate()
+        return _current_tracer.set(self)
+
+    def deactivate(self, token):
+        _current_tracer.reset(token)
+
+    def to_chrome_trace(self):
+        with self._lock:
+            events = list(self.events)
+            threads = dict(self._threads)
+        meta = [{"name": "process_name", "ph": "M", "pid": self.pid, "args": {"name": self.name}}]
+        meta += [
+            {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": tname}}
+            for tid, tname in threads.items()
+        ]
+        return {
+            "traceEvents": meta + sorted(events, key=lambda e: e["ts"]),
+            "displayTimeUnit": "ms",
+            "otherData": dict(self.metadata),
+        }
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f, indent=1)
+        return path
+
+
+def current_tracer():
+    return _current_tracer.get()
+
+
+@contextmanager
+def span(name, cat="stage", **args):
+    """Span on the active tracer; a no-op when nothing is being traced."""
+    tracer = _current_tracer.get()
+    if tracer is None:
+        yield args
+        return
+    with tracer.span(name, cat, **args) as span_args:
+        yield span_args
+
+
+def run_in_context(target):
+    # Threads don't inherit context variables; wrap a Thread target so its
+    # spans land in the caller's trace.
+    ctx = contextvars.copy_context()
+    return lambda *a, **kw: ctx.run(target, *a, **kw)
@@ -1,18 +1,25 @@
 import os
+import json
 import subprocess
 import sys
-import requests
 
-def download_video(url, save_path, target_fps=10, percent_download=40):
+import download_cache
+import media_info
+import sampling
+
+def download_video(url, save_path, target_fps=10, percent_download=40, windows=None):
     os.makedirs(os.path.dirname(save_path), exist_ok=True)
 
-    # Download original video
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
-    resp = requests.get(url, headers=headers, stream=True)
-    resp.raise_for_status()
-    with open(save_path, "wb") as f:
-        for chunk in resp.iter_content(chunk_size=1024*1024):
-            f.write(chunk)
+    windows = sampling.DEFAULT_WINDOWS if windows is None else windows
+    timeline = None
+    if windows > 0:
+        # Only percent_download% of the video, as windows spread over all of it
+        plan = sampling.plan_windows(media_info.probe(url).duration, percent_download / 100, windows)
+        timeline = sampling.fetch_windows(url, save_path, plan)
+        percent_download = 100
+    else:
+        # Download original video (resumed / reused from the local download cache)
+        download_cache.fetch(url, save_path)
     print(f"Video downloaded to: {save_path}")
 
     # Probe original duration
@@ -66,5 +73,11 @@ def download_video(url, save_path, target_fps=10, percent_download=40):
 
     proc.wait()
     print()  # newline
-    print(f"Re-encoded at {target_fps} FPS (first {percent_download}%): {lowfps_path}")
+    if timeline:
+        # original timestamps of the stitched windows
+        with open(f"{base}_{target_fps}fps.timeline.json", "w", encoding="utf-8") as f:
+            json.dump(timeline.to_dict(), f)
+        print(f"Re-encoded at {target_fps} FPS ({len(timeline)} sampled windows): {lowfps_path}")
+    else:
+        print(f"Re-encoded at {target_fps} FPS (first {percent_download}%): {lowfps_path}")
     return lowfps_path
@@ -0,0 +1,102 @@
+import os
+import time
+import uuid
+import shutil
+
+# published job directories kept under an output root: the newest
+# KEEP_JOBS, none older than KEEP_DAYS
+KEEP_JOBS = int(os.environ.get("OVERWATCH_KEEP_JOBS", 20))
+KEEP_DAYS = float(os.environ.get("OVERWATCH_KEEP_DAYS", 7))
+
+
+class JobWorkspace:
+    """Directory layout for one analysis job.
+
+    Stages write into a private scratch directory (`work_dir`). Finished
+    artifacts are published into `job_dir` with an atomic rename, so readers
+    (the GUI player, the API) never see a half-written file, and two jobs
+    never share a file name. A marker file tags the directory as a job's,
+    so pruning never touches anything else under the same root.
+    """
+
+    WORK_DIR_NAME = ".work"
+    MARKER_NAME = ".overwatch-job"
+
+    def __init__(self, root, job_id=None):
+        self.root = root
+        self.job_id = job_id or uuid.uuid4().hex
+        self.job_dir = os.path.join(root, self.job_id)
+        self.work_dir = os.path.join(self.job_dir, self.WORK_DIR_NAME)
+        os.makedirs(self.work_dir, exist_ok=True)
+        with open(os.path.join(self.job_dir, self.MARKER_NAME), "a"):
+            pass
+
+    def path(self, name):
+        return os.path.join(self.work_dir, name)
+
+    def published_path(self, name):
+        return os.path.join(self.job_dir, name)
+
+    def publish(self, path, name=None):
+        """Atomically expose `path` as `job_dir/name`; the source stays in place."""
+        dest = self.published_path(name or os.path.basename(path))
+        tmp = f"{dest}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.link(path, tmp)  # free when scratch and job dir share a filesystem
+        except OSError:
+            shutil.copy2(path, tmp)
+        os.replace(tmp, dest)
+        return dest
+
+    def cleanup(self, keep_published=True):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        if not keep_published:
+            shutil.rmtree(self.job_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cleanup()
+
+
+def is_job_dir(path):
+    return os.path.isfile(os.path.join(path, JobWorkspace.MARKER_NAME))
+
+
+def remove_job(root, job_id):
+    """Delete one job's directory under `root`; False if there was none."""
+    job_dir = os.path.join(root, job_id)
+    if not is_job_dir(job_dir):
+        return False
+    shutil.rmtree(job_dir, ignore_errors=True)
+    return True
+
+
+def prune_jobs(root, keep=KEEP_JOBS, max_age_days=KEEP_DAYS, now=None):
+    """Delete job directories under `root` past the retention limits.
+
+    Jobs still running (their scratch directory exists) don't count against
+    `keep` and are only removed once older than `max_age_days`, i.e. left
+    behind by a crashed process. Directories without the job marker are
+    never touched. Returns the removed job ids.
+    """
+    if not os.path.isdir(root):
+        return []
+    now = time.time() if now is None else now
+    finished, removed = [], []
+    for entry in os.scandir(root):
+        if not entry.is_dir() or not is_job_dir(entry.path):
+            continue
+        work_dir = os.path.join(entry.path, JobWorkspace.WORK_DIR_NAME)
+        running = os.path.isdir(work_dir)
+        mtime = os.path.getmtime(work_dir if running else entry.path)
+        if now - mtime > max_age_days * 86400:
+            removed.append(entry.name)
+        elif not running:
+            finished.append((mtime, entry.name))
+    finished.sort(reverse=True)
+    removed += [name for _, name in finished[keep:]]
+    for name in removed:
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+    return removed